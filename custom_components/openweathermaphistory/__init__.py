@@ -5,25 +5,77 @@ from __future__ import annotations
 import logging
 from pathlib import Path
 
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EVENT_HOMEASSISTANT_STARTED, Platform
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.const import (
+    CONF_LATITUDE,
+    CONF_LOCATION,
+    CONF_LONGITUDE,
+    EVENT_HOMEASSISTANT_STARTED,
+    Platform,
+)
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
 from homeassistant.helpers import config_validation as cv, storage as store
+from homeassistant.util import dt as dt_util
 
 from . import utils
-from .const import CONST_INITIAL, DOMAIN
+from .const import CONF_GRID_SIZE, CONST_INITIAL, DOMAIN, OPTIONS_API
+from .gridcell import cell_key
+from .templates import clear_cache
 from .weatherhistory import Weather, WeatherCoordinator
 
 CONFIG_SCHEMA = cv.empty_config_schema(DOMAIN)
 
 _LOGGER = logging.getLogger(__name__)
 
+API_CALL_SCHEMA = vol.Schema(
+    {
+        vol.Required("entry_id"): cv.string,
+        vol.Required("api"): vol.In(OPTIONS_API),
+        vol.Optional("live", default=False): cv.boolean,
+    }
+)
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required("entry_id"): cv.string,
+        vol.Required("start"): cv.datetime,
+        vol.Optional("end"): cv.datetime,
+        vol.Optional("max_calls", default=500): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+        vol.Optional("preview", default=False): cv.boolean,
+    }
+)
+
+
+def backfill_range(data) -> tuple[float, float]:
+    """Return the start and end timestamps of a backfill action.
+
+    Times without a timezone, as entered in the UI, are in the Home
+    Assistant timezone.
+    """
+    start = dt_util.as_local(data["start"])
+    end = dt_util.as_local(data.get("end") or dt_util.now())
+    if start >= end:
+        raise ServiceValidationError("The backfill start must be before the end")
+    return start.timestamp(), end.timestamp()
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up irrigtest from a config entry."""
     config = entry.options or entry.data
 
     weather = Weather(hass, config)
+    # leave the grid cell on unload and when the setup fails
+    entry.async_on_unload(weather.close)
     weather.set_processing_type(CONST_INITIAL)
     coordinator = WeatherCoordinator(hass, weather)
     await coordinator.async_config_entry_first_refresh()
@@ -83,24 +135,56 @@ async def async_setup(hass: HomeAssistant, config):
 
     hass.services.async_register(DOMAIN, "list_vars", list_vars)
 
-    async def api_call(call: ServiceCall):
-        """Test API call."""
-        for entry in hass.config_entries.async_entries("openweathermaphistory"):
-            if call.data.get("entry_id") == entry.entry_id:
-                event_data = {
-                    "action": "api_call",
-                    "entry": entry.title,
-                    "api": call.data.get("api"),
-                }
-                hass.bus.async_fire("owmh_event", event_data)
+    async def api_call(call: ServiceCall) -> ServiceResponse:
+        """Show the cached response for an API, calling it live when requested."""
+        shared = hass.data.get(DOMAIN, {}).get(call.data.get("entry_id"))
+        if shared is None:
+            raise ServiceValidationError("OpenWeatherMap History entry is not loaded")
+        return await shared["weather"].show_call_data(
+            call.data["api"], call.data["live"]
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        "api_call",
+        api_call,
+        schema=API_CALL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
 
-    hass.services.async_register(DOMAIN, "api_call", api_call)
+    async def backfill(call: ServiceCall) -> ServiceResponse:
+        """Fill a range of history, or preview the calls it would use."""
+        shared = hass.data.get(DOMAIN, {}).get(call.data["entry_id"])
+        if shared is None:
+            raise ServiceValidationError("OpenWeatherMap History entry is not loaded")
+        weather = shared["weather"]
+        start, end = backfill_range(call.data)
+        plan = await weather.async_plan_backfill(
+            start,
+            end,
+            call.data["max_calls"],
+        )
+        if not call.data["preview"]:
+            await weather.async_start_backfill(plan)
+        response = {k: v for k, v in plan.items() if k != "targets"}
+        response["started"] = not call.data["preview"]
+        return response
+
+    hass.services.async_register(
+        DOMAIN,
+        "backfill",
+        backfill,
+        schema=BACKFILL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
 
     return True
 
 
 async def config_entry_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update listener, called when the config entry options are changed."""
+    # formulas may have changed, compile them again on first use
+    clear_cache()
     await hass.config_entries.async_reload(entry.entry_id)
 
 
@@ -110,7 +194,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry, (Platform.SENSOR, Platform.WEATHER)
     )
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
     return unload_ok
 
 
@@ -143,3 +227,26 @@ async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
     name = "OWMH_" + entry.title
     x = store.Store[dict[any]](hass, 1, name)
     await x.async_remove()
+
+    # remove the shared grid cell data once no other location uses it, the
+    # other entries may be disabled or not loaded
+    key = _cell_key(entry)
+    if key is not None and all(
+        _cell_key(other) != key
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        x = store.Store[dict[any]](hass, 1, "OWMH_" + key)
+        await x.async_remove()
+
+
+def _cell_key(entry: ConfigEntry) -> str | None:
+    """Return the key of the shared grid cell of the entry, None if not shared."""
+    config = entry.options or entry.data
+    if not (size := config.get(CONF_GRID_SIZE, 0)):
+        return None
+    return cell_key(
+        config[CONF_LOCATION][CONF_LATITUDE],
+        config[CONF_LOCATION][CONF_LONGITUDE],
+        size,
+    )
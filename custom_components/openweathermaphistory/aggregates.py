@@ -0,0 +1,74 @@
+"""Ordered store of the daily aggregate (day_summary) data."""
+
+from bisect import bisect_left, insort
+from datetime import date
+
+FIELDS = ("date", "precipitation", "min_temp", "max_temp", "humidity", "pressure")
+
+
+class DailyAggregates:
+    """Aggregate days held in date order, keyed by the date ordinal.
+
+    The stored dictionary keyed by ISO date is kept in step so it can be
+    saved as before. Adding a day is a bisect insert, ageing out removes
+    days from the front and the aN views are rebuilt only after a change.
+    """
+
+    def __init__(self, aggregate) -> None:  # noqa: D107
+        # the stored data, saved unchanged in format
+        self.data = aggregate
+        self.ordinals = sorted(
+            date.fromisoformat(day).toordinal() for day in aggregate
+        )
+        self._dates = {
+            date.fromisoformat(day).toordinal(): day for day in aggregate
+        }
+        self.version = 0
+        self._views = (None, None)
+
+    def __contains__(self, ordinal) -> bool:  # noqa: D105
+        return ordinal in self._dates
+
+    def add(self, day) -> None:
+        """Add or replace the data of a day."""
+        ordinal = date.fromisoformat(day["date"]).toordinal()
+        if ordinal not in self._dates:
+            insort(self.ordinals, ordinal)
+            self._dates[ordinal] = day["date"]
+        self.data[day["date"]] = day
+        self.version += 1
+
+    def evict(self, oldest) -> None:
+        """Age out the days before the oldest ordinal."""
+        count = bisect_left(self.ordinals, oldest)
+        if not count:
+            return
+        for ordinal in self.ordinals[:count]:
+            self.data.pop(self._dates.pop(ordinal), None)
+        del self.ordinals[:count]
+        self.version += 1
+
+    def missing(self, today, max_days) -> list:
+        """Return the ISO dates without data, newest first."""
+        return [
+            date.fromordinal(today - offset).isoformat()
+            for offset in range(int(max_days))
+            if today - offset not in self._dates
+        ]
+
+    def views(self, max_days) -> dict:
+        """Return the newest days as a0, a1, ... limited to the retention."""
+        key = (self.version, int(max_days))
+        if self._views[0] != key:
+            newest = self.ordinals[::-1][: int(max_days)]
+            self._views = (
+                key,
+                {
+                    f"a{i}": {
+                        field: self.data[self._dates[ordinal]].get(field)
+                        for field in FIELDS
+                    }
+                    for i, ordinal in enumerate(newest)
+                },
+            )
+        return self._views[1]
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from collections import ChainMap
 import contextlib
 import logging
 import uuid
@@ -27,22 +28,37 @@ from homeassistant.helpers import (
 from homeassistant.util import location as location_util
 
 from .const import (
+    CONF_API_KEYS,
     CONF_ATTRIBUTES,
+    CONF_COMPACT_SENSORS,
+    CONF_CORRECTION_HOURS,
     CONF_CREATE_SENSORS,
     CONF_FORMULA,
+    CONF_FROST_THRESHOLD,
+    CONF_GDD_BASE,
+    CONF_GDD_CAP,
+    CONF_GRID_SIZE,
     CONF_INTIAL_DAYS,
     CONF_MAX_CALLS,
     CONF_MAX_DAYS,
     CONF_PRECISION,
+    CONF_SEASON_START,
     CONF_SENSORCLASS,
+    CONF_SOIL_CAPACITY,
+    CONF_SOIL_DRAINAGE,
     CONF_STATECLASS,
     CONF_UID,
+    CONST_CORRECTION_DELAY,
     CONST_PROXIMITY,
     DOMAIN,
     OPTIONS_BULK,
     OPTIONS_SENSOR_CLASS,
 )
-from .utils import validate_api_key
+from .descriptions import legacy_resources, retired_descriptions
+from .models import season_start
+from .templates import render, template_names
+from .utils import validate_api_keys
+from .variables import Placeholder, Variables
 
 DEFAULT_NAME = "Home"
 _LOGGER = logging.getLogger(__name__)
@@ -86,8 +102,8 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                 user_input[CONF_MAX_DAYS], user_input[CONF_INTIAL_DAYS]
             )
 
-            errors, description_placeholders = await validate_api_key(
-                user_input[CONF_API_KEY], "v3.0"
+            errors, description_placeholders = await validate_api_keys(
+                user_input[CONF_API_KEY], user_input.get(CONF_API_KEYS), "v3.0"
             )
 
             if not errors:
@@ -115,6 +131,9 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                 vol.Required(
                     CONF_API_KEY, default=default_input.get(CONF_API_KEY, "")
                 ): cv.string,
+                vol.Optional(
+                    CONF_API_KEYS, default=default_input.get(CONF_API_KEYS, "")
+                ): cv.string,
                 vol.Required(
                     CONF_LOCATION,
                     default=default_input.get(
@@ -150,17 +169,19 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                 resources = []
                 resources = self._data[CONF_RESOURCES]
                 options = user_input.get(CONF_CREATE_SENSORS)
+                compact = user_input.get(CONF_COMPACT_SENSORS, False)
                 # now process the create sensor options to build the required sensors
                 resources = process_options(
                     self.hass,
                     self._data["name"],
                     options,
                     resources,
-                    int(max(newdata[CONF_MAX_DAYS], newdata[CONF_INTIAL_DAYS])),
+                    compact,
                 )
                 # update the configuation
                 newdata[CONF_RESOURCES] = resources
                 newdata[CONF_CREATE_SENSORS] = options
+                newdata[CONF_COMPACT_SENSORS] = compact
                 self._data.update(newdata)
                 # Return the form of the next step.
                 return await self.async_step_menu()
@@ -176,7 +197,11 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                         multiple=True,
                         mode="list",
                     )
-                )
+                ),
+                vol.Optional(
+                    CONF_COMPACT_SENSORS,
+                    default=self._data.get(CONF_COMPACT_SENSORS, False),
+                ): sel.BooleanSelector(),
             }
         )
         return self.async_show_form(step_id="bulk", data_schema=schema, errors=errors)
@@ -187,9 +212,17 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
         newdata = {}
         newdata.update(self._data)
         if user_input is not None:
-            errors, description_placeholders = await validate_api_key(
-                user_input[CONF_API_KEY], "v3.0"
-            )
+            errors, description_placeholders = await validate_api_keys(
+                user_input[CONF_API_KEY], user_input.get(CONF_API_KEYS), "v3.0"
+            )
+            try:
+                season_start(user_input.get(CONF_SEASON_START, "01-01"))
+            except ValueError:
+                errors[CONF_SEASON_START] = "season_start"
+            # hours are corrected CONST_CORRECTION_DELAY hours after collection
+            correction = int(user_input.get(CONF_CORRECTION_HOURS, 0))
+            if 0 < correction < CONST_CORRECTION_DELAY:
+                errors[CONF_CORRECTION_HOURS] = "correction_hours"
 
             user_input[CONF_MAX_DAYS] = max(
                 user_input[CONF_MAX_DAYS], user_input[CONF_INTIAL_DAYS]
@@ -198,10 +231,21 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
             if not errors:
                 newdata[CONF_NAME] = self._data.get(CONF_NAME)
                 newdata[CONF_API_KEY] = user_input.get(CONF_API_KEY)
+                newdata[CONF_API_KEYS] = user_input.get(CONF_API_KEYS, "")
                 newdata[CONF_LOCATION] = self._data.get(CONF_LOCATION)
                 newdata[CONF_MAX_DAYS] = int(user_input.get(CONF_MAX_DAYS))
                 newdata[CONF_INTIAL_DAYS] = int(user_input.get(CONF_INTIAL_DAYS))
                 newdata[CONF_MAX_CALLS] = int(user_input.get(CONF_MAX_CALLS))
+                newdata[CONF_GRID_SIZE] = user_input.get(CONF_GRID_SIZE, 0)
+                newdata[CONF_CORRECTION_HOURS] = int(
+                    user_input.get(CONF_CORRECTION_HOURS, 0)
+                )
+                newdata[CONF_SOIL_CAPACITY] = user_input.get(CONF_SOIL_CAPACITY, 0)
+                newdata[CONF_SOIL_DRAINAGE] = user_input.get(CONF_SOIL_DRAINAGE, 2)
+                newdata[CONF_SEASON_START] = user_input.get(CONF_SEASON_START, "01-01")
+                newdata[CONF_GDD_BASE] = user_input.get(CONF_GDD_BASE, 10)
+                newdata[CONF_GDD_CAP] = user_input.get(CONF_GDD_CAP, 30)
+                newdata[CONF_FROST_THRESHOLD] = user_input.get(CONF_FROST_THRESHOLD, 0)
                 # Return the form of the next step.
                 self._data = newdata
                 return await self.async_step_init()
@@ -211,6 +255,9 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                 vol.Required(
                     CONF_API_KEY, default=self._data.get(CONF_API_KEY)
                 ): cv.string,
+                vol.Optional(
+                    CONF_API_KEYS, default=self._data.get(CONF_API_KEYS, "")
+                ): cv.string,
                 vol.Required(
                     CONF_MAX_DAYS, default=self._data.get(CONF_MAX_DAYS)
                 ): sel.NumberSelector({"min": 1, "max": 30}),
@@ -220,6 +267,35 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
                 vol.Required(
                     CONF_MAX_CALLS, default=self._data.get(CONF_MAX_CALLS, 1000)
                 ): sel.NumberSelector({"min": 500, "max": 5000, "step": 500}),
+                vol.Optional(
+                    CONF_GRID_SIZE, default=self._data.get(CONF_GRID_SIZE, 0)
+                ): sel.NumberSelector({"min": 0, "max": 1, "step": 0.01}),
+                vol.Optional(
+                    CONF_CORRECTION_HOURS,
+                    default=self._data.get(CONF_CORRECTION_HOURS, 0),
+                ): sel.NumberSelector({"min": 0, "max": 24}),
+                vol.Optional(
+                    CONF_SOIL_CAPACITY,
+                    default=self._data.get(CONF_SOIL_CAPACITY, 0),
+                ): sel.NumberSelector({"min": 0, "max": 300}),
+                vol.Optional(
+                    CONF_SOIL_DRAINAGE,
+                    default=self._data.get(CONF_SOIL_DRAINAGE, 2),
+                ): sel.NumberSelector({"min": 0, "max": 50, "step": 0.5}),
+                vol.Optional(
+                    CONF_SEASON_START,
+                    default=self._data.get(CONF_SEASON_START, "01-01"),
+                ): cv.string,
+                vol.Optional(
+                    CONF_GDD_BASE, default=self._data.get(CONF_GDD_BASE, 10)
+                ): sel.NumberSelector({"min": -10, "max": 30, "step": 0.5}),
+                vol.Optional(
+                    CONF_GDD_CAP, default=self._data.get(CONF_GDD_CAP, 30)
+                ): sel.NumberSelector({"min": 0, "max": 50, "step": 0.5}),
+                vol.Optional(
+                    CONF_FROST_THRESHOLD,
+                    default=self._data.get(CONF_FROST_THRESHOLD, 0),
+                ): sel.NumberSelector({"min": -20, "max": 10, "step": 0.5}),
             }
         )
         return self.async_show_form(step_id="update", data_schema=schema, errors=errors)
@@ -243,7 +319,9 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
             ):
                 errors[CONF_NAME] = "duplicate_name"
             evalform = evaluate_custom_formula(
-                user_input.get(CONF_FORMULA), self._data.get(CONF_MAX_DAYS, 0)
+                user_input.get(CONF_FORMULA),
+                self._data.get(CONF_MAX_DAYS, 0),
+                sensor_names(self._data.get(CONF_RESOURCES)),
             )
             match evalform:
                 case "measurement":
@@ -363,7 +441,9 @@ class WeatherHistoryFlowHandler(config_entries.ConfigFlow):
 
         if user_input is not None:
             evalform = evaluate_custom_formula(
-                user_input.get(CONF_FORMULA), self._data.get(CONF_MAX_DAYS, 0)
+                user_input.get(CONF_FORMULA),
+                self._data.get(CONF_MAX_DAYS, 0),
+                sensor_names(self._data.get(CONF_RESOURCES)),
             )
             match evalform:
                 case "measurement":
@@ -446,6 +526,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     def __init__(self, config_entry) -> None:  # noqa: D107
         # self.config_entry = config_entry
+        self._entry_id = config_entry.entry_id
         self._name = config_entry.data.get(CONF_NAME)
         self.selected = {}
         self._data = {}
@@ -489,9 +570,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         newdata = {}
         newdata.update(self._data)
         if user_input is not None:
-            errors, description_placeholders = await validate_api_key(
-                user_input[CONF_API_KEY], "v3.0"
-            )
+            errors, description_placeholders = await validate_api_keys(
+                user_input[CONF_API_KEY], user_input.get(CONF_API_KEYS), "v3.0"
+            )
+            try:
+                season_start(user_input.get(CONF_SEASON_START, "01-01"))
+            except ValueError:
+                errors[CONF_SEASON_START] = "season_start"
+            # hours are corrected CONST_CORRECTION_DELAY hours after collection
+            correction = int(user_input.get(CONF_CORRECTION_HOURS, 0))
+            if 0 < correction < CONST_CORRECTION_DELAY:
+                errors[CONF_CORRECTION_HOURS] = "correction_hours"
 
             user_input[CONF_MAX_DAYS] = max(
                 user_input[CONF_MAX_DAYS], user_input[CONF_INTIAL_DAYS]
@@ -500,21 +589,34 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             if not errors:
                 newdata[CONF_NAME] = self._data.get(CONF_NAME)
                 newdata[CONF_API_KEY] = user_input.get(CONF_API_KEY)
+                newdata[CONF_API_KEYS] = user_input.get(CONF_API_KEYS, "")
                 newdata[CONF_LOCATION] = self._data.get(CONF_LOCATION)
                 newdata[CONF_MAX_DAYS] = int(user_input.get(CONF_MAX_DAYS))
                 newdata[CONF_INTIAL_DAYS] = int(user_input.get(CONF_INTIAL_DAYS))
                 newdata[CONF_MAX_CALLS] = int(user_input.get(CONF_MAX_CALLS))
+                newdata[CONF_GRID_SIZE] = user_input.get(CONF_GRID_SIZE, 0)
+                newdata[CONF_CORRECTION_HOURS] = int(
+                    user_input.get(CONF_CORRECTION_HOURS, 0)
+                )
+                newdata[CONF_SOIL_CAPACITY] = user_input.get(CONF_SOIL_CAPACITY, 0)
+                newdata[CONF_SOIL_DRAINAGE] = user_input.get(CONF_SOIL_DRAINAGE, 2)
+                newdata[CONF_SEASON_START] = user_input.get(CONF_SEASON_START, "01-01")
+                newdata[CONF_GDD_BASE] = user_input.get(CONF_GDD_BASE, 10)
+                newdata[CONF_GDD_CAP] = user_input.get(CONF_GDD_CAP, 30)
+                newdata[CONF_FROST_THRESHOLD] = user_input.get(CONF_FROST_THRESHOLD, 0)
                 # Input is valid, set data.
                 resources = []
                 resources = self._data[CONF_RESOURCES]
                 options = newdata.get(CONF_CREATE_SENSORS)
+                compact = newdata.get(CONF_COMPACT_SENSORS, False)
                 # now process the create sensor options to build the required sensors
                 resources = process_options(
                     self.hass,
                     self._data["name"],
                     options,
                     resources,
-                    int(max(user_input[CONF_MAX_DAYS], user_input[CONF_INTIAL_DAYS])),
+                    compact,
+                    self._entry_id,
                 )
                 # update the configuation
                 newdata[CONF_RESOURCES] = resources
@@ -528,6 +630,9 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Required(
                     CONF_API_KEY, default=self._data.get(CONF_API_KEY)
                 ): cv.string,
+                vol.Optional(
+                    CONF_API_KEYS, default=self._data.get(CONF_API_KEYS, "")
+                ): cv.string,
                 vol.Required(
                     CONF_MAX_DAYS, default=self._data.get(CONF_MAX_DAYS)
                 ): sel.NumberSelector({"min": 1, "max": 30}),
@@ -537,6 +642,35 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Required(
                     CONF_MAX_CALLS, default=self._data.get(CONF_MAX_CALLS, 1000)
                 ): sel.NumberSelector({"min": 500, "max": 5000, "step": 500}),
+                vol.Optional(
+                    CONF_GRID_SIZE, default=self._data.get(CONF_GRID_SIZE, 0)
+                ): sel.NumberSelector({"min": 0, "max": 1, "step": 0.01}),
+                vol.Optional(
+                    CONF_CORRECTION_HOURS,
+                    default=self._data.get(CONF_CORRECTION_HOURS, 0),
+                ): sel.NumberSelector({"min": 0, "max": 24}),
+                vol.Optional(
+                    CONF_SOIL_CAPACITY,
+                    default=self._data.get(CONF_SOIL_CAPACITY, 0),
+                ): sel.NumberSelector({"min": 0, "max": 300}),
+                vol.Optional(
+                    CONF_SOIL_DRAINAGE,
+                    default=self._data.get(CONF_SOIL_DRAINAGE, 2),
+                ): sel.NumberSelector({"min": 0, "max": 50, "step": 0.5}),
+                vol.Optional(
+                    CONF_SEASON_START,
+                    default=self._data.get(CONF_SEASON_START, "01-01"),
+                ): cv.string,
+                vol.Optional(
+                    CONF_GDD_BASE, default=self._data.get(CONF_GDD_BASE, 10)
+                ): sel.NumberSelector({"min": -10, "max": 30, "step": 0.5}),
+                vol.Optional(
+                    CONF_GDD_CAP, default=self._data.get(CONF_GDD_CAP, 30)
+                ): sel.NumberSelector({"min": 0, "max": 50, "step": 0.5}),
+                vol.Optional(
+                    CONF_FROST_THRESHOLD,
+                    default=self._data.get(CONF_FROST_THRESHOLD, 0),
+                ): sel.NumberSelector({"min": -20, "max": 10, "step": 0.5}),
             }
         )
         return self.async_show_form(step_id="update", data_schema=schema, errors=errors)
@@ -605,7 +739,9 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
         if user_input is not None:
             evalform = evaluate_custom_formula(
-                user_input.get(CONF_FORMULA), self._data.get(CONF_MAX_DAYS, 0)
+                user_input.get(CONF_FORMULA),
+                self._data.get(CONF_MAX_DAYS, 0),
+                sensor_names(self._data.get(CONF_RESOURCES)),
             )
             match evalform:
                 case "measurement":
@@ -678,17 +814,20 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 resources = []
                 resources = self._data[CONF_RESOURCES]
                 options = user_input.get(CONF_CREATE_SENSORS)
+                compact = user_input.get(CONF_COMPACT_SENSORS, False)
                 # now process the create sensor options to build the required sensors
                 resources = process_options(
                     self.hass,
                     self._data["name"],
                     options,
                     resources,
-                    int(max(newdata[CONF_MAX_DAYS], newdata[CONF_INTIAL_DAYS])),
+                    compact,
+                    self._entry_id,
                 )
                 # update the configuation
                 newdata[CONF_RESOURCES] = resources
                 newdata[CONF_CREATE_SENSORS] = options
+                newdata[CONF_COMPACT_SENSORS] = compact
                 self._data.update(newdata)
                 # Return the form of the next step.
                 return await self.async_step_init()
@@ -704,7 +843,11 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         multiple=True,
                         mode="list",
                     )
-                )
+                ),
+                vol.Optional(
+                    CONF_COMPACT_SENSORS,
+                    default=self._data.get(CONF_COMPACT_SENSORS, False),
+                ): sel.BooleanSelector(),
             }
         )
         return self.async_show_form(step_id="bulk", data_schema=schema, errors=errors)
@@ -728,7 +871,9 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             ):
                 errors[CONF_NAME] = "duplicate_name"
             evalform = evaluate_custom_formula(
-                user_input.get(CONF_FORMULA), self._data.get(CONF_MAX_DAYS, 0)
+                user_input.get(CONF_FORMULA),
+                self._data.get(CONF_MAX_DAYS, 0),
+                sensor_names(self._data.get(CONF_RESOURCES)),
             )
             match evalform:
                 case "measurement":
@@ -792,130 +937,6 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
 # ---- Helpers ----
 
-def hist_adjustment_formula(name):
-    """Formula to calculate an adjustment factor for historical rain data based on past days' rain and a target water amount."""
-
-    # Equivalent Rain, past days rain have incrementally less impact
-    test = "{% set target_water = 10 %}"
-    # Equivalent Rain, past days rain have incrementally less impact
-    test += "{% set equivalent_rain = day0rain + day1rain*0.5 + day2rain*0.25 + day3rain*0.12 + day4rain*0.06 %}"
-    # (target_water - equivalent_rain)/target_water
-    test += "{% set adjustment = (target_water - equivalent_rain)/target_water %}"
-    # make 0 if negative
-    test += "{% set adjustment_factor = [adjustment,0]|max|round(2) %}"
-    test += "{{ adjustment_factor }}"
-
-    formula = {}
-    formula[CONF_NAME] = "OWMH_" + name + "_hist_adjustment_factor"
-    formula[CONF_SENSORCLASS] = "percent"
-    formula[CONF_PRECISION] = 2
-    formula[CONF_FORMULA] =  test
-    formula[CONF_ATTRIBUTES] = ""
-    formula[CONF_STATECLASS] = "measurement"
-    formula[CONF_UID] = str(uuid.uuid4())
-    formula["enabled"] = True
-    return formula
-
-def forecast_adjustment_formula(name):
-    """Formula to calculate an adjustment factor for historical rain data based on past days' rain and a target water amount."""
-
-    # Equivalent Rain, past days rain have incrementally less impact
-    test = "{% set target_water = 10 %}"
-    # Equivalent Rain, past days rain have incrementally less impact
-    test += "{% set equivalent_rain = day0rain + day1rain*0.5 + day2rain*0.25 + forecast1rain*forecast1pop*0.5 + forecast2rain*forecast2pop*0.25 %}"
-    # (target_water - equivalent_rain)/target_water
-    test += "{% set adjustment = (target_water - equivalent_rain)/target_water %}"
-    # make 0 if negative
-    test += "{% set adjustment_factor = [adjustment,0]|max|round(2) %}"
-    test += "{{ adjustment_factor }}"
-
-    formula = {}
-    formula[CONF_NAME] = "OWMH_" + name + "_forecast_adjustment_factor"
-    formula[CONF_SENSORCLASS] = "percent"
-    formula[CONF_PRECISION] = 2
-    formula[CONF_FORMULA] =  test
-    formula[CONF_ATTRIBUTES] = ""
-    formula[CONF_STATECLASS] = "measurement"
-    formula[CONF_UID] = str(uuid.uuid4())
-    formula["enabled"] = True
-    return formula
-
-def frost_formula(type,name):
-    """Formula to calculate a frost risk score and level based on multiple weather factors."""
-    # Input Variables (Replace these with your sensor states)
-    test = "{% set temp = current_temp %}"
-    test += "{% set dew_point = current_dew_point %}"
-    test += "{% set wind = current_wind_speed %}"
-    test += "{% set cloud_cover = current_clouds %}"
-    test += "{% set humidity = current_humidity %}"
-    test += "{% set pressure = current_pressure %}"
-
-    # Logic Constants
-    test += "{% set surface_temp_est = temp - 3.5 %}"
-
-    # Calculate Score Components
-
-    # 1. Temperature Risk: Higher points as air temp nears freezing
-    test += "{% if temp <= 2 %} {% set t_points = 40 %}"
-    test += "{% elif temp <= 4 %} {% set t_points = 30 %}"
-    test += "{% elif temp <= 7 %} {% set t_points = 20 %}"
-    test += "{% else %} {% set t_points = 0 %}"
-    test += "{% endif %}"
-
-    # 2. Sky Clarity Risk: Clear skies (0% cloud) are the highest risk
-    test += "{% set c_points = (100 - cloud_cover) * 0.4 %}"
-
-    # 3. Wind Risk: Calm air (< 3 km/h) allows frost to settle
-    test += "{% if wind < 3 %} {% set w_points = 20 %}"
-    test += "{% elif wind < 8 %} {% set w_points = 5 %}"
-    test += "{% else %} {% set w_points = 0 %}"
-    test += "{% endif %}"
-
-    # 4. Dew Point Alignment: High risk if air is saturated near freezing
-    test += "{% if dew_point <= 0 %} {% set d_points = 10 %}"
-    test += "{% elif (temp - dew_point) < 2 %} {% set d_points = 5 %}"
-    test += "{% else %} {% set d_points = 0 %}"
-    test += "{% endif %}"
-
-    # --- Final Totals
-    test += "{% set risk_score = t_points + c_points + w_points + d_points %}"
-
-    test += "{% if risk_score >= 80 %}"
-    test += "{% set risk_level = 'CRITICAL: Frost highly likely' %}"
-    test += "{% elif risk_score >= 50 %}"
-    test += "{% set risk_level = 'WARNING: Moderate frost risk' %}"
-    test += "{% elif risk_score >= 25 %}"
-    test += "{% set risk_level = 'LOW: Watch for clearing skies' %}"
-    test += "{% else %}"
-    test += "{% set risk_level = 'NONE: No frost expected' %}"
-    test += "{% endif %}"
-
-    # --- Output Display
-    if type == "risk_level":
-         test +=  "{{ risk_level }}"
-    else:
-        test += "{{ risk_score | round(0) }}"
-    # test += "Estimated Surface Temp: {{ surface_temp_est }}°C"
-    # return test
-
-    formula = {}
-    if type == "risk_level":
-        formula[CONF_NAME] = "OWMH_" + name + "_frost_risk_level"
-        formula[CONF_SENSORCLASS] = "none"
-        formula[CONF_PRECISION] = None
-
-    else:
-        formula[CONF_NAME] = "OWMH_" + name + "_frost_risk_score"
-        formula[CONF_SENSORCLASS] = "percent"
-        formula[CONF_PRECISION] = 2
-    formula[CONF_FORMULA] =  test
-    formula[CONF_ATTRIBUTES] = "{{ risk_level }}"
-    formula[CONF_STATECLASS] = "string"
-    formula[CONF_UID] = str(uuid.uuid4())
-    formula["enabled"] = True
-    return formula
-
-
 def create_formula(sensor, sensorclass, stateclass,precision=2,instance="Home",attributes=""):
     """Create formula dictionary."""
     formula = {}
@@ -930,408 +951,48 @@ def create_formula(sensor, sensorclass, stateclass,precision=2,instance="Home",a
     return formula
 
 
-def add_to_list(list, item):
-    """Check if the sensor exists before adding."""
-    for i in list:
-        if i.get("formula", None) == item.get("formula", None):
-            # exits no need to add
-            return list
-
-    list.append(item)
-    return list
-
-def remove_from_list(hass, list, item):
-    """Check if the sensor exists before deleting."""
-
-    for n, i in enumerate(list):
-        if i.get("formula", None) == item.get("formula", None):
-            # found remove it and return the list
-            with contextlib.suppress(KeyError):
-                # remove the sensor so it does not reapear as recovered
-                er.async_get(hass).async_remove(f"sensor.{i['name']}".lower())
-            list.pop(n)
-            return list
-    return list
-
-
-def process_options(hass, name ,options, resource_list, days):
-    """Process the selected auto create options."""
-    resources = resource_list
-    precision = 2
-
-    for i in range(6):
-        if "forecast_rain" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"forecast{i}rain", "precipitation", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}rain", "precipitation", "measurement",precision,name),
-            )
-        if "forecast_snow" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"forecast{i}snow", "precipitation", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}snow", "precipitation", "measurement",precision,name),
-            )
-        if "forecast_max" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"forecast{i}max", "temperature", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}max", "precipitation", "measurement",precision,name),
-            )
-        if "forecast_min" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"forecast{i}min", "temperature", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}min", "precipitation", "measurement",precision,name),
-            )
-        if "forecast_humidity" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"forecast{i}humidity", "humidity", "measurement",0,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(
-                    f"forecast{i}humidity", "humidity", "measurement",0,name
-                ),
-            )
-        if "forecast_pop" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}pop", "none", "none",precision,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}pop", "none", "none",precision,name),
-            )
-        if "forecast_wind_speed" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}wind_speed", "wind_speed", "measurement",precision,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}wind_speed", "wind_speed", "measurement",precision,name),
-            )
-        if "forecast_wind_deg" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}wind_deg", "wind_direction", "measurement",0,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}wind_deg", "wind_direction", "measurement",0,name),
-            )
-        if "forecast_uvi" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}uvi", "none", "string",precision,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}uvi", "none", "string",precision,name),
-            )
-        if "forecast_clouds" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}clouds", "none", "string",0,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}clouds", "none", "string",0,name),
-            )
-        if "forecast_description" in options:
-            resources = add_to_list(
-                resources, create_formula(f"forecast{i}description", "none", "string",None,name)
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"forecast{i}description", "none", "string",None,name),
-            )
-
-    for i in range(days):
-        if "hist_rain" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"day{i}rain", "precipitation", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"day{i}rain", "precipitation", "measurement",precision,name),
-            )
-        if "hist_snow" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"day{i}snow", "precipitation", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"day{i}snow", "precipitation", "measurement",precision,name),
-            )
-        if "hist_max" in options:
-            add_to_list(
-                resources,
-                create_formula(f"day{i}max", "temperature", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"day{i}max", "precipitation", "measurement",precision,name),
-            )
-        if "hist_min" in options:
-            resources = add_to_list(
-                resources,
-                create_formula(f"day{i}min", "temperature", "measurement",precision,name),
-            )
-        else:
-            resources = remove_from_list(
-                hass,
-                resources,
-                create_formula(f"day{i}min", "precipitation", "measurement",precision,name),
-            )
-
-    if "plotly" in options:
-        attributes = "{{ hourly_time }},{{ hourly_temp }},{{ hourly_rain }},{{ hourly_snow }},{{ hourly_humidity }},{{ hourly_pressure }},{{ hourly_wind_speed }},{{ hourly_wind_deg }},{{ hourly_uvi }},{{ hourly_clouds }}"
-        resources = add_to_list(
-            resources,
-            create_formula("plotly", "none", "string",None,name,attributes),
-        )
-    else:
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("plotly", "none", "string",None,name),
-        )
-
-    if "frost_prediction" in options:
-        resources = add_to_list(
-            resources,
-            frost_formula("risk_level",name),
-        )
-        resources = add_to_list(
-            resources,
-            frost_formula("risk_score",name),
-        )
-    else:
-        resources = remove_from_list(
-            hass,
-            resources,
-            frost_formula("risk_level",name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            frost_formula("risk_score",name),
-        )
-
-    if "hist_adjustment_factor" in options:
-        resources = add_to_list(
-            resources,
-            hist_adjustment_formula(name),
-        )
-    else:
-        resources = remove_from_list(
-            hass,
-            resources,
-            hist_adjustment_formula(name),
-        )
-
-    if "forecast_adjustment_factor" in options:
-        resources = add_to_list(
-            resources,
-            forecast_adjustment_formula(name),
-        )
-    else:
-        resources = remove_from_list(
-            hass,
-            resources,
-            forecast_adjustment_formula(name),
-        )
-
-
+def process_options(hass, name, options, resource_list, compact=False, entry_id=None):
+    """Remove the sensors the bulk options no longer create.
+
+    The bulk sensors are native entities created from the selected options.
+    The resources only hold the template sensors earlier versions created
+    for them, kept while the option is selected so the unique ids are kept.
+    Switching to or from compact mode retires the per day or the series
+    sensors. The retired sensors are found in the registry by unique id, so
+    renamed sensors are removed too.
+    """
+    retired = retired_descriptions(options, compact, name)
+    resources, legacy = legacy_resources(resource_list, retired)
+    registry = er.async_get(hass)
+    for description in retired:
+        unique_id = legacy.get(description.key, {}).get(CONF_UID)
+        if unique_id is None and entry_id is not None:
+            unique_id = f"{entry_id}_{description.key}"
+        entity_id = registry.async_get_entity_id("sensor", DOMAIN, unique_id)
+        if entity_id is not None:
+            # remove the sensor so it does not reapear as recovered
+            registry.async_remove(entity_id)
+    return resources
 
-    if "current_obs" in options:
-        resources = add_to_list(
-            resources,
-            create_formula("current_rain", "precipitation", "measurement",precision,name),
-        )
-        resources = add_to_list(
-            resources,
-            create_formula("current_snow", "precipitation", "measurement",precision,name),
-        )
-        resources = add_to_list(
-            resources, create_formula("current_humidity", "humidity", "measurement",0,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_temp", "temperature", "measurement",precision,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_pressure", "pressure", "measurement",0,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_wind_speed", "wind_speed", "measurement",precision,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_wind_deg", "wind_direction", "measurement",0,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_uvi", "none", "string",precision,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_clouds", "none", "string",0,name)
-        )
-        resources = add_to_list(
-            resources, create_formula("current_description", "none", "string",None,name)
-        )
-    else:
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_rain", "precipitation", "measurement",precision,name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_snow", "precipitation", "measurement",precision,name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_humidity", "humidity", "measurement",0,name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_temp", "temperature", "measurement",precision,name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_pressure", "pressure", "measurement",0,name),
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_wind_speed", "wind_speed", "measurement",precision,name)
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_wind_deg", "wind_direction", "measurement",0,name)
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_uvi", "none", "string",precision,name)
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_clouds", "none", "string",0,name)
-        )
-        resources = remove_from_list(
-            hass,
-            resources,
-            create_formula("current_description", "none", "string",None,name)
-        )
 
-    return resources
+def sensor_names(resources) -> list:
+    """Return the names formulas use to read the state of the sensors."""
+    return [cv.slugify(sensor.get(CONF_NAME)) for sensor in resources or []]
 
 
-def evaluate_custom_formula(formula, max_days):
+def evaluate_custom_formula(formula, max_days, sensors=()):
     """Evaluate the formula/template."""
-    wvars = {}
-    # default to initial days variable
-    for i in range(int(max_days)):
-        wvars[f"day{i}rain"] = 0
-        wvars[f"day{i}snow"] = 0
-        wvars[f"day{i}max"] = 0
-        wvars[f"day{i}min"] = 0
-    for i in range(int(max_days)):
-        wvars[f"aggregate{i}date"] =  ""
-        wvars[f"aggregate{i}precipitation"] = 0
-        wvars[f"aggregate{i}max"] = 0
-        wvars[f"aggregate{i}min"] = 0
-
-    # forecast provides 7 days of data
-    for i in range(6):
-        wvars[f"forecast{i}pop"] = 0
-        wvars[f"forecast{i}rain"] = 0
-        wvars[f"forecast{i}snow"] = 0
-        wvars[f"forecast{i}humidity"] = 0
-        wvars[f"forecast{i}max"] = 0
-        wvars[f"forecast{i}min"] = 0
-        wvars[f"forecast{i}wind_speed"] = 0
-        wvars[f"forecast{i}wind_deg"] = 0
-        wvars[f"forecast{i}uvi"] = 0
-        wvars[f"forecast{i}clouds"] = 0
-        wvars[f"forecast{i}description"] = 0
-
-    # current observations
-    wvars["current_rain"] = 0
-    wvars["current_snow"] = 0
-    wvars["current_humidity"] = 0
-    wvars["current_temp"] = 0
-    wvars["current_pressure"] = 0
-    wvars["remaining_backlog"] = 0
-    wvars["daily_count"] = 0
-    wvars["current_wind_speed"] = 0
-    wvars["current_wind_deg"] = 0
-    wvars["current_uvi"] = 0
-    wvars["current_clouds"] = 0
-    wvars["current_dew_point"] = 0
-    wvars["description"] = 0
-    #Plotty variables
-    wvars["hourly_time"] = []
-    wvars["hourly_rain"] = []
-    wvars["hourly_snow"] = []
-    wvars["hourly_temp"] = []
-    wvars["hourly_clouds"] = []
-    wvars["hourly_pressure"] = []
-    wvars["hourly_humidity"] = []
-    wvars["hourly_wind_speed"] = []
-    wvars["hourly_uvi"] = []
-
-    environment = jinja2.Environment()
-    template = environment.from_string(formula)
+    # the variables the sensors see, with placeholder values, and the states
+    # of the other sensors of the entry
+    wvars = ChainMap(Variables(Placeholder(), max_days), dict.fromkeys(sensors, 0))
 
     # process the template and handle errors
     try:
-        templatevalue = template.render(wvars)
+        # names a sensor would never be able to resolve
+        unknown = template_names(formula) - wvars.keys()
+        if unknown:
+            raise jinja2.UndefinedError(", ".join(sorted(unknown)))
+        templatevalue = render(formula, wvars)
         # if it sneaks through the evaluaton
         if templatevalue == "":
             raise jinja2.UndefinedError
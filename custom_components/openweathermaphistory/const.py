@@ -6,6 +6,7 @@ CONST_API_CALL      = "https://api.openweathermap.org/data/3.0/onecall/timemachi
 CONST_API_FORECAST  = "https://api.openweathermap.org/data/3.0/onecall?lat=%s&lon=%s&exclude=minutely,alerts&appid=%s&units=metric"
 CONST_API_OVERVIEW  = "https://api.openweathermap.org/data/3.0/onecall/overview?lat=%s&lon=%s&appid=%s"
 CONF_CREATE_SENSORS = "create_sensors"
+CONF_COMPACT_SENSORS = "compact_sensors"
 CONF_FORMULA = "formula"
 CONF_DATA = "data"
 CONF_ATTRIBUTES = "attributes"
@@ -15,18 +16,39 @@ CONF_PRECISION = "numeric_precision"
 CONF_STATECLASS = "state_class"
 CONF_SENSORCLASS = "sensor_class"
 CONF_UID = "unique_id"
+CONF_API_KEYS = "api_keys"
+CONF_GRID_SIZE = "grid_size"
+CONF_CORRECTION_HOURS = "correction_hours"
+CONF_SOIL_CAPACITY = "soil_capacity"
+CONF_SOIL_DRAINAGE = "soil_drainage"
+CONF_SEASON_START = "season_start"
+CONF_GDD_BASE = "gdd_base"
+CONF_GDD_CAP = "gdd_cap"
+CONF_FROST_THRESHOLD = "frost_threshold"
 
 # prevent accidental duplicate instances
 CONST_PROXIMITY = 1000
 # max calls in a single refresh
 CONST_CALLS = 24
 CONST_INITIAL = "initial"
+# hours after ingestion before an hour is re-fetched for upstream corrections
+CONST_CORRECTION_DELAY = 2
+# most hours re-fetched for corrections in one refresh
+CONST_CORRECTION_CALLS = 2
 # max calls in any 24 hour period
 CONF_MAX_CALLS = "max_calls"
+# minutes between refreshes
+CONST_UPDATE_MINUTES = 5
+# above these sizes processing and json run in the executor, off the event loop
+CONST_EXECUTOR_HOURS = 24 * 7
+CONST_EXECUTOR_BYTES = 64 * 1024
+# sensors in an entry above which the render pass runs in the executor
+CONST_EXECUTOR_SENSORS = 100
 
 ATTRIBUTION = "Data provided by OpenWeatherMap"
 
 OPTIONS_SOURCE = ["FORECAST", "HOURLY", "AGGREGATE"]
+OPTIONS_API = ["timemachine", "day_summary", "forecast", "overview"]
 OPTIONS_SENSOR_CLASS = [
     "none",
     "humidity",
@@ -58,4 +80,5 @@ OPTIONS_BULK = [
     "frost_prediction",
     "hist_adjustment_factor",
     "forecast_adjustment_factor",
+    "season_accumulators",
 ]
@@ -0,0 +1,283 @@
+"""Native sensors created by the bulk options."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import CONF_NAME
+
+from .const import CONF_FORMULA, OPTIONS_BULK
+from .indices import (
+    adjustment_factor,
+    forecast_equivalent_rain,
+    frost_risk,
+    hist_equivalent_rain,
+)
+from .legacy import forecast_adjustment_formula, frost_formula, hist_adjustment_formula
+
+# days the bulk options of earlier versions created history sensors for
+LEGACY_DAYS = 30
+FORECAST_DAYS = 6
+
+DEVICE_CLASSES = {
+    "humidity": SensorDeviceClass.HUMIDITY,
+    "precipitation": SensorDeviceClass.PRECIPITATION,
+    "temperature": SensorDeviceClass.TEMPERATURE,
+    "pressure": SensorDeviceClass.PRESSURE,
+}
+UNITS = {
+    "humidity": "%",
+    "precipitation": "mm",
+    "temperature": "°C",
+    "pressure": "hPa",
+    "wind_direction": "°",
+    "wind_speed": "m/s",
+    "percent": "%",
+}
+STATE_CLASSES = {"measurement": SensorStateClass.MEASUREMENT}
+
+# option: (variable suffix, sensor class, state class, precision)
+FORECAST_OPTIONS = {
+    "forecast_rain": ("rain", "precipitation", "measurement", 2),
+    "forecast_snow": ("snow", "precipitation", "measurement", 2),
+    "forecast_max": ("max", "temperature", "measurement", 2),
+    "forecast_min": ("min", "temperature", "measurement", 2),
+    "forecast_humidity": ("humidity", "humidity", "measurement", 0),
+    "forecast_pop": ("pop", "none", "none", 2),
+    "forecast_wind_speed": ("wind_speed", "wind_speed", "measurement", 2),
+    "forecast_wind_deg": ("wind_deg", "wind_direction", "measurement", 0),
+    "forecast_uvi": ("uvi", "none", "string", 2),
+    "forecast_clouds": ("clouds", "none", "string", 0),
+    "forecast_description": ("description", "none", "string", None),
+}
+HIST_OPTIONS = {
+    "hist_rain": ("rain", "precipitation", "measurement", 2),
+    "hist_snow": ("snow", "precipitation", "measurement", 2),
+    "hist_max": ("max", "temperature", "measurement", 2),
+    "hist_min": ("min", "temperature", "measurement", 2),
+}
+# variable, sensor class, state class, precision
+CURRENT_SENSORS = (
+    ("current_rain", "precipitation", "measurement", 2),
+    ("current_snow", "precipitation", "measurement", 2),
+    ("current_humidity", "humidity", "measurement", 0),
+    ("current_temp", "temperature", "measurement", 2),
+    ("current_pressure", "pressure", "measurement", 0),
+    ("current_wind_speed", "wind_speed", "measurement", 2),
+    ("current_wind_deg", "wind_direction", "measurement", 0),
+    ("current_uvi", "none", "string", 2),
+    ("current_clouds", "none", "string", 0),
+    ("current_description", "none", "string", None),
+)
+SEASON_SENSORS = ("gdd", "chill_hours", "frost_hours")
+
+
+@dataclass(frozen=True, kw_only=True)
+class BulkSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor created by a bulk option."""
+
+    option: str
+    # reads the typed state from the template variables
+    value_fn: Callable[[Mapping], Any]
+    attributes_fn: Callable[[Mapping], dict] | None = None
+    # formula of the template resource earlier versions created
+    legacy_formula: str | None = None
+
+
+def _description(
+    option,
+    key,
+    sensorclass,
+    stateclass,
+    precision,
+    instance,
+    value_fn=None,
+    legacy_formula=None,
+) -> BulkSensorEntityDescription:
+    return BulkSensorEntityDescription(
+        key=key,
+        name=f"OWMH_{instance}_{key}",
+        option=option,
+        device_class=DEVICE_CLASSES.get(sensorclass),
+        native_unit_of_measurement=UNITS.get(sensorclass),
+        state_class=STATE_CLASSES.get(stateclass),
+        suggested_display_precision=precision,
+        value_fn=value_fn or itemgetter(key),
+        legacy_formula=legacy_formula or "{{ " + key + " }}",
+    )
+
+
+def _series(
+    option, keys, sensorclass, stateclass, precision, instance
+) -> BulkSensorEntityDescription:
+    """Describe one sensor for an option, today as the state and all the days."""
+    return BulkSensorEntityDescription(
+        key=option,
+        name=f"OWMH_{instance}_{option}",
+        option=option,
+        device_class=DEVICE_CLASSES.get(sensorclass),
+        native_unit_of_measurement=UNITS.get(sensorclass),
+        state_class=STATE_CLASSES.get(stateclass),
+        suggested_display_precision=precision,
+        value_fn=itemgetter(keys[0]),
+        attributes_fn=lambda wvars: {"values": [wvars[key] for key in keys]},
+    )
+
+
+def _frost(wvars, index):
+    return frost_risk(
+        wvars["current_temp"],
+        wvars["current_dew_point"],
+        wvars["current_wind_speed"],
+        wvars["current_clouds"],
+    )[index]
+
+
+def _hist_adjustment(wvars):
+    return adjustment_factor(
+        hist_equivalent_rain([wvars.get(f"day{i}rain", 0) for i in range(5)])
+    )
+
+
+def _forecast_adjustment(wvars):
+    return adjustment_factor(
+        forecast_equivalent_rain(
+            [wvars.get(f"day{i}rain", 0) for i in range(3)],
+            [wvars["forecast1rain"], wvars["forecast2rain"]],
+            [wvars["forecast1pop"], wvars["forecast2pop"]],
+        )
+    )
+
+
+def bulk_descriptions(options, days, instance, compact=False) -> list:
+    """Return the descriptions of the sensors of the selected options.
+
+    The work is proportional to the options selected, the sensors of an
+    option are generated rather than searched for in the resources. In
+    compact mode the forecast and history options create one series sensor
+    each instead of a sensor per day.
+    """
+    options = set(options or ())
+    descriptions = []
+    for option, (suffix, sensorclass, stateclass, precision) in (
+        FORECAST_OPTIONS.items()
+    ):
+        if option not in options:
+            continue
+        keys = [f"forecast{i}{suffix}" for i in range(FORECAST_DAYS)]
+        if compact:
+            descriptions.append(
+                _series(option, keys, sensorclass, stateclass, precision, instance)
+            )
+            continue
+        descriptions.extend(
+            _description(option, key, sensorclass, stateclass, precision, instance)
+            for key in keys
+        )
+    for option, (suffix, sensorclass, stateclass, precision) in HIST_OPTIONS.items():
+        if option not in options:
+            continue
+        keys = [f"day{i}{suffix}" for i in range(int(days))]
+        if compact:
+            descriptions.append(
+                _series(option, keys, sensorclass, stateclass, precision, instance)
+            )
+            continue
+        descriptions.extend(
+            _description(option, key, sensorclass, stateclass, precision, instance)
+            for key in keys
+        )
+    if "current_obs" in options:
+        descriptions.extend(
+            _description("current_obs", *sensor, instance) for sensor in CURRENT_SENSORS
+        )
+    if "season_accumulators" in options:
+        descriptions.extend(
+            _description("season_accumulators", key, "none", "measurement", 1, instance)
+            for key in SEASON_SENSORS
+        )
+    if "frost_prediction" in options:
+        descriptions.extend(
+            _description(
+                "frost_prediction",
+                f"frost_{kind}",
+                sensorclass,
+                "string",
+                precision,
+                instance,
+                lambda wvars, index=index: _frost(wvars, index),
+                frost_formula(kind, instance)[CONF_FORMULA],
+            )
+            for index, kind, sensorclass, precision in (
+                (1, "risk_level", "none", None),
+                (0, "risk_score", "percent", 2),
+            )
+        )
+    adjustments = (
+        ("hist_adjustment_factor", _hist_adjustment, hist_adjustment_formula),
+        (
+            "forecast_adjustment_factor",
+            _forecast_adjustment,
+            forecast_adjustment_formula,
+        ),
+    )
+    for option, value_fn, legacy in adjustments:
+        if option in options:
+            descriptions.append(
+                _description(
+                    option,
+                    option,
+                    "percent",
+                    "measurement",
+                    2,
+                    instance,
+                    value_fn,
+                    legacy(instance)[CONF_FORMULA],
+                )
+            )
+    return descriptions
+
+
+def legacy_resources(resources, descriptions) -> tuple:
+    """Split the resources into template resources and legacy bulk resources.
+
+    Returns the resources to create template sensors for, and the legacy
+    resources of the descriptions by key, a user modified formula is no
+    longer a legacy resource.
+    """
+    formulas = {
+        (description.name, description.legacy_formula): description.key
+        for description in descriptions
+        if description.legacy_formula is not None
+    }
+    templates = []
+    legacy = {}
+    for resource in resources:
+        key = formulas.get((resource.get(CONF_NAME), resource.get(CONF_FORMULA)))
+        if key is None:
+            templates.append(resource)
+        else:
+            legacy[key] = resource
+    return templates, legacy
+
+
+def retired_descriptions(options, compact, instance) -> list:
+    """Return the descriptions of the sensors the options no longer create."""
+    created = {
+        description.key
+        for description in bulk_descriptions(options, LEGACY_DAYS, instance, compact)
+    }
+    retired = {}
+    for mode in (False, True):
+        for description in bulk_descriptions(OPTIONS_BULK, LEGACY_DAYS, instance, mode):
+            if description.key not in created:
+                retired.setdefault(description.key, description)
+    return list(retired.values())
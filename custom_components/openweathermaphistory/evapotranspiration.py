@@ -0,0 +1,171 @@
+"""FAO-56 Penman-Monteith reference evapotranspiration.
+
+Solar radiation is not reported by the API, it is estimated from the cloud
+cover with the Angstrom formula taking the clear sky fraction as the relative
+sunshine duration. Wind speed is reported at 10m and converted to 2m.
+
+The hourly form accepts floats or numpy arrays, the math functions are passed
+in so a full history can be calculated in one vectorised pass.
+"""
+
+import math
+from types import SimpleNamespace
+
+# solar constant MJ m-2 min-1
+SOLAR_CONSTANT = 0.0820
+# Stefan-Boltzmann constant MJ K-4 m-2 per hour and per day
+STEFAN_BOLTZMANN_HOUR = 2.043e-10
+STEFAN_BOLTZMANN_DAY = 4.903e-9
+# 10m wind speed to 2m
+WIND_2M = 4.87 / math.log(67.8 * 10 - 5.42)
+ALBEDO = 0.23
+
+SCALAR = SimpleNamespace(
+    sin=math.sin,
+    cos=math.cos,
+    tan=math.tan,
+    exp=math.exp,
+    sqrt=math.sqrt,
+    arccos=lambda x: math.acos(min(max(x, -1), 1)),
+    clip=lambda x, low, high: min(max(x, low), high),
+    where=lambda condition, a, b: a if condition else b,
+)
+
+
+def location(lat, lon, elevation) -> tuple:
+    """Return the location used by the calculations."""
+    return (float(lat), float(lon), float(elevation or 0))
+
+
+def _saturation(temp, lib):
+    """Saturation vapour pressure kPa, eq 11."""
+    return 0.6108 * lib.exp(17.27 * temp / (temp + 237.3))
+
+
+def _solar(day_of_year, lat, lib):
+    """Return the inverse distance, declination and sunset hour angle."""
+    phi = lat * math.pi / 180
+    distance = 1 + 0.033 * lib.cos(2 * math.pi * day_of_year / 365)
+    declination = 0.409 * lib.sin(2 * math.pi * day_of_year / 365 - 1.39)
+    sunset = lib.arccos(lib.clip(-math.tan(phi) * lib.tan(declination), -1, 1))
+    return phi, distance, declination, sunset
+
+
+def _day_of_year(timestamp):
+    """Approximate day of the year from a UTC timestamp."""
+    # days since 2000-01-01
+    return (timestamp / 86400 - 10957) % 365.2425 + 1
+
+
+def _psychrometric(pressure, elevation, lib):
+    """Psychrometric constant kPa C-1 from hPa, standard pressure if missing."""
+    standard = 101.3 * ((293 - 0.0065 * elevation) / 293) ** 5.26
+    return 0.000665 * lib.where(pressure > 0, pressure / 10, standard)
+
+
+def _relative_shortwave(clouds, elevation, lib):
+    """Relative shortwave radiation Rs/Rso from the cloud cover."""
+    clear = 0.25 + 0.5 * (1 - clouds / 100)
+    return lib.clip(clear / (0.75 + 2e-5 * elevation), 0.3, 1)
+
+
+def hourly_et0(
+    hour, temp, humidity, wind_speed, pressure, clouds, place, lib=SCALAR
+):
+    """Return the reference ET0 in mm for the hour starting at the timestamp.
+
+    Equations 53 (ET0), 28 to 33 (extraterrestrial radiation) of FAO-56.
+    """
+    lat, lon, elevation = place
+    day_of_year = _day_of_year(hour)
+    phi, distance, declination, sunset = _solar(day_of_year, lat, lib)
+
+    # solar time angle at the midpoint of the hour
+    b = 2 * math.pi * (day_of_year - 81) / 364
+    correction = 0.1645 * lib.sin(2 * b) - 0.1255 * lib.cos(b) - 0.025 * lib.sin(b)
+    utc = (hour % 86400) / 3600 + 0.5
+    omega = math.pi / 12 * ((utc + lon / 15 + correction) - 12)
+    omega = (omega + math.pi) % (2 * math.pi) - math.pi
+    start = lib.clip(omega - math.pi / 24, -sunset, sunset)
+    end = lib.clip(omega + math.pi / 24, -sunset, sunset)
+    extraterrestrial = (
+        12
+        * 60
+        / math.pi
+        * SOLAR_CONSTANT
+        * distance
+        * (
+            (end - start) * math.sin(phi) * lib.sin(declination)
+            + math.cos(phi) * lib.cos(declination) * (lib.sin(end) - lib.sin(start))
+        )
+    )
+    extraterrestrial = lib.clip(extraterrestrial, 0, 10)
+
+    shortwave = (0.25 + 0.5 * (1 - clouds / 100)) * extraterrestrial
+    saturation = _saturation(temp, lib)
+    actual = saturation * humidity / 100
+    longwave = (
+        STEFAN_BOLTZMANN_HOUR
+        * (temp + 273.16) ** 4
+        * (0.34 - 0.14 * lib.sqrt(actual))
+        * (1.35 * _relative_shortwave(clouds, elevation, lib) - 0.35)
+    )
+    net = (1 - ALBEDO) * shortwave - longwave
+    # soil heat flux is a fraction of the net radiation, eq 45 and 46
+    soil = lib.where(extraterrestrial > 0, 0.1 * net, 0.5 * net)
+
+    slope = 4098 * saturation / (temp + 237.3) ** 2
+    psychrometric = _psychrometric(pressure, elevation, lib)
+    wind = wind_speed * WIND_2M
+    et0 = (
+        0.408 * slope * (net - soil)
+        + psychrometric * 37 / (temp + 273) * wind * (saturation - actual)
+    ) / (slope + psychrometric * (1 + 0.34 * wind))
+    return lib.clip(et0, 0, 100)
+
+
+def daily_et0(
+    timestamp, min_temp, max_temp, humidity, wind_speed, pressure, clouds, place
+) -> float:
+    """Return the reference ET0 in mm for a forecast day.
+
+    Equations 6 (ET0) and 21 (extraterrestrial radiation) of FAO-56, the
+    soil heat flux is ignored for daily periods.
+    """
+    lib = SCALAR
+    lat, _lon, elevation = place
+    phi, distance, declination, sunset = _solar(
+        _day_of_year(timestamp), lat, lib
+    )
+    extraterrestrial = (
+        24
+        * 60
+        / math.pi
+        * SOLAR_CONSTANT
+        * distance
+        * (
+            sunset * math.sin(phi) * math.sin(declination)
+            + math.cos(phi) * math.cos(declination) * math.sin(sunset)
+        )
+    )
+    shortwave = (0.25 + 0.5 * (1 - clouds / 100)) * extraterrestrial
+    saturation = (_saturation(max_temp, lib) + _saturation(min_temp, lib)) / 2
+    actual = saturation * humidity / 100
+    longwave = (
+        STEFAN_BOLTZMANN_DAY
+        * ((max_temp + 273.16) ** 4 + (min_temp + 273.16) ** 4)
+        / 2
+        * (0.34 - 0.14 * math.sqrt(actual))
+        * (1.35 * _relative_shortwave(clouds, elevation, lib) - 0.35)
+    )
+    net = (1 - ALBEDO) * shortwave - longwave
+
+    temp = (max_temp + min_temp) / 2
+    slope = 4098 * _saturation(temp, lib) / (temp + 237.3) ** 2
+    psychrometric = _psychrometric(pressure, elevation, lib)
+    wind = wind_speed * WIND_2M
+    et0 = (
+        0.408 * slope * net
+        + psychrometric * 900 / (temp + 273) * wind * (saturation - actual)
+    ) / (slope + psychrometric * (1 + 0.34 * wind))
+    return round(max(et0, 0), 2)
@@ -0,0 +1,79 @@
+"""Share the fetch pipeline between locations in the same grid cell."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+SHARED_CELLS = f"{DOMAIN}_cells"
+
+
+class GridCell:
+    """Stored data and fetch lock shared by the entries in a lat/lon cell."""
+
+    def __init__(self, key, lat, lon, shared=False) -> None:  # noqa: D107
+        self.key = key
+        self.lat = lat
+        self.lon = lon
+        self.shared = shared
+        self.lock = asyncio.Lock()
+        # most recent raw response for each endpoint
+        self.responses = {}
+        # stored data is loaded once and then held in memory
+        self.data = None
+        self.rollup = None
+        self.aggregates = None
+        self._members = {}
+
+    @property
+    def store_key(self) -> str:
+        """Return the .storage key holding the cells data."""
+        return "OWMH_" + self.key
+
+    def join(self, name, maxdays) -> None:
+        """Register an entry and the retention it requires."""
+        self._members[name] = maxdays
+
+    def leave(self, name) -> bool:
+        """Deregister an entry, return True when the cell is no longer used."""
+        self._members.pop(name, None)
+        return not self._members
+
+    def max_days(self) -> int:
+        """Return the longest retention of the member entries."""
+        return max(self._members.values(), default=0)
+
+
+def cell_key(lat, lon, size) -> str:
+    """Return the key of the grid cell containing the location."""
+    row = math.floor(lat / size)
+    col = math.floor(lon / size)
+    return f"cell_{size:g}_{row}_{col}"
+
+
+def get_cell(hass: HomeAssistant, name, lat, lon, size) -> GridCell:
+    """Return the shared cell for the location, or a private one if disabled."""
+    if not size:
+        return GridCell(name, lat, lon)
+
+    key = cell_key(lat, lon, size)
+    cells = hass.data.setdefault(SHARED_CELLS, {})
+    if key not in cells:
+        # all members fetch for the centre of the cell
+        cells[key] = GridCell(
+            key,
+            round((math.floor(lat / size) + 0.5) * size, 4),
+            round((math.floor(lon / size) + 0.5) * size, 4),
+            shared=True,
+        )
+    return cells[key]
+
+
+def release_cell(hass: HomeAssistant, cell: GridCell, name) -> None:
+    """Leave the cell and forget it once the last member has gone."""
+    if cell.leave(name) and cell.shared:
+        hass.data.get(SHARED_CELLS, {}).pop(cell.key, None)
@@ -0,0 +1,69 @@
+"""Frost risk and watering adjustment indices of the bulk sensors."""
+
+# rain in mm that needs no watering
+TARGET_WATER = 10
+# weight of the rain of each past day, the newest first
+HIST_WEIGHTS = (1, 0.5, 0.25, 0.12, 0.06)
+FORECAST_HIST_WEIGHTS = (1, 0.5, 0.25)
+# weight of the expected rain of forecast days 1 and 2
+FORECAST_WEIGHTS = (0.5, 0.25)
+
+FROST_LEVELS = (
+    (80, "CRITICAL: Frost highly likely"),
+    (50, "WARNING: Moderate frost risk"),
+    (25, "LOW: Watch for clearing skies"),
+)
+NO_FROST = "NONE: No frost expected"
+
+
+def frost_risk(temp, dew_point, wind, clouds) -> tuple:
+    """Return the frost risk score and level of the current observations."""
+    # 1. Temperature Risk: Higher points as air temp nears freezing
+    if temp <= 2:
+        t_points = 40
+    elif temp <= 4:
+        t_points = 30
+    elif temp <= 7:
+        t_points = 20
+    else:
+        t_points = 0
+    # 2. Sky Clarity Risk: Clear skies (0% cloud) are the highest risk
+    c_points = (100 - clouds) * 0.4
+    # 3. Wind Risk: Calm air allows frost to settle
+    if wind < 3:
+        w_points = 20
+    elif wind < 8:
+        w_points = 5
+    else:
+        w_points = 0
+    # 4. Dew Point Alignment: High risk if air is saturated near freezing
+    if dew_point <= 0:
+        d_points = 10
+    elif temp - dew_point < 2:
+        d_points = 5
+    else:
+        d_points = 0
+    score = t_points + c_points + w_points + d_points
+    for threshold, level in FROST_LEVELS:
+        if score >= threshold:
+            return round(score, 0), level
+    return round(score, 0), NO_FROST
+
+
+def adjustment_factor(equivalent_rain, target_water=TARGET_WATER) -> float:
+    """Return the fraction of the target water the rain has not provided."""
+    return round(max((target_water - equivalent_rain) / target_water, 0), 2)
+
+
+def hist_equivalent_rain(day_rain) -> float:
+    """Return the equivalent rain of the past days, the newest first."""
+    return sum(rain * weight for rain, weight in zip(day_rain, HIST_WEIGHTS))
+
+
+def forecast_equivalent_rain(day_rain, forecast_rain, forecast_pop) -> float:
+    """Return the equivalent rain of the past days and forecast days 1 and 2."""
+    past = sum(rain * weight for rain, weight in zip(day_rain, FORECAST_HIST_WEIGHTS))
+    return past + sum(
+        rain * pop * weight
+        for rain, pop, weight in zip(forecast_rain, forecast_pop, FORECAST_WEIGHTS)
+    )
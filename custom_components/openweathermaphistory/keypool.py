@@ -0,0 +1,107 @@
+"""Rotate API calls across a pool of OpenWeatherMap keys."""
+
+import hashlib
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# OpenWeatherMap error codes that take a key out of the rotation
+AUTH_ERRORS = {401, 403}
+QUOTA_ERRORS = {429}
+
+
+def fingerprint(key) -> str:
+    """Return a short stable identifier so keys are not persisted in clear."""
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+class KeyPool:
+    """Track the daily usage of each API key and rotate between them."""
+
+    def __init__(self, keys, maxcalls) -> None:  # noqa: D107
+        self._keys = []
+        for key in keys:
+            key = key.strip()
+            if key and key not in self._keys:
+                self._keys.append(key)
+        self._maxcalls = maxcalls
+        self._counts = {}
+        self._dropped = {}
+        self._next = 0
+
+    def __len__(self) -> int:
+        """Return the number of configured keys."""
+        return len(self._keys)
+
+    @property
+    def primary(self):
+        """Return the first configured key."""
+        return self._keys[0]
+
+    def active(self) -> int:
+        """Return the number of keys still in the rotation."""
+        return len([key for key in self._keys if fingerprint(key) not in self._dropped])
+
+    def load(self, record) -> None:
+        """Restore the per key counts from the stored dailycalls record."""
+        self._counts = {}
+        self._dropped = {}
+        for fp, value in record.get("keys", {}).items():
+            self._counts[fp] = value.get("count", 0)
+            if value.get("dropped"):
+                self._dropped[fp] = value["dropped"]
+
+    def reset(self) -> None:
+        """Start a new UTC day, all keys are available again."""
+        self._counts = {}
+        self._dropped = {}
+
+    def record(self, stored=None) -> dict:
+        """Return the per key counts for the dailycalls record.
+
+        Entries sharing a grid cell share one record, the keys of the other
+        entries in the stored record are kept as they are.
+        """
+        record = dict(stored or {})
+        for key in self._keys:
+            fp = fingerprint(key)
+            record[fp] = {"count": self._counts.get(fp, 0)}
+            if fp in self._dropped:
+                record[fp]["dropped"] = self._dropped[fp]
+        return record
+
+    def count(self) -> int:
+        """Return the calls made across all keys today."""
+        return sum(self._counts.get(fingerprint(key), 0) for key in self._keys)
+
+    def remaining(self) -> int:
+        """Return the calls remaining across all keys in the rotation."""
+        remaining = 0
+        for key in self._keys:
+            fp = fingerprint(key)
+            if fp not in self._dropped:
+                remaining += max(0, self._maxcalls - self._counts.get(fp, 0))
+        return remaining
+
+    def next_key(self):
+        """Return the next key with capacity, None when all are exhausted."""
+        for _ in range(len(self._keys)):
+            key = self._keys[self._next % len(self._keys)]
+            self._next += 1
+            fp = fingerprint(key)
+            if fp in self._dropped:
+                continue
+            if self._counts.get(fp, 0) < self._maxcalls:
+                return key
+        return None
+
+    def used(self, key, code=None) -> None:
+        """Count a call against the key and drop it on auth or quota errors."""
+        fp = fingerprint(key)
+        self._counts[fp] = self._counts.get(fp, 0) + 1
+        if code in AUTH_ERRORS:
+            _LOGGER.warning("API key %s rejected, removed from rotation", fp)
+            self._dropped[fp] = "auth"
+        elif code in QUOTA_ERRORS:
+            _LOGGER.warning("API key %s quota exceeded, removed until tomorrow", fp)
+            self._dropped[fp] = "quota"
@@ -0,0 +1,79 @@
+"""Map UTC hours to local day offsets."""
+
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+
+# forecast days covered ahead of today
+FORECAST_DAYS = 8
+
+
+class LocalDays:
+    """Table of the local day offset of each UTC hour around today.
+
+    The table is built from the local midnights of the zone, so days
+    shortened or lengthened by daylight saving are bucketed correctly. It is
+    rebuilt only when the local date or the timezone changes, a lookup is
+    then a single index into the table. In zones whose midnights are not on
+    a UTC hour only times on the hour are looked up in the table.
+    """
+
+    def __init__(self, timezone, days) -> None:  # noqa: D107
+        self.timezone = timezone
+        self.days = int(days)
+        self._tz = ZoneInfo(timezone)
+        self.today = None
+        self._base = 0
+        self._offsets = array("h")
+        # every local midnight is on a UTC hour
+        self._hourly = True
+
+    def refresh(self, timezone=None, days=None) -> bool:
+        """Rebuild the table on a new local date, timezone or retention."""
+        changed = False
+        if timezone is not None and timezone != self.timezone:
+            self.timezone = timezone
+            self._tz = ZoneInfo(timezone)
+            changed = True
+        if days is not None and int(days) != self.days:
+            self.days = int(days)
+            changed = True
+        today = datetime.now(self._tz).toordinal()
+        if changed or today != self.today:
+            self._build(today)
+            return True
+        return False
+
+    def _build(self, today) -> None:
+        self.today = today
+        first = today - self.days
+        midnights = [
+            int(datetime.combine(date.fromordinal(o), time(), self._tz).timestamp())
+            for o in range(first, today + FORECAST_DAYS + 1)
+        ]
+        self._base = midnights[0] - midnights[0] % 3600
+        self._hourly = all(midnight % 3600 == 0 for midnight in midnights)
+        self._offsets = array("h")
+        for hour in range(self._base, midnights[-1], 3600):
+            day = first + bisect_right(midnights, hour) - 1
+            self._offsets.append(today - day)
+
+    def offset(self, timestamp) -> int:
+        """Return the days before today of the local date of the timestamp."""
+        index, seconds = divmod(int(timestamp) - self._base, 3600)
+        if 0 <= index < len(self._offsets) and (self._hourly or not seconds):
+            return self._offsets[index]
+        return self.today - datetime.fromtimestamp(int(timestamp), self._tz).toordinal()
+
+    def ordinal(self, timestamp) -> int:
+        """Return the ordinal of the local date of the timestamp."""
+        return self.today - self.offset(timestamp)
+
+    def date(self, offset) -> date:
+        """Return the local date the number of days before today."""
+        return date.fromordinal(self.today - offset)
+
+    def local(self, timestamp) -> datetime:
+        """Return the timestamp as a local datetime."""
+        return datetime.fromtimestamp(int(timestamp), self._tz)
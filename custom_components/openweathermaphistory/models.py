@@ -0,0 +1,322 @@
+"""Models advanced hour by hour from the rolled up history."""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+import copy
+from datetime import UTC, date, datetime
+
+# degree hour snowmelt, mm per C per hour
+MELT_FACTOR = 0.125
+# fraction of the capacity that can be used before evapotranspiration slows, FAO-56 p
+DEPLETION = 0.5
+# chill hours are counted between these temperatures
+CHILL_MIN = 0
+CHILL_MAX = 7.2
+# hourly precipitation in mm counted as wet
+WET_THRESHOLD = 0.1
+# dry hours that end a rain event
+EVENT_GAP_HOURS = 6
+
+
+class HourlyModel(ABC):
+    """State advanced one hour at a time from the rolled up history.
+
+    New hours are applied in O(1) as they arrive. The state at the end of
+    each local day is kept as a checkpoint, a correction or backloaded hour
+    older than the state resumes from the checkpoint before it, so the state
+    built from hours that have aged out is kept. A change of parameters
+    replays the model from the hours held in the roll up.
+    """
+
+    name = None
+    # raw roll up columns passed to step
+    inputs = ("rain", "snow", "temp", "et0")
+    # keep the state at the end of each day to resume from
+    checkpoints = True
+
+    def __init__(self, params) -> None:  # noqa: D107
+        self.params = list(params)
+        self.hour = None
+        self.state = self.initial()
+        self._replay = False
+        # earliest hour to apply again, None when nothing was rewound
+        self._rewind = None
+        # local date of the last hour applied
+        self._ordinal = None
+        # (hour, local date, state) after the last hour of each day
+        self._checkpoints = []
+
+    @abstractmethod
+    def initial(self) -> dict:
+        """Return the state before any hours are applied."""
+
+    @abstractmethod
+    def step(self, state, *values) -> None:
+        """Apply an hour to the state."""
+
+    @abstractmethod
+    def values(self) -> dict:
+        """Return the template variables."""
+
+    def rewind(self, hour, old=None, new=None) -> None:
+        """Apply the hour again on the next advance if it was already applied.
+
+        A rebuild passes the first hour held, or None when none are held.
+        """
+        if self.hour is None or (hour is not None and hour > self.hour):
+            return
+        if hour is None:
+            self._replay = True
+        elif self._rewind is None or hour < self._rewind:
+            self._rewind = hour
+
+    def load(self, record) -> None:
+        """Restore a saved state, replay if it was saved with other parameters."""
+        if record and record.get("params") == self.params:
+            self.hour = record.get("hour")
+            self.state = record.get("state", self.initial())
+            self._ordinal = record.get("ordinal")
+            self._checkpoints = [
+                tuple(checkpoint) for checkpoint in record.get("checkpoints", [])
+            ]
+        else:
+            self._replay = True
+
+    def record(self) -> dict:
+        """Return the state to save."""
+        return {
+            "params": self.params,
+            "hour": self.hour,
+            "state": self.state,
+            "ordinal": self._ordinal,
+            "checkpoints": self._checkpoints,
+        }
+
+    def pending(self, rollup) -> int:
+        """Return the number of hours the next advance applies."""
+        if self._replay or self.hour is None:
+            return len(rollup.hours)
+        hour = self.hour if self._rewind is None else self._rewind - 1
+        return len(rollup.hours) - bisect_right(rollup.hours, hour)
+
+    def advance(self, rollup) -> None:
+        """Apply the hours after the state, resuming or replaying if rewound."""
+        hours = rollup.hours
+        if self._replay:
+            self._restart()
+        elif self._rewind is not None:
+            self._resume(self._rewind)
+        start = 0 if self.hour is None else bisect_right(hours, self.hour)
+        columns = [rollup.column(field) for field in self.inputs]
+        ordinals = rollup.column("ordinal")
+        for i in range(start, len(hours)):
+            if (
+                self.checkpoints
+                and self._ordinal is not None
+                and ordinals[i] != self._ordinal
+            ):
+                self._checkpoints.append(
+                    (self.hour, self._ordinal, copy.deepcopy(self.state))
+                )
+            self.step(self.state, *(column[i] for column in columns))
+            self.hour = hours[i]
+            self._ordinal = ordinals[i]
+        if hours:
+            self._prune(hours[0])
+
+    def _restart(self) -> None:
+        self.hour = None
+        self.state = self.initial()
+        self._ordinal = None
+        self._checkpoints = []
+        self._replay = False
+        self._rewind = None
+
+    def _resume(self, hour) -> None:
+        """Restore the last checkpoint before the hour."""
+        index = bisect_left([checkpoint[0] for checkpoint in self._checkpoints], hour)
+        if index == 0:
+            self._restart()
+            return
+        self.hour, self._ordinal, state = self._checkpoints[index - 1]
+        self.state = copy.deepcopy(state)
+        del self._checkpoints[index:]
+        self._rewind = None
+
+    def _prune(self, first) -> None:
+        """Drop the checkpoints of aged out days, bar the last one."""
+        index = bisect_left([checkpoint[0] for checkpoint in self._checkpoints], first)
+        del self._checkpoints[: max(index - 1, 0)]
+
+
+class SoilBucket(HourlyModel):
+    """Soil water held up to a capacity, filled by rain and snowmelt.
+
+    Evapotranspiration is at the reference rate until the readily available
+    water is used, then falls with the water remaining. Drainage removes a
+    fixed amount each day.
+    """
+
+    name = "soil"
+
+    def initial(self) -> dict:  # noqa: D102
+        capacity, _drainage = self.params
+        return {"moisture": capacity, "snowpack": 0}
+
+    def step(self, state, rain, snow, temp, et0) -> None:  # noqa: D102
+        capacity, drainage = self.params
+        snowpack = state["snowpack"] + snow
+        melt = min(snowpack, MELT_FACTOR * max(temp, 0))
+        state["snowpack"] = snowpack - melt
+        # excess over the capacity runs off
+        moisture = min(state["moisture"] + rain + melt, capacity)
+        moisture -= et0 * min(1, moisture / (capacity * DEPLETION))
+        moisture -= drainage / 24
+        state["moisture"] = max(moisture, 0)
+
+    def values(self) -> dict:
+        """Return the template variables."""
+        capacity, _drainage = self.params
+        return {
+            "soil_moisture": round(self.state["moisture"], 2),
+            "soil_deficit": round(capacity - self.state["moisture"], 2),
+            "snowpack": round(self.state["snowpack"], 2),
+        }
+
+
+def season_start(value) -> tuple:
+    """Return the month and day of a MM-DD season start."""
+    month, day = (int(part) for part in str(value).split("-"))
+    # validate against a non leap year so 02-29 is rejected
+    date(2023, month, day)
+    return month, day
+
+
+class SeasonAccumulators(HourlyModel):
+    """Growing degree days, chill hours and cold hours since the season start.
+
+    The totals are sums of independent hours, so a corrected or backloaded
+    hour is applied as a difference rather than a replay. The season totals
+    are kept after the hours they were built from have aged out.
+    """
+
+    name = "season"
+    inputs = ("temp", "ordinal")
+    # corrections are applied as differences
+    checkpoints = False
+
+    def __init__(self, params) -> None:  # noqa: D107
+        self._month, self._day = season_start(params[0])
+        self._season = (None, None)
+        super().__init__(params)
+
+    def initial(self) -> dict:  # noqa: D102
+        return {"season": 0, "gdd": 0, "chill_hours": 0, "frost_hours": 0}
+
+    def season(self, ordinal) -> int:
+        """Return the ordinal of the start of the season containing the day."""
+        if self._season[0] != ordinal:
+            day = date.fromordinal(ordinal)
+            start = date(day.year, self._month, self._day)
+            if start > day:
+                start = date(day.year - 1, self._month, self._day)
+            self._season = (ordinal, start.toordinal())
+        return self._season[1]
+
+    def _add(self, state, temp, sign) -> None:
+        _start, base, cap, frost = self.params
+        state["gdd"] += sign * max(min(temp, cap) - base, 0) / 24
+        state["chill_hours"] += sign * (CHILL_MIN < temp <= CHILL_MAX)
+        state["frost_hours"] += sign * (temp < frost)
+
+    def step(self, state, temp, ordinal) -> None:  # noqa: D102
+        season = self.season(ordinal)
+        if season > state["season"]:
+            state.update({**self.initial(), "season": season})
+        if season == state["season"]:
+            self._add(state, temp, 1)
+
+    def rewind(self, hour, old=None, new=None) -> None:  # noqa: D102
+        if old is None and new is None:
+            # a rebuild, the temperatures are unchanged
+            return
+        if self.hour is None or hour > self.hour:
+            return
+        for values, sign in ((old, -1), (new, 1)):
+            if values and self.season(values["ordinal"]) == self.state["season"]:
+                self._add(self.state, values["temp"], sign)
+
+    def values(self) -> dict:
+        """Return the template variables."""
+        return {
+            "season_start": date.fromordinal(self.state["season"]).isoformat()
+            if self.state["season"]
+            else "",
+            "gdd": round(self.state["gdd"], 2),
+            "chill_hours": self.state["chill_hours"],
+            "frost_hours": self.state["frost_hours"],
+        }
+
+
+class RainEvents(HourlyModel):
+    """Rain events segmented as the hours stream in.
+
+    An event starts with a wet hour and ends after a gap of dry hours. Hours
+    missing from the history count as dry, so the gap is measured by time
+    rather than by the hours held. The state is the event in progress, the
+    last completed event and the run of dry hours, so an hour is applied in
+    O(1).
+    """
+
+    name = "events"
+    inputs = ("hour", "rain", "snow")
+
+    def initial(self) -> dict:  # noqa: D102
+        return {"event": None, "last": None, "dry_hours": 0, "hour": None}
+
+    def step(self, state, hour, rain, snow) -> None:  # noqa: D102
+        if state.get("hour") is not None:
+            state["dry_hours"] += max(int(hour - state["hour"]) // 3600 - 1, 0)
+        state["hour"] = hour
+        if state["event"] is not None and state["dry_hours"] >= EVENT_GAP_HOURS:
+            state["last"] = state["event"]
+            state["event"] = None
+        precipitation = rain + snow
+        event = state["event"]
+        if precipitation >= WET_THRESHOLD:
+            state["dry_hours"] = 0
+            if event is None:
+                event = {"start": hour, "end": hour, "total": 0, "peak": 0, "hours": 0}
+                state["event"] = event
+            event["end"] = hour
+            event["hours"] += 1
+            event["peak"] = max(event["peak"], precipitation)
+        else:
+            state["dry_hours"] += 1
+        if event is not None:
+            event["total"] += precipitation
+            if state["dry_hours"] >= EVENT_GAP_HOURS:
+                state["last"] = event
+                state["event"] = None
+
+    def values(self) -> dict:
+        """Return the template variables."""
+        last = self.state["last"] or {}
+        event = self.state["event"] or {}
+        return {
+            "last_event_start": _isoformat(last.get("start")),
+            "last_event_end": _isoformat(last.get("end")),
+            "last_event_total": round(last.get("total", 0), 2),
+            "last_event_peak": round(last.get("peak", 0), 2),
+            "last_event_hours": last.get("hours", 0),
+            "current_event_total": round(event.get("total", 0), 2),
+            "current_event_hours": event.get("hours", 0),
+            "hours_since_rain": self.state["dry_hours"],
+            "current_dry_spell_days": self.state["dry_hours"] // 24,
+        }
+
+
+def _isoformat(hour) -> str:
+    if hour is None:
+        return ""
+    return datetime.fromtimestamp(hour, UTC).isoformat()
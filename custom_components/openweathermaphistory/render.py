@@ -0,0 +1,214 @@
+"""Entry level render pass over the formulas of all the sensors."""
+
+from collections import ChainMap
+from graphlib import CycleError, TopologicalSorter
+import logging
+import time
+from types import MappingProxyType
+
+import jinja2
+
+from .const import CONF_ATTRIBUTES, CONF_FORMULA
+from .templates import evaluate, template_names
+from .variables import plain
+
+_LOGGER = logging.getLogger(__name__)
+# characters stripped from the attribute list
+_ATTRIBUTE_CHARS = str.maketrans("", "", "[]' {}")
+
+
+def attribute_names(attributes) -> list:
+    """Return the variable names of a comma separated attribute list."""
+    if attributes is None:
+        return []
+    return attributes.translate(_ATTRIBUTE_CHARS).split(",")
+
+
+class AttributeProjection:
+    """Read only attributes of the sensors listing the same variables.
+
+    The attribute list is parsed once, the mapping is shared by the sensors
+    and only rebuilt when a variable or sensor it lists has changed.
+    """
+
+    def __init__(self, names, reads) -> None:  # noqa: D107
+        self.names = names
+        # sensors listed, by index
+        self.reads = reads
+        self._inputs = None
+        self._run = None
+        self.value = MappingProxyType({})
+
+    def update(self, run, variables, wvars, versions) -> MappingProxyType:
+        """Return the attributes, rebuilt once a run if an input changed."""
+        if run == self._run:
+            return self.value
+        self._run = run
+        inputs = variables.versions(self.names)
+        if inputs is not None:
+            inputs = (inputs, tuple(versions[read] for read in self.reads))
+        if inputs is not None and inputs == self._inputs:
+            return self.value
+        self._inputs = inputs
+        value = {name: plain(wvars[name]) for name in self.names if name in wvars}
+        if value != self.value:
+            self.value = MappingProxyType(value)
+        return self.value
+
+
+class RenderPass:
+    """Evaluates the formulas and attributes of all the sensors of an entry.
+
+    A formula can read the state of another sensor of the entry by its
+    slugified name, the formulas are evaluated in the dependency order
+    resolved when the pass is built. A sensor is only evaluated when a
+    variable or sensor it reads has changed, the sensors whose state or
+    attributes changed are listed in changed.
+    """
+
+    def __init__(self, resources, keys, variables) -> None:  # noqa: D107
+        self._formulas = [resource[CONF_FORMULA] for resource in resources]
+        # the slugified sensor names
+        self._keys = list(keys)
+        # a variable takes precedence over a sensor of the same name
+        sensors = {
+            key: index for index, key in enumerate(self._keys) if key not in variables
+        }
+        # attributes of each sensor, None when none are requested
+        self._projections = []
+        projections = {}
+        for index, resource in enumerate(resources):
+            attributes = resource.get(CONF_ATTRIBUTES)
+            if attributes is None:
+                self._projections.append(None)
+                continue
+            names = []
+            for name in attribute_names(attributes):
+                if not name or name in names:
+                    continue
+                if name not in variables and name not in sensors:
+                    _LOGGER.warning(
+                        "Attribute %s of sensor %s is not a variable",
+                        name,
+                        self._keys[index],
+                    )
+                    continue
+                names.append(name)
+            names = tuple(names)
+            if names not in projections:
+                projections[names] = AttributeProjection(
+                    names, tuple(sensors[name] for name in names if name in sensors)
+                )
+            self._projections.append(projections[names])
+        # names read by each formula, None when they can not be known
+        self._names = []
+        # other sensors read by each formula
+        self._reads = []
+        # other sensors read by each sensor, attributes included
+        depends = {}
+        for index, formula in enumerate(self._formulas):
+            try:
+                names = tuple(sorted(template_names(formula)))
+            except jinja2.TemplateSyntaxError:
+                names = None
+            self._names.append(names)
+            self._reads.append(
+                tuple(sensors[name] for name in names or () if name in sensors)
+            )
+            depends[index] = set(self._reads[index])
+            if self._projections[index] is not None:
+                depends[index].update(self._projections[index].reads)
+        try:
+            self._order = list(TopologicalSorter(depends).static_order())
+        except CycleError as err:
+            # sensors in a loop read the state of the last update
+            _LOGGER.warning("Sensor formulas reference each other: %s", err.args[1])
+            self._order = list(range(len(self._formulas)))
+        self._results = [None] * len(self._formulas)
+        # sensor states visible to the formulas, by slugified name
+        self._states = {}
+        # change versions of the variables and sensors read at the last render
+        self._inputs = [None] * len(self._formulas)
+        self._versions = [0] * len(self._formulas)
+        self._run = 0
+        self.changed = set()
+        self.elapsed_ms = 0
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._formulas)
+
+    def result(self, index) -> tuple:
+        """Return the state and attributes of a sensor."""
+        return self._results[index] or (0, None)
+
+    def run(self, variables) -> set:
+        """Evaluate the sensors whose inputs changed, return those that changed."""
+        started = time.perf_counter()
+        self.changed = set()
+        self._run += 1
+        wvars = ChainMap(variables, self._states)
+        for index in self._order:
+            previous = self._results[index]
+            attributes = None
+            if self._projections[index] is not None:
+                attributes = self._projections[index].update(
+                    self._run, variables, wvars, self._versions
+                )
+            inputs = None
+            if self._names[index] is not None:
+                versions = variables.versions(self._names[index])
+                if versions is not None:
+                    inputs = (
+                        versions,
+                        tuple(self._versions[read] for read in self._reads[index]),
+                    )
+            if previous is not None and inputs is not None and (
+                inputs == self._inputs[index]
+            ):
+                if attributes is previous[1]:
+                    continue
+                result = (previous[0], attributes)
+            else:
+                self._inputs[index] = inputs
+                result = (self._state(index, wvars), attributes)
+            if result == previous:
+                continue
+            self._results[index] = result
+            self._states[self._keys[index]] = result[0]
+            self._versions[index] += 1
+            self.changed.add(index)
+        self.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        _LOGGER.debug(
+            "Rendered %s of %s sensors in %sms",
+            len(self.changed),
+            len(self._formulas),
+            self.elapsed_ms,
+        )
+        return self.changed
+
+    def _state(self, index, wvars):
+        """Return the state of a sensor."""
+        formula = self._formulas[index]
+        # process the template and handle errors
+        try:
+            state = evaluate(formula, wvars)
+        except jinja2.UndefinedError as err:
+            _LOGGER.warning(
+                "Variable not defined in custom formula: %s \n %s", formula, err
+            )
+            state = 0
+        except jinja2.TemplateSyntaxError as err:
+            _LOGGER.warning(
+                "Syntax error could not evaluate custom formula: %s \n %s", formula, err
+            )
+            state = 0
+        except Exception:
+            # a failing formula only affects its own sensor
+            _LOGGER.exception("Could not evaluate custom formula: %s", formula)
+            return self.result(index)[0]
+        # numeric results are returned as a float
+        try:
+            state = float(state)
+        except ValueError:
+            pass
+        return state
@@ -0,0 +1,546 @@
+"""Incremental roll up of the hourly history into local days."""
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+from functools import partial
+import time as clock
+from zoneinfo import ZoneInfo
+
+from .evapotranspiration import hourly_et0
+from .localdays import LocalDays
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with Home Assistant
+    np = None
+
+# raw values kept to recalculate the day totals
+RAW = ("rain", "snow", "temp", "et0")
+# hourly inputs of the reference evapotranspiration
+ET0_INPUTS = ("temp", "humidity", "wind_speed", "pressure", "clouds")
+# hourly series exposed for plotly and the rounding applied to each
+SERIES = {
+    "rain": 2,
+    "snow": 2,
+    "temp": 2,
+    "pressure": 2,
+    "clouds": 0,
+    "humidity": 2,
+    "wind_speed": 2,
+    "uvi": 0,
+}
+# columns with prefix sums, the template functions only total rain and snow
+TOTALS = ("rain", "snow", "et0")
+SUMS = ("rain", "snow")
+# columns with sparse tables for window min/max
+EXTREMES = ("temp",)
+# below this many hours the pure python rebuild is faster, see bench_processing.py
+NUMPY_MIN_HOURS = 24
+
+
+class DailyRollup:
+    """Per local day accumulators and hourly series, maintained as hours arrive.
+    Hours are kept sorted in parallel columns. Adding the newest hour updates
+    the accumulators of its day in O(1). Older hours, from a backload or a
+    backfill, are merged into the columns in one pass per batch. Ageing out
+    removes whole days from the front. A full rebuild is only needed when the
+    timezone or retention changes.
+
+    Prefix sums over the hours answer window totals with two lookups, the
+    sparse tables answer window min/max with two lookups. Both are extended
+    in O(log n) as the newest hour is added and trimmed on ageing out. The
+    sparse tables are rebuilt in O(n log n) on the first query after an older
+    hour is added or corrected, at most once per refresh. They also answer the 24 hour periods before now of the
+    day variables, the local calendar days are the accumulated days.
+    """
+
+    def __init__(self, timezone, max_days, place=None) -> None:  # noqa: D107
+        self.timezone = timezone
+        self.max_days = max_days
+        # location for the evapotranspiration, none disables it
+        self.place = place
+        self._tz = ZoneInfo(timezone)
+        self.localdays = LocalDays(timezone, max_days)
+        self.localdays.refresh()
+        self.hours = []
+        self.ordinals = []
+        self.time = []
+        self.series = {field: [] for field in SERIES}
+        self._raw = {field: [] for field in RAW}
+        self._days = {}
+        self._prefix = {field: [0.0] for field in TOTALS}
+        # sparse tables of the queried columns, dropped after an older change
+        self._sparse = {}
+        # bumped on every change so views can be cached
+        self.version = 0
+        self._views = {}
+        # called with the hour and its old and new raw values when an hour
+        # before the newest is changed, with only the first hour on a rebuild
+        self.listeners = []
+
+    def matches(self, timezone, max_days, place=None) -> bool:
+        """Return True if built for the timezone, retention and place."""
+        return (timezone, max_days, place) == (self.timezone, self.max_days, self.place)
+
+    def rebuild(self, history) -> None:
+        """Recalculate everything from the stored history."""
+        self._sparse = {}
+        if np is not None and len(history) >= NUMPY_MIN_HOURS:
+            self._rebuild_numpy(history)
+        else:
+            self._rebuild_python(history)
+        self.version += 1
+        self.rewound()
+
+    def rewound(self) -> None:
+        """Tell the listeners every hour may have changed."""
+        self._rewound(self.first())
+
+    def _rebuild_python(self, history) -> None:
+        self.hours = []
+        self.ordinals = []
+        self.time = []
+        self.series = {field: [] for field in SERIES}
+        self._raw = {field: [] for field in RAW}
+        self._days = {}
+        self._prefix = {field: [0.0] for field in TOTALS}
+        for hour, data in sorted(history.items(), key=lambda x: int(x[0])):
+            self._append(int(hour), data)
+
+    def _rebuild_numpy(self, history) -> None:
+        items = sorted(history.items(), key=lambda x: int(x[0]))
+        hours = np.fromiter((int(hour) for hour, _ in items), np.int64, len(items))
+        columns = {
+            field: np.fromiter(
+                (data.get(field, 0) for _, data in items), np.float64, len(items)
+            )
+            for field in SERIES
+        }
+        if self.place is None:
+            columns["et0"] = np.zeros(len(items))
+        else:
+            columns["et0"] = hourly_et0(
+                hours, *(columns[field] for field in ET0_INPUTS), self.place, np
+            )
+
+        # bucket the hours by the local midnights spanning the data
+        first = self._local(int(hours[0])).date()
+        last = self._local(int(hours[-1])).date()
+        ordinals = np.arange(first.toordinal(), last.toordinal() + 2)
+        midnights = np.array(
+            [
+                datetime.combine(date.fromordinal(int(o)), time(), self._tz).timestamp()
+                for o in ordinals
+            ]
+        )
+        index = np.searchsorted(midnights, hours, side="right") - 1
+
+        # utc offset of each hour, resolved per hour only on transition days
+        starts = np.array([self._offset(m) for m in midnights])
+        offsets = starts[index]
+        for day in np.flatnonzero(starts[:-1] != starts[1:]):
+            for i in np.flatnonzero(index == day):
+                offsets[i] = self._offset(int(hours[i]))
+        local = (hours + offsets).astype("datetime64[s]")
+
+        # day totals over the contiguous runs of each day
+        starts_at = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        days = ordinals[index[starts_at]]
+        rain = np.add.reduceat(columns["rain"], starts_at)
+        snow = np.add.reduceat(columns["snow"], starts_at)
+        low = np.minimum.reduceat(columns["temp"], starts_at)
+        high = np.maximum.reduceat(columns["temp"], starts_at)
+        et0 = np.add.reduceat(columns["et0"], starts_at)
+
+        self.hours = hours.tolist()
+        self.ordinals = ordinals[index].tolist()
+        self.time = np.datetime_as_string(local, unit="m").tolist()
+        self.series = {
+            field: np.round(columns[field], places).tolist()
+            for field, places in SERIES.items()
+        }
+        self._raw = {field: columns[field].tolist() for field in RAW}
+        self._prefix = {
+            field: np.r_[0.0, np.cumsum(columns[field])].tolist() for field in TOTALS
+        }
+        self._days = {
+            int(day): {
+                "rain": float(rain[i]),
+                "snow": float(snow[i]),
+                "min_temp": min(float(low[i]), 999),
+                "max_temp": max(float(high[i]), -999),
+                "et0": float(et0[i]),
+            }
+            for i, day in enumerate(days)
+        }
+
+    def _offset(self, timestamp) -> int:
+        return int(self._local(int(timestamp)).utcoffset().total_seconds())
+
+    def today(self) -> int:
+        """Return the ordinal of the current local date."""
+        self.localdays.refresh()
+        return self.localdays.today
+
+    def first(self):
+        """Return the oldest hour held."""
+        return self.hours[0] if self.hours else None
+
+    def last(self):
+        """Return the newest hour held."""
+        return self.hours[-1] if self.hours else None
+
+    def ingest(self, hour, data) -> None:
+        """Add a new hour or replace a corrected one."""
+        hour = int(hour)
+        if not self.hours or hour > self.hours[-1]:
+            self._append(hour, data)
+        else:
+            index = bisect_left(self.hours, hour)
+            old = None
+            if index < len(self.hours) and self.hours[index] == hour:
+                old = self._row(index)
+                self._replace(index, data)
+            else:
+                self._insert(index, hour, data)
+            self._rewound(hour, old, self._row(index))
+        self.version += 1
+
+    def ingest_many(self, items) -> None:
+        """Add a batch of hours, merged into the columns in a single pass."""
+        added = []
+        for hour, data in sorted((int(hour), data) for hour, data in items):
+            if not self.hours or hour > self.hours[-1]:
+                self._append(hour, data)
+                continue
+            index = bisect_left(self.hours, hour)
+            if index < len(self.hours) and self.hours[index] == hour:
+                # corrected hours are replaced one at a time
+                self.ingest(hour, data)
+            else:
+                added.append((index, hour, data))
+        if added:
+            self._merge(added)
+            for offset, (index, hour, _data) in enumerate(added):
+                self._rewound(hour, None, self._row(index + offset))
+        self.version += 1
+
+    def evict(self, oldest) -> list:
+        """Age out the days before the oldest ordinal, return the removed hours."""
+        count = bisect_left(self.ordinals, oldest)
+        if not count:
+            return []
+        removed = self.hours[:count]
+        for ordinal in set(self.ordinals[:count]):
+            self._days.pop(ordinal, None)
+        del self.hours[:count]
+        del self.ordinals[:count]
+        del self.time[:count]
+        for values in (*self.series.values(), *self._raw.values()):
+            del values[:count]
+        # differences of the remaining prefix sums are unchanged
+        for values in self._prefix.values():
+            del values[:count]
+        # the first level is the column itself, the others lose as many entries
+        for tables in self._sparse.values():
+            for table in tables[1:]:
+                del table[:count]
+            while len(tables) > 1 and not tables[-1]:
+                tables.pop()
+        self.version += 1
+        return removed
+
+    def windows(self, now, max_days) -> dict:
+        """Return the totals of the 24 hour periods before now.
+
+        Period 0 holds the hours up to 24 hours before now, period 1 the 24
+        hours before that. Periods with no hours are left out.
+        """
+        processed = {}
+        end = int(now) + 1
+        for offset in range(int(max_days)):
+            start = end - 86400
+            low, high = self._span(start, end)
+            if low < high:
+                processed[offset] = {
+                    "rain": self.total("rain", start, end),
+                    "snow": self.total("snow", start, end),
+                    "min_temp": self.extreme("temp", start, end, high=False),
+                    "max_temp": self.extreme("temp", start, end),
+                    "et0": self.total("et0", start, end),
+                }
+            end = start
+        return processed
+
+    def days(self, today, max_days) -> dict:
+        """Return the local calendar day totals keyed by days before today."""
+        processed = {}
+        for offset in range(int(max_days)):
+            day = self._days.get(today - offset)
+            if day is None:
+                continue
+            processed[offset] = {
+                "rain": round(day["rain"], 2),
+                "snow": day["snow"],
+                "min_temp": day["min_temp"],
+                "max_temp": day["max_temp"],
+                "et0": round(day["et0"], 2),
+            }
+        return processed
+
+    def deficit(self, today, max_days) -> float:
+        """Return the evapotranspiration not replaced by rain over the days."""
+        balance = 0
+        for offset in range(int(max_days)):
+            day = self._days.get(today - offset)
+            if day is not None:
+                balance += day["et0"] - day["rain"]
+        return round(max(balance, 0), 2)
+
+    def plotly(self, today, max_days) -> dict:
+        """Return the hourly series for the retention of an entry."""
+        start = bisect_left(self.ordinals, today - int(max_days) + 1)
+        key = (self.version, start)
+        if key not in self._views:
+            # the series only change when hours are added or aged out
+            self._views = {
+                key: {
+                    "plotly_time": self.time[start:],
+                    **{
+                        f"plotly_{field}": values[start:]
+                        for field, values in self.series.items()
+                    },
+                }
+            }
+        return self._views[key]
+
+    def column(self, field) -> list:
+        """Return the raw hourly values of rain, snow, temp, et0, ordinal or hour."""
+        if field == "ordinal":
+            return self.ordinals
+        if field == "hour":
+            return self.hours
+        return self._raw[field]
+
+    def _row(self, index) -> dict:
+        row = {field: self._raw[field][index] for field in RAW}
+        row["ordinal"] = self.ordinals[index]
+        return row
+
+    def _rewound(self, hour, old=None, new=None) -> None:
+        for listener in self.listeners:
+            listener(hour, old, new)
+
+    def timestamp(self, value) -> float:
+        """Return a template time, epoch or ISO local time, as a timestamp."""
+        if isinstance(value, datetime):
+            moment = value
+        else:
+            try:
+                return float(value)
+            except ValueError:
+                moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=self._tz)
+        return moment.timestamp()
+
+    def _span(self, start, end) -> tuple:
+        low = bisect_left(self.hours, start)
+        high = len(self.hours) if end is None else bisect_left(self.hours, end)
+        return low, max(low, high)
+
+    def total(self, field, start, end=None) -> float:
+        """Return the total of the hours from start up to end."""
+        low, high = self._span(start, end)
+        prefix = self._prefix[field]
+        return round(prefix[high] - prefix[low], 2)
+
+    def extreme(self, field, start, end=None, high=True) -> float | None:
+        """Return the max, or min, of the hours from start up to end.
+
+        None when no hours are held in the window.
+        """
+        first, last = self._span(start, end)
+        if first == last:
+            return None
+        tables = self._sparse.get((field, high))
+        if tables is None:
+            tables = self._sparse_table(self._raw[field], max if high else min)
+            self._sparse[(field, high)] = tables
+        # two overlapping power of two blocks cover the window
+        level = (last - first).bit_length() - 1
+        table = tables[level]
+        pick = max if high else min
+        return round(pick(table[first], table[last - (1 << level)]), 2)
+
+    def _sparse_table(self, values, pick) -> list:
+        tables = [values]
+        width = 1
+        while width * 2 <= len(values):
+            previous = tables[-1]
+            tables.append(
+                [
+                    pick(previous[i], previous[i + width])
+                    for i in range(len(previous) - width)
+                ]
+            )
+            width *= 2
+        return tables
+
+    def _extend_sparse(self) -> None:
+        # the newest hour adds the block ending on it to each level
+        for (_field, high), tables in self._sparse.items():
+            pick = max if high else min
+            count = len(tables[0])
+            level = 1
+            while 1 << level <= count:
+                previous = tables[level - 1]
+                first = count - (1 << level)
+                if level == len(tables):
+                    tables.append([])
+                tables[level].append(
+                    pick(previous[first], previous[first + (1 << (level - 1))])
+                )
+                level += 1
+
+    def functions(self) -> dict:
+        """Return the rolling window queries as template functions."""
+
+        def window(query):
+            return {
+                "last": lambda hours: query(clock.time() - float(hours) * 3600),
+                "since": lambda start: query(self.timestamp(start)),
+                "between": lambda start, end: query(
+                    self.timestamp(start), self.timestamp(end)
+                ),
+            }
+
+        functions = {}
+        for field in SUMS:
+            for name, function in window(partial(self.total, field)).items():
+                functions[f"{field}_{name}"] = function
+        for field in EXTREMES:
+            for extreme, high in (("max", True), ("min", False)):
+                query = partial(self.extreme, field, high=high)
+                for name, function in window(query).items():
+                    functions[f"{field}_{extreme}_{name}"] = function
+        return functions
+
+    def _local(self, hour):
+        return datetime.fromtimestamp(hour, tz=self._tz)
+
+    def _accumulate(self, ordinal, data) -> None:
+        day = self._days.get(ordinal)
+        if day is None:
+            day = {"rain": 0, "snow": 0, "min_temp": 999, "max_temp": -999, "et0": 0}
+            self._days[ordinal] = day
+        day["rain"] += data["rain"]
+        day["et0"] += data["et0"]
+        day["snow"] += data["snow"]
+        day["min_temp"] = min(data["temp"], day["min_temp"])
+        day["max_temp"] = max(data["temp"], day["max_temp"])
+
+    def _columns(self, data) -> dict:
+        return {
+            field: round(data.get(field, 0), places)
+            for field, places in SERIES.items()
+        }
+
+    def _values(self, hour, data) -> dict:
+        values = {field: data[field] for field in ("rain", "snow", "temp")}
+        values["et0"] = 0
+        if self.place is not None:
+            values["et0"] = float(
+                hourly_et0(
+                    hour, *(data.get(field, 0) for field in ET0_INPUTS), self.place
+                )
+            )
+        return values
+
+    def _append(self, hour, data) -> None:
+        values = self._values(hour, data)
+        local = self._local(hour)
+        ordinal = self.localdays.ordinal(hour)
+        self.hours.append(hour)
+        self.ordinals.append(ordinal)
+        self.time.append(local.strftime("%Y-%m-%dT%H:%M"))
+        for field, value in self._columns(data).items():
+            self.series[field].append(value)
+        for field in RAW:
+            self._raw[field].append(values[field])
+        for field, prefix in self._prefix.items():
+            prefix.append(prefix[-1] + values[field])
+        self._extend_sparse()
+        self._accumulate(ordinal, values)
+
+    def _insert(self, index, hour, data) -> None:
+        values = self._values(hour, data)
+        local = self._local(hour)
+        ordinal = self.localdays.ordinal(hour)
+        self.hours.insert(index, hour)
+        self.ordinals.insert(index, ordinal)
+        self.time.insert(index, local.strftime("%Y-%m-%dT%H:%M"))
+        for field, value in self._columns(data).items():
+            self.series[field].insert(index, value)
+        for field in RAW:
+            self._raw[field].insert(index, values[field])
+        self._reprefix(index)
+        self._accumulate(ordinal, values)
+
+    def _merge(self, added) -> None:
+        # the hours are new and sorted, index is the position in the old columns
+        positions = [index for index, _hour, _data in added]
+        rows = []
+        for _index, hour, data in added:
+            values = self._values(hour, data)
+            ordinal = self.localdays.ordinal(hour)
+            rows.append((hour, ordinal, values, self._columns(data)))
+            self._accumulate(ordinal, values)
+
+        def merge(column, values) -> None:
+            merged = []
+            start = 0
+            for position, value in zip(positions, values):
+                merged.extend(column[start:position])
+                merged.append(value)
+                start = position
+            merged.extend(column[start:])
+            column[:] = merged
+
+        merge(self.hours, [row[0] for row in rows])
+        merge(self.ordinals, [row[1] for row in rows])
+        merge(
+            self.time,
+            [self._local(row[0]).strftime("%Y-%m-%dT%H:%M") for row in rows],
+        )
+        for field in SERIES:
+            merge(self.series[field], [row[3][field] for row in rows])
+        for field in RAW:
+            merge(self._raw[field], [row[2][field] for row in rows])
+        self._reprefix(positions[0])
+
+    def _replace(self, index, data) -> None:
+        values = self._values(self.hours[index], data)
+        for field, value in self._columns(data).items():
+            self.series[field][index] = value
+        for field in RAW:
+            self._raw[field][index] = values[field]
+        self._reprefix(index)
+        # min and max can not be reversed, recalculate the day from its hours
+        ordinal = self.ordinals[index]
+        self._days.pop(ordinal, None)
+        start = bisect_left(self.ordinals, ordinal)
+        end = bisect_right(self.ordinals, ordinal)
+        for i in range(start, end):
+            self._accumulate(
+                ordinal, {field: self._raw[field][i] for field in RAW}
+            )
+
+    def _reprefix(self, index) -> None:
+        # redo the sums from the first changed hour, once per batch, the
+        # sparse tables are rebuilt on the next query
+        self._sparse = {}
+        for field, prefix in self._prefix.items():
+            del prefix[index + 1 :]
+            for value in self._raw[field][index:]:
+                prefix.append(prefix[-1] + value)
@@ -4,9 +4,6 @@ from __future__ import annotations
 
 import logging
 
-import jinja2
-
-from homeassistant.components.persistent_notification import async_create, async_dismiss
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
@@ -20,20 +17,26 @@ from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
 )
+from homeassistant.util import slugify
 
 from .const import (
     ATTRIBUTION,
-    CONF_ATTRIBUTES,
-    CONF_FORMULA,
+    CONF_COMPACT_SENSORS,
+    CONF_CREATE_SENSORS,
     CONF_INTIAL_DAYS,
     CONF_MAX_DAYS,
     CONF_PRECISION,
     CONF_SENSORCLASS,
     CONF_STATECLASS,
     CONF_UID,
-    CONST_INITIAL,
     DOMAIN,
 )
+from .descriptions import (
+    BulkSensorEntityDescription,
+    bulk_descriptions,
+    legacy_resources,
+)
+from .render import RenderPass
 from .weatherhistory import Weather
 
 _LOGGER = logging.getLogger(__name__)
@@ -51,27 +54,52 @@ async def async_setup_entry(
     weather = shared["weather"]
     coordinator = shared["coordinator"]
 
-    sensors = []
-    for resource in config[CONF_RESOURCES]:
-        if resource.get("enabled", True):
-            sensor = WeatherHistory(hass, config, resource, weather, coordinator)
-            sensors.append(sensor)
+    # the bulk option sensors are native, read straight from the variables
+    options = config.get(CONF_CREATE_SENSORS)
+    days = max(config.get(CONF_MAX_DAYS, 5), config.get(CONF_INTIAL_DAYS, 5))
+    descriptions = bulk_descriptions(options, days, config[CONF_NAME])
+    # earlier versions created template resources for them, reuse their ids
+    templates, legacy = legacy_resources(config[CONF_RESOURCES], descriptions)
+    if config.get(CONF_COMPACT_SENSORS, False):
+        descriptions = bulk_descriptions(options, days, config[CONF_NAME], True)
+    resources = [resource for resource in templates if resource.get("enabled", True)]
+    # the formulas of all the sensors are evaluated in one pass per update
+    render_pass = RenderPass(
+        resources,
+        [slugify(resource[CONF_NAME]) for resource in resources],
+        weather.variables(),
+    )
+    await weather.async_render(render_pass)
+    coordinator.render_pass = render_pass
+
+    sensors = [
+        WeatherHistory(hass, config, resource, weather, coordinator, render_pass, index)
+        for index, resource in enumerate(resources)
+    ]
+
+    bulk = [
+        WeatherBulkSensor(
+            weather,
+            coordinator,
+            description,
+            legacy.get(description.key, {}).get(CONF_UID)
+            or f"{config_entry.entry_id}_{description.key}",
+        )
+        for description in descriptions
+        if legacy.get(description.key, {}).get("enabled", True)
+    ]
 
-    async_add_entities(sensors)
+    async_add_entities(sensors + bulk)
 
     async def handle_event(event_data):
         if event_data.data.get("entry") != config_entry.data.get("name"):
             return
 
-        if not sensors:
-            return
-
+        # listed by the weather, an entry may have no template sensors
         if event_data.data.get("action") == "list_variables":
-            sensors[0].list_vars()
-        elif event_data.data.get("action") == "api_call":
-            await sensors[0].api_call(event_data.data.get("api"))
+            weather.list_vars()
 
-    hass.bus.async_listen("owmh_event", handle_event)
+    config_entry.async_on_unload(hass.bus.async_listen("owmh_event", handle_event))
     return True
 
 
@@ -95,6 +123,8 @@ class WeatherHistory(CoordinatorEntity, SensorEntity):
         resource,
         weather: Weather,
         coordinator: CoordinatorEntity,
+        render_pass: RenderPass,
+        index: int,
     ) -> None:
         # subscribe to the API data coordinator
         super().__init__(coordinator)
@@ -104,31 +134,27 @@ class WeatherHistory(CoordinatorEntity, SensorEntity):
         self._weather = weather
         self._extra_attributes = None
         self._name = resource[CONF_NAME]
-        self._formula = resource[CONF_FORMULA]
-        self._attributes = resource.get(CONF_ATTRIBUTES)
-        self._initdays = config.get(CONF_INTIAL_DAYS)
-        self._maxdays = config.get(CONF_MAX_DAYS)
         self._sensor_class = resource.get(CONF_SENSORCLASS, None)
         self._state_class = resource.get(CONF_STATECLASS, None)
         self._precision = resource.get(CONF_PRECISION, None)
         self._uuid = resource.get(CONF_UID)
         self._hidden_by = resource.get("hidden_by")
+        # the state is evaluated for all the sensors of the entry in one pass
+        self._render = render_pass
+        self._index = index
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self.determine_state()
-        self.async_write_ha_state()
+        # the data changes at most hourly, only write a changed state
+        if self.determine_state():
+            self.async_write_ha_state()
 
     async def async_added_to_hass(self):
         """Add to Hass."""
         self._hass.async_create_task(self.async_update())
         await super().async_added_to_hass()
 
-    async def api_call(self, api):
-        """Call API."""
-        await self._weather.show_call_data(api)
-
     async def async_update(self):
         """Update the sensor."""
         # return
@@ -208,134 +234,58 @@ class WeatherHistory(CoordinatorEntity, SensorEntity):
         """Return the state attributes."""
         return self._extra_attributes
 
-    def determine_state(self):
-        """Determine the sensor state."""
-
-        try:
-            self._state = float(
-                self._evaluate_custom_formula(
-                    self._formula, self._update_vars(self._weather)
-                )
-            )
-        except ValueError:
-            self._state = self._evaluate_custom_formula(
-                self._formula, self._update_vars(self._weather)
-            )
-        # return the attributes if requested
-        if self._attributes is not None:
-            self._extra_attributes = self._evaluate_custom_attr(
-                self._attributes, self._update_vars(self._weather)
-            )
-
-    def _evaluate_custom_formula(self, formula: str, wvars: dict):
-        """Evaluate the formula/template."""
-        environment = jinja2.Environment()
-        template = environment.from_string(formula)
-        # process the template and handle errors
-        try:
-            return template.render(wvars)
-        except jinja2.UndefinedError as err:
-            _LOGGER.warning(
-                "Variable not defined in custom formula: %s \n %s", formula, err
-            )
-            return 0
-        except jinja2.TemplateSyntaxError as err:
-            _LOGGER.warning(
-                "Syntax error could not evaluate custom formula: %s \n %s", formula, err
-            )
-            return 0
-
-    def _evaluate_custom_attr(self, attributes: list, wvars: dict):
-        """Take the list of vars and build the attrs dictionaty."""
-
-        attrs = {}
-        table = str.maketrans("", "", "[]' {}")
-        attrs_list = attributes.translate(table).split(",")
-        for item in attrs_list:
-            if item in wvars:
-                attrs.update({item: wvars[item]})
-        return attrs
-
-    def _update_vars(self, weather: Weather):
-        wvars = {}
-        # default to initial days variable
-        # need to define 'dummy' versions in the config flow as well
-        for i in range(int(max(weather.max_days(), self._initdays))):
-            wvars[f"day{i}rain"] = weather.processed_value(i, "rain")
-            wvars[f"day{i}snow"] = weather.processed_value(i, "snow")
-            wvars[f"day{i}max"] = weather.processed_value(i, "max_temp")
-            wvars[f"day{i}min"] = weather.processed_value(i, "min_temp")
-
-        for i in range(int(max(weather.max_days(), self._initdays))):
-            wvars[f"aggregate{i}date"] = weather.processed_value(f"a{i}", "date")
-            wvars[f"aggregate{i}precipitation"] = weather.processed_value(
-                f"a{i}", "precipitation"
-            )
-            wvars[f"aggregate{i}max"] = weather.processed_value(f"a{i}", "max_temp")
-            wvars[f"aggregate{i}min"] = weather.processed_value(f"a{i}", "min_temp")
-
-        # forecast provides 7 days of data
-        for i in range(0, 6):  # noqa: PIE808
-            wvars[f"forecast{i}pop"] = weather.processed_value(f"f{i}", "pop")
-            wvars[f"forecast{i}rain"] = weather.processed_value(f"f{i}", "rain")
-            wvars[f"forecast{i}snow"] = weather.processed_value(f"f{i}", "snow")
-            wvars[f"forecast{i}humidity"] = weather.processed_value(f"f{i}", "humidity")
-            wvars[f"forecast{i}max"] = weather.processed_value(f"f{i}", "max_temp")
-            wvars[f"forecast{i}min"] = weather.processed_value(f"f{i}", "min_temp")
-            wvars[f"forecast{i}wind_deg"] = weather.processed_value(f"f{i}", "wind_deg")
-            wvars[f"forecast{i}wind_speed"] = weather.processed_value(
-                f"f{i}", "wind_speed"
-            )
-            wvars[f"forecast{i}uvi"] = weather.processed_value(f"f{i}", "uvi")
-            wvars[f"forecast{i}clouds"] = weather.processed_value(f"f{i}", "clouds")
-            wvars[f"forecast{i}description"] = weather.processed_value(
-                f"f{i}", "description"
-            )
-
-        # current observations
-        wvars["current_rain"] = weather.processed_value("current", "rain")
-        wvars["current_snow"] = weather.processed_value("current", "snow")
-        wvars["current_humidity"] = weather.processed_value("current", "humidity")
-        wvars["current_temp"] = weather.processed_value("current", "temp")
-        wvars["current_pressure"] = weather.processed_value("current", "pressure")
-        wvars["current_wind_deg"] = weather.processed_value("current", "wind_deg")
-        wvars["current_wind_speed"] = weather.processed_value("current", "wind_speed")
-        wvars["current_uvi"] = weather.processed_value("current", "uvi")
-        wvars["current_clouds"] = weather.processed_value("current", "clouds")
-        wvars["current_description"] = weather.processed_value("current", "description")
-        wvars["current_dew_point"] = weather.processed_value("current", "dew_point")
-        # special values
-        wvars["remaining_backlog"] = weather.remaining_backlog()
-        wvars["daily_count"] = weather.daily_count()
-        wvars["hourly_time"] = weather.processed_value("plotly", "plotly_time")
-        wvars["hourly_rain"] = weather.processed_value("plotly", "plotly_rain")
-        wvars["hourly_snow"] = weather.processed_value("plotly", "plotly_snow")
-        wvars["hourly_temp"] = weather.processed_value("plotly", "plotly_temp")
-        wvars["hourly_pressure"] = weather.processed_value("plotly", "plotly_pressure")
-        wvars["hourly_clouds"] = weather.processed_value("plotly", "plotly_clouds")
-        wvars["hourly_humidity"] = weather.processed_value("plotly", "plotly_humidity")
-        wvars["hourly_wind_speed"] = weather.processed_value(
-            "plotly", "plotly_wind_speed"
-        )
-        wvars["hourly_uvi"] = weather.processed_value("plotly", "plotly_uvi")
-
-        return wvars
-
-    def list_vars(self):
-        """List all available variables."""
-        wvars = self._update_vars(self._weather)
-
-        card = "```" + chr(10)
-        card += f"Configured max days: {self._maxdays}" + chr(10)
-        card += f"Configured initial days: {self._initdays}" + chr(10)
-        for name, value in wvars.items():
-            card += f"{name}: {value}" + chr(10)
-        card += "```" + chr(10)
-
-        async_dismiss(self.hass, "owmhlistsensors")
-        async_create(
-            self.hass,
-            message=card,
-            title="OWMH Attributes",
-            notification_id="owmhlistsensors",
-        )
+    def determine_state(self) -> bool:
+        """Take the state from the render pass, return True if it changed."""
+        state, attributes = self._render.result(self._index)
+        if state == self._state and attributes == self._extra_attributes:
+            return False
+        self._state = state
+        self._extra_attributes = attributes
+        return True
+
+
+class WeatherBulkSensor(CoordinatorEntity, SensorEntity):
+    """Sensor of a bulk option, the typed value is read from the variables."""
+
+    entity_description: BulkSensorEntityDescription
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_attribution = ATTRIBUTION
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+    def __init__(  # noqa: D107
+        self,
+        weather: Weather,
+        coordinator: DataUpdateCoordinator,
+        description: BulkSensorEntityDescription,
+        unique_id: str,
+    ) -> None:
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._weather = weather
+        self._attr_unique_id = unique_id
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = None
+        self.determine_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        if self.determine_state():
+            self.async_write_ha_state()
+
+    def determine_state(self) -> bool:
+        """Read the value and attributes, return True if they changed."""
+        wvars = self._weather.variables()
+        value = self.entity_description.value_fn(wvars)
+        attributes = None
+        if self.entity_description.attributes_fn is not None:
+            attributes = self.entity_description.attributes_fn(wvars)
+        if (
+            value == self._attr_native_value
+            and attributes == self._attr_extra_state_attributes
+        ):
+            return False
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attributes
+        return True
@@ -0,0 +1,141 @@
+"""Compile once cache of the sensor formulas."""
+
+import ast
+from collections import ChainMap
+import re
+
+import jinja2
+from jinja2 import meta
+
+# one environment for all sensors, templates are compiled on first use
+_ENVIRONMENT = jinja2.Environment()
+_COMPILED = {}
+_NAMES = {}
+_EVALUATORS = {}
+# a single expression and nothing else
+_EXPRESSION = re.compile(r"\{\{(?P<expression>[^{}]*)\}\}")
+# names jinja reads as literals
+_LITERALS = ("true", "false", "none")
+# syntax the fast path evaluates the same as jinja
+_ARITHMETIC = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.USub,
+    ast.UAdd,
+)
+
+
+def compile_template(formula) -> jinja2.Template:
+    """Return the compiled template for the formula text."""
+    template = _COMPILED.get(formula)
+    if template is None:
+        template = _ENVIRONMENT.from_string(formula)
+        _COMPILED[formula] = template
+    return template
+
+
+def template_names(formula) -> frozenset:
+    """Return the variables the formula reads, jinja globals excluded."""
+    names = _NAMES.get(formula)
+    if names is None:
+        names = frozenset(
+            meta.find_undeclared_variables(_ENVIRONMENT.parse(formula))
+            - _ENVIRONMENT.globals.keys()
+        )
+        _NAMES[formula] = names
+    return names
+
+
+def render(formula, variables) -> str:
+    """Render the formula, reading only the variables it uses.
+
+    Template.render copies the mapping into a dict, which would resolve
+    every variable, so the context is built over the mapping instead.
+    """
+    template = compile_template(formula)
+    context = template.new_context(
+        ChainMap(variables, template.globals), shared=True
+    )
+    try:
+        return "".join(template.root_render_func(context))
+    except Exception:  # noqa: BLE001
+        return _ENVIRONMENT.handle_exception()
+
+
+def _compile_arithmetic(formula):
+    """Return the code and names of a trivial formula, None for a template.
+
+    Trivial formulas are a variable reference or + - * / arithmetic of
+    variables and numbers, such as a weighted sum of dayNrain.
+    """
+    match = _EXPRESSION.fullmatch(formula)
+    if match is None:
+        return None
+    try:
+        tree = ast.parse(match["expression"].strip(), mode="eval")
+    except SyntaxError:
+        return None
+    names = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ARITHMETIC):
+            return None
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float):
+            return None
+        if isinstance(node, ast.Name):
+            if node.id in _ENVIRONMENT.globals or node.id.lower() in _LITERALS:
+                return None
+            names.append(node.id)
+    if isinstance(tree.body, ast.Name):
+        return tree.body.id, None
+    return tuple(dict.fromkeys(names)), compile(tree, "<formula>", "eval")
+
+
+def evaluate(formula, variables):
+    """Evaluate the formula, trivial formulas without a jinja render.
+
+    A variable reference returns the value, numbers keep their type and other
+    values are returned as text as jinja would render them. Arithmetic is
+    evaluated natively when every variable is a number, otherwise and for
+    all other formulas the template is rendered.
+    """
+    if formula not in _EVALUATORS:
+        _EVALUATORS[formula] = _compile_arithmetic(formula)
+    compiled = _EVALUATORS[formula]
+    if compiled is None:
+        return render(formula, variables)
+    names, code = compiled
+    if code is None:
+        if names not in variables:
+            # jinja renders an undefined variable as empty text
+            return ""
+        value = variables[names]
+        if _number(value):
+            return value
+        return str(value)
+    values = {}
+    for name in names:
+        if name not in variables:
+            raise jinja2.UndefinedError(f"'{name}' is undefined")
+        values[name] = variables[name]
+        if not _number(values[name]):
+            return render(formula, variables)
+    return eval(code, {"__builtins__": {}}, values)  # noqa: S307
+
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def clear_cache() -> None:
+    """Forget the compiled templates, called when the options change."""
+    _COMPILED.clear()
+    _NAMES.clear()
+    _EVALUATORS.clear()
@@ -0,0 +1,114 @@
+"""Benchmark the processing of the history data and the sensor formulas.
+
+Run from the component tests directory:
+    python bench_processing.py
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+import random
+import sys
+import timeit
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.rollup import DailyRollup
+from custom_components.openweathermaphistory.templates import evaluate, render
+from custom_components.openweathermaphistory.variables import Placeholder, Variables
+
+TIMEZONE = "Europe/Berlin"
+SENSORS = 200
+
+
+def history(days):
+    """Build random hourly history for the number of days."""
+    thishour = int(datetime.now().timestamp()) // 3600 * 3600
+    return {
+        str(hour): {
+            "rain": random.random(),
+            "snow": 0,
+            "temp": random.uniform(-5, 35),
+            "humidity": random.uniform(20, 100),
+            "pressure": random.uniform(990, 1030),
+            "wind_speed": random.uniform(0, 15),
+            "wind_deg": random.randint(0, 359),
+            "uvi": random.uniform(0, 11),
+            "clouds": random.randint(0, 100),
+        }
+        for hour in range(thishour - days * 24 * 3600, thishour, 3600)
+    }
+
+
+def rebuild(data, method, number):
+    """Return the mean milliseconds for a full rebuild."""
+    rollup = DailyRollup(TIMEZONE, 365)
+    rebuild = getattr(rollup, method)
+    return timeit.timeit(lambda: rebuild(data), number=number) / number * 1000
+
+
+def main():
+    """Print the rebuild times and the crossover point."""
+    print(f"{'days':>5} {'hours':>6} {'python ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    for days in (5, 30, 90, 365):
+        data = history(days)
+        python = rebuild(data, "_rebuild_python", 10)
+        numpy = rebuild(data, "_rebuild_numpy", 10)
+        print(
+            f"{days:>5} {len(data):>6} {python:>10.2f} {numpy:>9.2f} {python / numpy:>7.1f}x"
+        )
+
+    for hours in range(24, 2400, 24):
+        data = history(hours // 24)
+        if rebuild(data, "_rebuild_numpy", 50) < rebuild(data, "_rebuild_python", 50):
+            print(f"numpy is faster from {hours} hours")
+            break
+
+    bench_formulas()
+
+
+def formulas():
+    """Build sensor formulas in the mix the bulk options create."""
+    fields = ("rain", "snow", "max", "min", "humidity", "wind_speed", "pop")
+    sensors = [
+        f"{{{{ forecast{i % 6}{fields[i % len(fields)]} }}}}" for i in range(150)
+    ]
+    sensors += [
+        f"{{{{ day{i % 5}rain * 0.5 + day{i % 5 + 1}rain * 0.25 }}}}"
+        for i in range(40)
+    ]
+    sensors += [
+        "{% if day0rain > 1 %}{{ day0rain | round(1) }}{% else %}0{% endif %}"
+    ] * (SENSORS - len(sensors))
+    return sensors
+
+
+def update(sensors, evaluator, number):
+    """Return the mean milliseconds to evaluate the sensors of an update."""
+
+    def run():
+        wvars = Variables(Placeholder(), 30)
+        for formula in sensors:
+            evaluator(formula, wvars)
+
+    run()
+    return timeit.timeit(run, number=number) / number * 1000
+
+
+def bench_formulas():
+    """Print the time for the sensors of an update with and without the fast path."""
+    sensors = formulas()
+    jinja = update(sensors, render, 100)
+    fast = update(sensors, evaluate, 100)
+    print(
+        f"{SENSORS} sensors: jinja {jinja:.2f}ms, "
+        f"fast path {fast:.2f}ms, {jinja / fast:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
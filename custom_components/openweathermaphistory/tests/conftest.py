@@ -0,0 +1,43 @@
+"""Shared helpers of the component tests."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+
+def hour_data(rain, temp, snow=0) -> dict:
+    """Return one hour of history data."""
+    return {
+        "rain": rain,
+        "snow": snow,
+        "temp": temp,
+        "humidity": 50,
+        "pressure": 1010,
+        "wind_speed": 2.5,
+        "wind_deg": 90,
+        "uvi": 1,
+        "clouds": 40,
+    }
+
+
+def hourly_history(days=3) -> dict:
+    """Return the days of history up to this hour, a light rain every hour."""
+    thishour = int(datetime.now().timestamp()) // 3600 * 3600
+    return {
+        str(hour): hour_data(0.25, (hour // 3600) % 24)
+        for hour in range(thishour - days * 24 * 3600, thishour + 3600, 3600)
+    }
+
+
+@pytest.fixture
+def make_hour():
+    """Return the factory of an hour of history data."""
+    return hour_data
+
+
+@pytest.fixture
+def make_history():
+    """Return the factory of the hourly history of a number of days."""
+    return hourly_history
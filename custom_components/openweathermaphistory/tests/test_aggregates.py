@@ -0,0 +1,55 @@
+"""Test the ordered store of the daily aggregate data."""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.aggregates import DailyAggregates
+
+TODAY = date(2026, 3, 31).toordinal()
+
+
+def _day(offset, precipitation=1):
+    return {
+        "date": date.fromordinal(TODAY - offset).isoformat(),
+        "precipitation": precipitation,
+        "min_temp": 5,
+        "max_temp": 15,
+        "humidity": 60,
+        "pressure": 1012,
+    }
+
+
+def test_views_are_newest_first() -> None:
+    stored = {day["date"]: day for day in (_day(3), _day(0), _day(1))}
+    aggregates = DailyAggregates(stored)
+    views = aggregates.views(5)
+
+    assert [view["date"] for view in views.values()] == [
+        _day(0)["date"],
+        _day(1)["date"],
+        _day(3)["date"],
+    ]
+    assert aggregates.views(5) is views
+    aggregates.add(_day(2, 7))
+    assert aggregates.views(5)["a2"]["precipitation"] == 7
+    assert aggregates.missing(TODAY, 5) == [_day(4)["date"]]
+
+
+def test_evict_keeps_the_stored_data_in_step() -> None:
+    stored = {}
+    aggregates = DailyAggregates(stored)
+    for offset in range(6):
+        aggregates.add(_day(offset))
+    aggregates.evict(TODAY - 2)
+
+    assert sorted(stored) == [_day(2)["date"], _day(1)["date"], _day(0)["date"]]
+    assert TODAY - 3 not in aggregates
+    assert aggregates.missing(TODAY, 4) == [_day(3)["date"]]
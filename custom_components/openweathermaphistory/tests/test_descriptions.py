@@ -0,0 +1,83 @@
+"""Test the native sensors of the bulk options."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.config_flow import process_options
+from custom_components.openweathermaphistory.const import DOMAIN, OPTIONS_BULK
+from custom_components.openweathermaphistory.descriptions import (
+    bulk_descriptions,
+    legacy_resources,
+    retired_descriptions,
+)
+from custom_components.openweathermaphistory.legacy import frost_formula
+from custom_components.openweathermaphistory.variables import Placeholder, Variables
+
+
+def test_compact_mode_creates_a_sensor_per_group() -> None:
+    wvars = Variables(Placeholder(), 30)
+    descriptions = bulk_descriptions(OPTIONS_BULK, 30, "Home")
+    compact = bulk_descriptions(OPTIONS_BULK, 30, "Home", compact=True)
+
+    assert len(compact) * 5 < len(descriptions)
+    rain = next(d for d in compact if d.key == "forecast_rain")
+    assert rain.name == "OWMH_Home_forecast_rain"
+    assert rain.value_fn(wvars) == 0
+    assert rain.attributes_fn(wvars) == {"values": [0] * 6}
+
+
+def test_legacy_resources_and_retired_sensors() -> None:
+    descriptions = bulk_descriptions(["forecast_rain", "frost_prediction"], 5, "Home")
+    frost = frost_formula("risk_level", "Home")
+    resources = [
+        {"name": "OWMH_Home_forecast0rain", "formula": "{{ forecast0rain }}"},
+        {"name": frost["name"], "formula": frost["formula"]},
+        {"name": "Rain today", "formula": "{{ forecast0rain }}"},
+    ]
+
+    templates, legacy = legacy_resources(resources, descriptions)
+    assert templates == [resources[2]]
+    assert set(legacy) == {"forecast0rain", "frost_risk_level"}
+
+    retired = {d.key for d in retired_descriptions(["forecast_rain"], True, "Home")}
+    assert "forecast0rain" in retired
+    assert "frost_risk_level" in retired
+    assert "forecast_rain" not in retired
+
+
+def test_retired_sensors_are_removed_by_unique_id() -> None:
+    frost = frost_formula("risk_level", "Home")
+    resources = [
+        {"name": frost["name"], "formula": frost["formula"], "unique_id": "legacy"},
+        {"name": "Rain today", "formula": "{{ forecast0rain }}", "unique_id": "rain"},
+    ]
+    registry = MagicMock()
+    # the sensors were renamed, their entity ids no longer follow the names
+    entities = {"legacy": "sensor.frost", "entry_forecast0rain": "sensor.rain_0"}
+    registry.async_get_entity_id.side_effect = lambda domain, platform, unique_id: (
+        entities.get(unique_id)
+    )
+
+    with patch(
+        "custom_components.openweathermaphistory.config_flow.er.async_get",
+        return_value=registry,
+    ):
+        kept = process_options(
+            None, "Home", ["forecast_rain"], resources, True, "entry"
+        )
+
+    assert kept == [resources[1]]
+    removed = {call.args[0] for call in registry.async_remove.call_args_list}
+    assert removed == {"sensor.frost", "sensor.rain_0"}
+    assert all(
+        call.args[:2] == ("sensor", DOMAIN)
+        for call in registry.async_get_entity_id.call_args_list
+    )
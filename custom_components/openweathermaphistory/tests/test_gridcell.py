@@ -0,0 +1,100 @@
+"""Test sharing the fetch pipeline between locations in a grid cell."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from homeassistant.const import CONF_LATITUDE, CONF_LOCATION, CONF_LONGITUDE
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory import async_remove_entry
+from custom_components.openweathermaphistory.const import CONF_GRID_SIZE
+from custom_components.openweathermaphistory.gridcell import (
+    SHARED_CELLS,
+    cell_key,
+    get_cell,
+    release_cell,
+)
+
+
+def test_cell_key_floors_to_the_grid() -> None:
+    assert cell_key(-33.87, 151.21, 0.1) == "cell_0.1_-339_1512"
+    assert cell_key(-33.81, 151.29, 0.1) == "cell_0.1_-339_1512"
+    assert cell_key(-33.91, 151.21, 0.1) == "cell_0.1_-340_1512"
+    assert cell_key(51.5, -0.12, 1) == "cell_1_51_-1"
+
+
+def test_locations_in_a_cell_share_it_until_the_last_leaves() -> None:
+    hass = SimpleNamespace(data={})
+    home = get_cell(hass, "Home", -33.87, 151.21, 0.1)
+    work = get_cell(hass, "Work", -33.81, 151.29, 0.1)
+
+    assert home is work
+    assert home.shared
+    assert home.store_key == "OWMH_cell_0.1_-339_1512"
+    # all members fetch for the centre of the cell
+    assert (home.lat, home.lon) == (-33.85, 151.25)
+
+    home.join("Home", 5)
+    work.join("Work", 30)
+    assert home.max_days() == 30
+
+    release_cell(hass, work, "Work")
+    assert home.max_days() == 5
+    assert hass.data[SHARED_CELLS] == {home.key: home}
+    release_cell(hass, home, "Home")
+    assert hass.data[SHARED_CELLS] == {}
+    assert get_cell(hass, "Home", -33.87, 151.21, 0.1) is not home
+
+
+def test_no_grid_size_keeps_a_private_cell() -> None:
+    hass = SimpleNamespace(data={})
+    cell = get_cell(hass, "Home", -33.87, 151.21, 0)
+
+    assert not cell.shared
+    assert cell.store_key == "OWMH_Home"
+    assert (cell.lat, cell.lon) == (-33.87, 151.21)
+    assert get_cell(hass, "Home", -33.87, 151.21, 0) is not cell
+    assert SHARED_CELLS not in hass.data
+    cell.join("Home", 5)
+    release_cell(hass, cell, "Home")
+    assert cell.max_days() == 0
+
+
+def _entry(entry_id, lat, lon, size=0.1):
+    config = {
+        CONF_LOCATION: {CONF_LATITUDE: lat, CONF_LONGITUDE: lon},
+        CONF_GRID_SIZE: size,
+    }
+    return SimpleNamespace(entry_id=entry_id, title=entry_id, options=config, data={})
+
+
+async def test_cell_data_is_kept_for_entries_not_loaded() -> None:
+    home = _entry("Home", -33.87, 151.21)
+    # another entry in the cell that is disabled, not in hass.data
+    work = _entry("Work", -33.81, 151.29)
+    hass = SimpleNamespace(
+        data={},
+        config_entries=SimpleNamespace(async_entries=lambda domain: [home, work]),
+    )
+    with patch("custom_components.openweathermaphistory.store.Store") as store:
+        created = store.__getitem__.return_value
+        created.return_value.async_remove = AsyncMock()
+        await async_remove_entry(hass, home)
+        assert [call.args[2] for call in created.call_args_list] == ["OWMH_Home"]
+
+        # the last entry of the cell removes the cell data
+        created.reset_mock()
+        hass.config_entries.async_entries = lambda domain: [work]
+        await async_remove_entry(hass, work)
+        assert [call.args[2] for call in created.call_args_list] == [
+            "OWMH_Work",
+            "OWMH_cell_0.1_-339_1512",
+        ]
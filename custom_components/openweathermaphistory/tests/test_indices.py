@@ -0,0 +1,41 @@
+"""Test the frost risk and adjustment indices of the bulk sensors."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.indices import (
+    adjustment_factor,
+    forecast_equivalent_rain,
+    frost_risk,
+    hist_equivalent_rain,
+)
+
+
+@pytest.mark.parametrize(
+    ("observations", "expected"),
+    [
+        ((1, -1, 2, 0), (110.0, "CRITICAL: Frost highly likely")),
+        ((5, 4, 5, 50), (50.0, "WARNING: Moderate frost risk")),
+        ((6, 2, 10, 75), (30.0, "LOW: Watch for clearing skies")),
+        ((15, 5, 10, 100), (0.0, "NONE: No frost expected")),
+    ],
+)
+def test_frost_risk(observations, expected) -> None:
+    assert frost_risk(*observations) == expected
+
+
+def test_adjustment_factors() -> None:
+    assert hist_equivalent_rain([2, 2, 4, 0, 10]) == pytest.approx(4.6)
+    assert adjustment_factor(4.6) == 0.54
+    assert adjustment_factor(12) == 0
+    # only the days the weights cover are counted
+    assert forecast_equivalent_rain([2, 2, 4, 9], [4, 2], [0.5, 1]) == 5.5
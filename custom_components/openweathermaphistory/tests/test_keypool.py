@@ -0,0 +1,66 @@
+"""Test the rotation of API calls across a pool of keys."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.keypool import KeyPool, fingerprint
+
+
+def test_calls_rotate_until_every_key_is_used_up() -> None:
+    pool = KeyPool(["first", " second", "first", ""], 2)
+
+    assert len(pool) == 2
+    assert pool.primary == "first"
+    keys = [pool.next_key() for _ in range(4)]
+    assert keys == ["first", "second", "first", "second"]
+    for key in keys:
+        pool.used(key)
+    assert pool.count() == 4
+    assert pool.remaining() == 0
+    assert pool.next_key() is None
+
+
+def test_auth_and_quota_errors_drop_keys_until_the_reset() -> None:
+    pool = KeyPool(["rejected", "exhausted", "valid"], 10)
+    pool.used("rejected", 401)
+    pool.used("exhausted", 429)
+
+    assert pool.active() == 1
+    assert {pool.next_key() for _ in range(3)} == {"valid"}
+    assert pool.remaining() == 10
+    pool.used("valid", 403)
+    assert pool.next_key() is None
+
+    pool.reset()
+    assert pool.active() == 3
+    assert pool.remaining() == 30
+
+
+def test_counts_are_saved_by_fingerprint_and_merged() -> None:
+    pool = KeyPool(["first", "second"], 10)
+    pool.used("first")
+    pool.used("second", 403)
+    record = pool.record()
+
+    # keys are never saved in clear
+    assert set(record) == {fingerprint("first"), fingerprint("second")}
+    restored = KeyPool(["first", "second"], 10)
+    restored.load({"keys": record})
+    assert restored.record() == record
+    assert restored.active() == 1
+    assert restored.count() == 2
+
+    # another entry in the same grid cell keeps the counts of these keys
+    other = KeyPool(["third"], 10)
+    other.used("third")
+    merged = other.record(record)
+    assert merged[fingerprint("first")] == {"count": 1}
+    assert merged[fingerprint("second")] == {"count": 1, "dropped": "auth"}
+    assert merged[fingerprint("third")] == {"count": 1}
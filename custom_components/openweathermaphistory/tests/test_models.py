@@ -0,0 +1,183 @@
+"""Test the models advanced from the rolled up history."""
+
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.evapotranspiration import location
+from custom_components.openweathermaphistory.models import (
+    RainEvents,
+    SeasonAccumulators,
+    SoilBucket,
+)
+from custom_components.openweathermaphistory.rollup import DailyRollup
+
+TIMEZONE = "Australia/Sydney"
+PLACE = location(-33.87, 151.21, 40)
+
+
+def _replayed(rollup, params):
+    model = SoilBucket(params)
+    model.advance(rollup)
+    return model.values()
+
+
+def test_incremental_matches_replay(make_hour, make_history) -> None:
+    history = make_history(4)
+    hours = sorted(history, key=int)
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    model = SoilBucket([25, 2])
+    rollup.listeners.append(model.rewind)
+    for hour in hours[:-10]:
+        rollup.ingest(hour, history[hour])
+    model.advance(rollup)
+    # new hours, a correction and snow in the freezing newest hour
+    for hour in hours[-10:]:
+        rollup.ingest(hour, history[hour])
+    rollup.ingest(hours[20], make_hour(12, 1))
+    rollup.ingest(hours[-1], make_hour(0, -3, snow=8))
+    model.advance(rollup)
+
+    assert model.values() == _replayed(rollup, [25, 2])
+    assert 0 <= model.values()["soil_moisture"] <= 25
+    assert model.values()["snowpack"] > 0
+
+
+def test_load_replays_on_parameter_change(make_history) -> None:
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    rollup.rebuild(make_history(2))
+    saved = SoilBucket([25, 2])
+    saved.advance(rollup)
+
+    same = SoilBucket([25, 2])
+    same.load(saved.record())
+    assert same.state == saved.state
+    changed = SoilBucket([50, 2])
+    changed.load(saved.record())
+    changed.advance(rollup)
+    assert changed.values() == _replayed(rollup, [50, 2])
+
+
+def test_corrections_resume_after_ageing_out(make_hour, make_history) -> None:
+    # a dry spell, the moisture depends on every day
+    history = {hour: make_hour(0, 25) for hour in make_history(6)}
+    hours = sorted(history, key=int)
+    rollup = DailyRollup(TIMEZONE, 10, PLACE)
+    rollup.rebuild(history)
+    model = SoilBucket([25, 2])
+    rollup.listeners.append(model.rewind)
+    model.advance(rollup)
+    rollup.evict(rollup.today() - 2)
+    # the state before the corrected hour is resumed, not rebuilt from the
+    # hours still held
+    rollup.ingest(hours[-5], make_hour(12, 1))
+    model.advance(rollup)
+
+    history[hours[-5]] = make_hour(12, 1)
+    full = DailyRollup(TIMEZONE, 10, PLACE)
+    full.rebuild(history)
+    assert model.values() == _replayed(full, [25, 2])
+    assert model.values() != _replayed(rollup, [25, 2])
+
+    # the checkpoints are saved with the state
+    restored = SoilBucket([25, 2])
+    restored.load(model.record())
+    rollup.listeners.append(restored.rewind)
+    rollup.ingest(hours[-3], make_hour(0, 20))
+    model.advance(rollup)
+    restored.advance(rollup)
+    assert restored.values() == model.values()
+
+
+def test_season_corrections_match_replay(make_hour, make_history) -> None:
+    history = make_history(4)
+    hours = sorted(history, key=int)
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    params = ["01-01", 10, 20, 3]
+    season = SeasonAccumulators(params)
+    rollup.listeners.append(season.rewind)
+    for hour in hours[24:]:
+        rollup.ingest(hour, history[hour])
+    season.advance(rollup)
+    # a backloaded day and a corrected hour are applied as differences
+    for hour in reversed(hours[:24]):
+        rollup.ingest(hour, history[hour])
+    rollup.ingest(hours[30], make_hour(0, 5))
+    season.advance(rollup)
+
+    replayed = SeasonAccumulators(params)
+    replayed.advance(rollup)
+    assert season.values() == replayed.values()
+    assert season.values()["chill_hours"] > 0
+    assert season.values()["frost_hours"] > 0
+
+
+def test_season_resets_at_the_start(make_history) -> None:
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    rollup.rebuild(make_history(3))
+    today = date.fromordinal(rollup.today())
+    season = SeasonAccumulators([today.strftime("%m-%d"), 0, 30, 0])
+    season.advance(rollup)
+
+    assert season.values()["season_start"] == today.isoformat()
+    # only the hours of today are counted
+    assert season.values()["chill_hours"] == sum(
+        1
+        for ordinal, temp in zip(rollup.ordinals, rollup.column("temp"))
+        if ordinal == today.toordinal() and 0 < temp <= 7.2
+    )
+
+
+def test_rain_events(make_hour, make_history) -> None:
+    history = make_history(2)
+    hours = sorted(history, key=int)
+    rain = {10: 1.5, 11: 4, 12: 0.5, 25: 2, 26: 0.05}
+    for i, hour in enumerate(hours):
+        history[hour] = make_hour(rain.get(i, 0), 10)
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    rollup.rebuild({hour: history[hour] for hour in hours[:-1]})
+    events = RainEvents([])
+    rollup.listeners.append(events.rewind)
+    events.advance(rollup)
+    rollup.ingest(hours[-1], history[hours[-1]])
+    events.advance(rollup)
+
+    # the twelve dry hours after hour 12 end the first event
+    values = events.values()
+    assert values["last_event_total"] == 2.05
+    assert values["last_event_peak"] == 2
+    assert values["last_event_hours"] == 1
+    assert values["current_event_total"] == 0
+    assert values["hours_since_rain"] == len(hours) - 26
+    assert values["current_dry_spell_days"] == (len(hours) - 26) // 24
+
+    # a correction inside the event replays it
+    rollup.ingest(hours[25], make_hour(3, 10))
+    events.advance(rollup)
+    assert events.values()["last_event_total"] == 3.05
+
+
+def test_rain_events_close_across_gaps(make_hour, make_history) -> None:
+    history = make_history(1)
+    hours = sorted(history, key=int)
+    for i, hour in enumerate(hours):
+        history[hour] = make_hour(2 if i in (3, 12) else 0, 10)
+    # the hours between the two wet hours are missing from the history
+    kept = hours[:4] + hours[12:]
+    rollup = DailyRollup(TIMEZONE, 5, PLACE)
+    rollup.rebuild({hour: history[hour] for hour in kept})
+    events = RainEvents([])
+    events.advance(rollup)
+
+    values = events.values()
+    assert values["last_event_total"] == 2
+    assert values["last_event_hours"] == 1
+    assert values["current_event_total"] == 0
+    assert values["hours_since_rain"] == len(hours) - 13
@@ -0,0 +1,149 @@
+"""Test the entry level render pass."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.render import RenderPass
+from custom_components.openweathermaphistory.variables import Placeholder, Variables
+
+
+class Weather(Placeholder):
+    """Placeholder weather with settable values and change versions."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.values = {}
+        self.versions = {}
+
+    def processed_value(self, period, value):
+        return self.values.get((period, value), 0)
+
+    def value_version(self, period, value):
+        return self.versions.get((period, value), 0)
+
+    def set(self, period, value, data) -> None:
+        self.values[(period, value)] = data
+        self.versions[(period, value)] = self.versions.get((period, value), 0) + 1
+
+
+def sensor(name, formula, attributes=None) -> dict:
+    return {"name": name, "formula": formula, "attributes": attributes}
+
+
+def test_sensors_read_other_sensors_in_dependency_order() -> None:
+    weather = Weather()
+    resources = [
+        sensor("Total", "{{ rain_today + forecast_rain }}"),
+        sensor("Rain today", "{{ day0rain * 2 }}", "day0rain"),
+        sensor("Forecast rain", "{{ forecast0rain }}"),
+    ]
+    keys = ["total", "rain_today", "forecast_rain"]
+    render_pass = RenderPass(resources, keys, Variables(weather, 3))
+    weather.set(0, "rain", 1.5)
+    weather.set("f0", "rain", 2)
+
+    assert render_pass.run(Variables(weather, 3)) == {0, 1, 2}
+    assert render_pass.result(0) == (5.0, None)
+    assert render_pass.result(1) == (3.0, {"day0rain": 1.5})
+
+    # nothing read has changed, nothing is evaluated
+    assert render_pass.run(Variables(weather, 3)) == set()
+
+    weather.set(0, "rain", 2.5)
+    assert render_pass.run(Variables(weather, 3)) == {0, 1}
+    assert render_pass.result(0) == (7.0, None)
+
+
+def test_reference_loops_and_untracked_variables() -> None:
+    weather = Weather()
+    resources = [
+        sensor("A", "{{ b + 1 }}"),
+        sensor("B", "{{ a + 1 }}"),
+        sensor("Backlog", "{{ remaining_backlog }}"),
+    ]
+    render_pass = RenderPass(resources, ["a", "b", "backlog"], Variables(weather, 1))
+
+    # a loop reads the state of the last update, undefined on the first
+    render_pass.run(Variables(weather, 1))
+    assert render_pass.result(0) == (0.0, None)
+    assert render_pass.result(1) == (1.0, None)
+    render_pass.run(Variables(weather, 1))
+    assert render_pass.result(0) == (2.0, None)
+    assert render_pass.result(1) == (3.0, None)
+    # untracked variables are evaluated every time, only a change is listed
+    assert render_pass.result(2) == (0.0, None)
+    assert 2 not in render_pass.run(Variables(weather, 1))
+
+
+def test_attribute_projections_are_shared_and_rebuilt_on_change() -> None:
+    weather = Weather()
+    resources = [
+        sensor("Rain", "{{ day0rain }}", "day0rain, day1rain"),
+        sensor("Twice", "{{ day0rain * 2 }}", "['day0rain','day1rain']"),
+        sensor("Unknown", "{{ day0rain }}", "day0rain,not_a_variable,"),
+    ]
+    keys = ["rain", "twice", "unknown"]
+    render_pass = RenderPass(resources, keys, Variables(weather, 3))
+    weather.set(0, "rain", 1.5)
+    render_pass.run(Variables(weather, 3))
+
+    attributes = render_pass.result(0)[1]
+    assert attributes == {"day0rain": 1.5, "day1rain": 0}
+    # the same list parsed to one read only mapping, unknown names dropped
+    assert render_pass.result(1)[1] is attributes
+    assert render_pass.result(2)[1] == {"day0rain": 1.5}
+
+    render_pass.run(Variables(weather, 3))
+    assert render_pass.result(0)[1] is attributes
+
+    # a change of an attribute only is listed with the state kept
+    weather.set(1, "rain", 4)
+    assert render_pass.run(Variables(weather, 3)) == {0, 1}
+    assert render_pass.result(1) == (3.0, {"day0rain": 1.5, "day1rain": 4})
+
+
+def test_structured_views_are_tracked() -> None:
+    weather = Weather()
+    resources = [sensor("Week", "{{ day[:2] | sum(attribute='rain') }}", "day")]
+    render_pass = RenderPass(resources, ["week"], Variables(weather, 2))
+    weather.set(1, "rain", 2)
+    render_pass.run(Variables(weather, 2))
+    assert render_pass.result(0)[1] == {
+        "day": [
+            {"rain": 0, "snow": 0, "max": 0, "min": 0, "et0": 0},
+            {"rain": 2, "snow": 0, "max": 0, "min": 0, "et0": 0},
+        ]
+    }
+
+    assert render_pass.run(Variables(weather, 2)) == set()
+    weather.set(0, "rain", 1)
+    # the weather versions a view when any of its periods changes
+    weather.set("view", "day", 1)
+    render_pass.run(Variables(weather, 2))
+    assert render_pass.result(0)[0] == 3.0
+
+
+def test_formula_errors_keep_the_previous_state() -> None:
+    weather = Weather()
+    resources = [
+        sensor("Ratio", "{{ day0rain / day0snow }}"),
+        sensor("Rain", "{{ day0rain }}"),
+    ]
+    render_pass = RenderPass(resources, ["ratio", "rain"], Variables(weather, 1))
+    weather.set(0, "rain", 2)
+    weather.set(0, "snow", 4)
+    render_pass.run(Variables(weather, 1))
+    assert render_pass.result(0) == (0.5, None)
+
+    weather.set(0, "rain", 3)
+    weather.set(0, "snow", 0)
+    assert render_pass.run(Variables(weather, 1)) == {1}
+    assert render_pass.result(0) == (0.5, None)
+    assert render_pass.result(1) == (3.0, None)
@@ -0,0 +1,232 @@
+"""Test the incremental daily roll up of the history data."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+import sys
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.evapotranspiration import (
+    daily_et0,
+    location,
+)
+from custom_components.openweathermaphistory.localdays import LocalDays
+from custom_components.openweathermaphistory.rollup import DailyRollup
+
+TIMEZONE = "Australia/Sydney"
+
+
+def test_ingest_matches_rebuild(make_history) -> None:
+    history = make_history()
+    incremental = DailyRollup(TIMEZONE, 5)
+    # backloaded hours arrive newest first
+    for hour, data in sorted(history.items(), reverse=True):
+        incremental.ingest(hour, data)
+    rebuilt = DailyRollup(TIMEZONE, 5)
+    rebuilt.rebuild(history)
+
+    today = rebuilt.today()
+    assert incremental.hours == rebuilt.hours
+    assert incremental.days(today, 5) == rebuilt.days(today, 5)
+    assert incremental.plotly(today, 5) == rebuilt.plotly(today, 5)
+
+
+def test_batches_merge_older_hours(make_hour, make_history) -> None:
+    history = make_history()
+    hours = sorted(history, key=int)
+    rollup = DailyRollup(TIMEZONE, 5)
+    rollup.rebuild({hour: history[hour] for hour in hours[30:] if hour != hours[50]})
+    changed = []
+    rollup.listeners.append(lambda hour, old, new: changed.append(hour))
+
+    # a backload before the oldest hour, a gap, a correction and a new hour
+    newest = int(hours[-1]) + 3600
+    history[str(newest)] = make_hour(1, 20)
+    history[hours[60]] = make_hour(2, 30)
+    rollup.ingest_many(
+        [(hour, history[hour]) for hour in (*hours[:30], hours[50], hours[60])]
+        + [(newest, history[str(newest)])]
+    )
+
+    rebuilt = DailyRollup(TIMEZONE, 5)
+    rebuilt.rebuild(history)
+    today = rebuilt.today()
+    assert rollup.hours == rebuilt.hours
+    assert rollup.time == rebuilt.time
+    assert rollup.days(today, 5) == rebuilt.days(today, 5)
+    assert rollup.total("rain", 0) == rebuilt.total("rain", 0)
+    assert sorted(changed) == sorted(
+        int(hour) for hour in (*hours[:30], hours[50], hours[60])
+    )
+
+
+def test_replace_recalculates_the_day(make_hour, make_history) -> None:
+    history = make_history()
+    rollup = DailyRollup(TIMEZONE, 5)
+    rollup.rebuild(history)
+    newest = max(history)
+    corrected = make_hour(10, 45)
+    rollup.ingest(newest, corrected)
+    history[newest] = corrected
+
+    rebuilt = DailyRollup(TIMEZONE, 5)
+    rebuilt.rebuild(history)
+    today = rollup.today()
+    assert rollup.days(today, 5) == rebuilt.days(today, 5)
+    assert rollup.days(today, 5)[0]["max_temp"] == 45
+
+
+def test_evict_whole_days(make_history) -> None:
+    rollup = DailyRollup(TIMEZONE, 2)
+    rollup.rebuild(make_history())
+    today = rollup.today()
+    removed = rollup.evict(today - 1)
+
+    assert removed
+    assert set(rollup.days(today, 5)) == {0, 1}
+    assert len(rollup.plotly(today, 2)["plotly_rain"]) == len(rollup.hours)
+    assert rollup.ordinals[0] == today - 1
+
+
+def test_numpy_rebuild_matches_python(make_history) -> None:
+    history = make_history(10)
+    python = DailyRollup("Europe/Berlin", 10)
+    python._rebuild_python(history)
+    vectorised = DailyRollup("Europe/Berlin", 10)
+    vectorised._rebuild_numpy(history)
+
+    today = python.today()
+    assert vectorised.hours == python.hours
+    assert vectorised.ordinals == python.ordinals
+    assert vectorised.plotly(today, 10) == python.plotly(today, 10)
+    assert vectorised.days(today, 10) == python.days(today, 10)
+
+
+def test_localdays_matches_zoneinfo_across_dst() -> None:
+    for timezone in ("Europe/Berlin", "Australia/Sydney", "Asia/Kolkata"):
+        localdays = LocalDays(timezone, 400)
+        localdays.refresh()
+        tz = ZoneInfo(timezone)
+        thishour = int(datetime.now().timestamp()) // 3600 * 3600
+        for hour in range(thishour - 400 * 24 * 3600, thishour, 3600):
+            expected = datetime.fromtimestamp(hour, tz).toordinal()
+            assert localdays.ordinal(hour) == expected
+        assert localdays.date(0).toordinal() == localdays.today
+
+
+def test_localdays_half_hour_zone_between_hours() -> None:
+    localdays = LocalDays("Asia/Kolkata", 10)
+    localdays.refresh()
+    tz = ZoneInfo("Asia/Kolkata")
+    thishour = int(datetime.now().timestamp()) // 3600 * 3600
+    # local midnight is half past a UTC hour, step through it in minutes
+    for timestamp in range(thishour - 5 * 24 * 3600, thishour, 900):
+        expected = datetime.fromtimestamp(timestamp, tz).toordinal()
+        assert localdays.ordinal(timestamp) == expected
+
+
+def test_window_queries_match_the_hours(make_hour, make_history) -> None:
+    history = make_history(5)
+    rollup = DailyRollup(TIMEZONE, 6)
+    rollup.rebuild(history)
+    # an out of order correction and ageing out keep the indexes valid
+    rollup.ingest(sorted(history)[30], make_hour(3, -4))
+    history[sorted(history)[30]] = make_hour(3, -4)
+    for hour in rollup.evict(rollup.today() - 4):
+        history.pop(str(hour))
+
+    hours = sorted(int(hour) for hour in history)
+    for start, end in ((hours[0], None), (hours[5], hours[40]), (hours[-3], None)):
+        window = [
+            history[str(hour)]
+            for hour in hours
+            if hour >= start and (end is None or hour < end)
+        ]
+        assert rollup.total("rain", start, end) == round(
+            sum(data["rain"] for data in window), 2
+        )
+        assert rollup.extreme("temp", start, end) == max(d["temp"] for d in window)
+        assert rollup.extreme("temp", start, end, high=False) == min(
+            d["temp"] for d in window
+        )
+
+    functions = rollup.functions()
+    assert functions["rain_since"](rollup.time[5]) == rollup.total("rain", hours[5])
+    assert functions["temp_max_between"](hours[0], hours[1]) == history[
+        str(hours[0])
+    ]["temp"]
+    assert functions["snow_last"](2) == 0
+
+
+def test_day_periods_are_the_24_hours_before_now(make_history) -> None:
+    history = make_history(3)
+    rollup = DailyRollup(TIMEZONE, 5)
+    rollup.rebuild(history)
+    now = max(int(hour) for hour in history) + 1800
+
+    periods = rollup.windows(now, 5)
+    # the periods start 24 hours apart, not at local midnight
+    assert set(periods) == {0, 1, 2, 3}
+    for offset, period in periods.items():
+        window = [
+            data
+            for hour, data in history.items()
+            if now - (offset + 1) * 86400 < int(hour) <= now - offset * 86400
+        ]
+        assert period["rain"] == round(sum(data["rain"] for data in window), 2)
+        assert period["max_temp"] == max(data["temp"] for data in window)
+        assert period["min_temp"] == min(data["temp"] for data in window)
+    assert periods[0]["rain"] == 6
+    assert periods[3]["rain"] == 0.25
+
+
+def test_sparse_tables_follow_new_hours(make_hour, make_history) -> None:
+    history = make_history(2)
+    rollup = DailyRollup(TIMEZONE, 5)
+    rollup.rebuild(history)
+    assert rollup.extreme("temp", 0) == 23
+    tables = rollup._sparse[("temp", True)]
+
+    # new hours extend the tables, ageing out trims them
+    newest = max(int(hour) for hour in history)
+    for hour in range(newest + 3600, newest + 40 * 3600, 3600):
+        history[str(hour)] = make_hour(0, 30 + hour % 7)
+        rollup.ingest(hour, history[str(hour)])
+    for hour in rollup.evict(rollup.today() - 1):
+        history.pop(str(hour))
+    assert rollup._sparse[("temp", True)] is tables
+    hours = sorted(int(hour) for hour in history)
+    for first in range(0, len(hours), 7):
+        for last in range(first + 1, len(hours) + 1, 5):
+            window = [history[str(hour)]["temp"] for hour in hours[first:last]]
+            end = hours[last] if last < len(hours) else None
+            assert rollup.extreme("temp", hours[first], end) == max(window)
+
+    # no hours is no value rather than zero
+    assert rollup.extreme("temp", hours[-1] + 1) is None
+    assert rollup.functions()["temp_min_since"](hours[-1] + 1) is None
+
+
+def test_evapotranspiration_rollup(make_history) -> None:
+    history = make_history(4)
+    place = location(-33.87, 151.21, 40)
+    python = DailyRollup(TIMEZONE, 5, place)
+    python._rebuild_python(history)
+    vectorised = DailyRollup(TIMEZONE, 5, place)
+    vectorised._rebuild_numpy(history)
+
+    today = python.today()
+    days = python.days(today, 5)
+    assert days == vectorised.days(today, 5)
+    # a full day of sun and wind evaporates more than the 6mm of rain
+    assert 0 < days[1]["et0"] < 15
+    assert python.deficit(today, 5) == round(
+        max(sum(day["et0"] - day["rain"] for day in days.values()), 0), 2
+    )
+    assert 0 < daily_et0(int(max(history)), 15, 28, 50, 4, 1012, 20, place) < 15
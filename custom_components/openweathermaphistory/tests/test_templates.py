@@ -0,0 +1,71 @@
+"""Test the compiled sensor formulas."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import jinja2
+import pytest
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.templates import (
+    clear_cache,
+    compile_template,
+    evaluate,
+    render,
+    template_names,
+)
+
+
+def test_formulas_are_compiled_once() -> None:
+    formula = "{{ day0rain + day1rain }}"
+    template = compile_template(formula)
+
+    assert compile_template(formula) is template
+    assert template.render({"day0rain": 1, "day1rain": 2}) == "3"
+    clear_cache()
+    assert compile_template(formula) is not template
+
+
+def test_template_names() -> None:
+    formula = "{% set total = day0rain + rain_last(24) %}{{ range(total) | list }}"
+
+    assert template_names(formula) == {"day0rain", "rain_last"}
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        "{{ day0rain }}",
+        "{{ day0rain * 0.5 + day1rain * 0.25 - 1 }}",
+        "{{ -day1rain / 4 }}",
+        "{{ description }}",
+        "{{ hourly_rain }}",
+        "{{ missing }}",
+        "{{ true }}",
+        "{{ day0rain | round(1) }}",
+        "{{ day0rain }} mm",
+    ],
+)
+def test_fast_path_matches_jinja(formula) -> None:
+    variables = {
+        "day0rain": 1.5,
+        "day1rain": 2,
+        "description": "light rain",
+        "hourly_rain": [0.1, 0],
+    }
+
+    value = evaluate(formula, variables)
+    assert str(value) == render(formula, variables)
+
+
+def test_fast_path_arithmetic_on_text_renders() -> None:
+    with pytest.raises(TypeError):
+        evaluate("{{ day0rain + description }}", {"day0rain": 1, "description": "x"})
+    with pytest.raises(jinja2.UndefinedError):
+        evaluate("{{ day0rain + missing }}", {"day0rain": 1})
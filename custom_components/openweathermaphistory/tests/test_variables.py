@@ -0,0 +1,84 @@
+"""Test the template variables shared by the sensors."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory.templates import render
+from custom_components.openweathermaphistory.variables import (
+    Placeholder,
+    Variables,
+    plain,
+)
+
+
+class CountingPlaceholder(Placeholder):
+    """Counts the variables looked up."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    def processed_value(self, period, value):
+        self.calls += 1
+        return super().processed_value(period, value)
+
+
+def test_placeholder_snapshot() -> None:
+    wvars = Variables(Placeholder(), 3)
+
+    assert wvars["day2et0"] == 0
+    assert "day3rain" not in wvars
+    assert wvars["forecast0description"] == "text"
+    assert wvars["hourly_rain"] == []
+    assert render("{{ rain_last(36) + soil_deficit }}", wvars) == "0.0"
+    with pytest.raises(TypeError):
+        wvars["day0rain"] = 1
+
+
+def test_only_read_variables_are_resolved() -> None:
+    weather = CountingPlaceholder()
+    wvars = Variables(weather, 30)
+
+    formula = "{% for i in range(2) %}{{ forecast3rain }}{% endfor %}"
+
+    assert render(formula, wvars) == "00"
+    assert weather.calls == 1
+    assert wvars["forecast3rain"] == 0
+    assert weather.calls == 1
+    with pytest.raises(KeyError):
+        wvars["forecast9rain"]
+
+
+def test_versions_of_processed_values_only() -> None:
+    wvars = Variables(Placeholder(), 3)
+
+    assert wvars.versions(("day0rain", "forecast1pop", "unknown")) == (0, 0)
+    assert wvars.versions(("day0rain", "rain_last")) is None
+    assert wvars.versions(("day0rain", "remaining_backlog")) is None
+
+
+def test_structured_views() -> None:
+    weather = CountingPlaceholder()
+    wvars = Variables(weather, 3)
+
+    assert render("{{ day[2].et0 }} {{ day | length }}", wvars) == "0 3"
+    assert render("{{ forecast[1].description }}", wvars) == "text"
+    assert render("{{ forecast[:3] | sum(attribute='pop') }}", wvars) == "0"
+    assert render("{{ current.temp + aggregate[-1].max }}", wvars) == "0"
+    assert render("{{ hourly.rain | length }}", wvars) == "0"
+    assert render("{{ localday[1].rain + localday2min }}", wvars) == "0"
+    # days past the history are undefined
+    assert render("{{ day[3] is defined }}", wvars) == "False"
+    # only the fields read are looked up
+    assert weather.calls == 10
+    assert wvars.versions(("day", "localday", "current")) == (0, 0, 0)
+    assert plain(wvars["day"])[0] == dict(wvars["day"][0])
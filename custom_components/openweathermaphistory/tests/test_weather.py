@@ -2,10 +2,8 @@
 
 from __future__ import annotations
 
-import logging
 from pathlib import Path
 import sys
-from unittest.mock import patch
 
 from homeassistant.components.weather import (
     ATTR_CONDITION_EXCEPTIONAL,
@@ -26,7 +24,6 @@ from homeassistant.components.weather import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 
 # Create a mock HomeAssistant for tests that need it
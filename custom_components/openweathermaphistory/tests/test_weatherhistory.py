@@ -0,0 +1,264 @@
+"""Test the fetch pipeline of the weather history."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+import math
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from homeassistant.const import (
+    CONF_API_KEY,
+    CONF_LATITUDE,
+    CONF_LOCATION,
+    CONF_LONGITUDE,
+    CONF_NAME,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.util import dt as dt_util
+
+ROOT = Path(__file__).resolve().parents[4]
+CONFIG_PATH = ROOT / "config"
+if str(CONFIG_PATH) not in sys.path:
+    sys.path.insert(0, str(CONFIG_PATH))
+
+from custom_components.openweathermaphistory import backfill_range
+from custom_components.openweathermaphistory.const import (
+    CONF_CORRECTION_HOURS,
+    CONF_MAX_CALLS,
+    CONF_MAX_DAYS,
+    CONST_CORRECTION_CALLS,
+    CONST_CORRECTION_DELAY,
+)
+from custom_components.openweathermaphistory.rollup import DailyRollup
+from custom_components.openweathermaphistory.weatherhistory import Weather
+
+MODULE = "custom_components.openweathermaphistory.weatherhistory"
+
+
+def _weather(history, time_zone="UTC", **options) -> Weather:
+    """Return a weather history for Sydney holding the history."""
+    hass = SimpleNamespace(
+        data={},
+        config=SimpleNamespace(
+            time_zone=time_zone, latitude=-33.87, longitude=151.21, elevation=40
+        ),
+    )
+    config = {
+        CONF_NAME: "Home",
+        CONF_API_KEY: "key",
+        CONF_LOCATION: {CONF_LATITUDE: -33.87, CONF_LONGITUDE: 151.21},
+        **options,
+    }
+    weather = Weather(hass, config)
+    weather._cell.rollup = DailyRollup(time_zone, 5)
+    weather._cell.rollup.rebuild(history)
+    return weather
+
+
+def _thishour() -> int:
+    return int(datetime.now().timestamp()) // 3600 * 3600
+
+
+async def test_recent_hours_are_fetched_again_once(make_hour, make_history) -> None:
+    history = make_history(1)
+    thishour = _thishour()
+    changed = thishour - 4 * 3600
+    weather = _weather(history, **{CONF_CORRECTION_HOURS: 6})
+    weather.gethourdata = AsyncMock(
+        side_effect=lambda hour: (
+            make_hour(1.5, 0) if hour == changed else history[str(hour)]
+        )
+    )
+
+    newest = thishour - CONST_CORRECTION_DELAY * 3600
+    corrected = thishour - 12 * 3600
+    refreshes = 0
+    while corrected != newest:
+        corrected = await weather.async_correct(history, corrected)
+        refreshes += 1
+    # only the last correction_hours are caught up, a few hours per refresh
+    assert [call.args[0] for call in weather.gethourdata.await_args_list] == list(
+        range(thishour - 6 * 3600, newest + 1, 3600)
+    )
+    assert refreshes == math.ceil(5 / CONST_CORRECTION_CALLS)
+    assert history[str(changed)]["rain"] == 1.5
+
+    # each hour is only fetched once
+    weather.gethourdata.reset_mock()
+    assert await weather.async_correct(history, corrected) == newest
+    weather.gethourdata.assert_not_awaited()
+
+
+async def test_a_failed_correction_is_retried(make_history) -> None:
+    history = make_history(1)
+    thishour = _thishour()
+    weather = _weather(history, **{CONF_CORRECTION_HOURS: 6})
+    weather.gethourdata = AsyncMock(return_value={})
+
+    corrected = thishour - 12 * 3600
+    assert await weather.async_correct(history, corrected) == corrected
+    weather.gethourdata.assert_awaited_once_with(thishour - 6 * 3600)
+
+    # disabled by default
+    weather = _weather(history)
+    weather.gethourdata = AsyncMock()
+    assert await weather.async_correct(history, corrected) == corrected
+    weather.gethourdata.assert_not_awaited()
+
+
+async def test_backfill_plans_and_collects_the_missing_hours(
+    make_hour, make_history
+) -> None:
+    history = make_history(1)
+    thishour = _thishour()
+    gaps = [thishour - 10 * 3600, thishour - 5 * 3600]
+    for hour in gaps:
+        del history[str(hour)]
+    weather = _weather(history)
+    weather._cell.data = {"history": history}
+
+    plan = await weather.async_plan_backfill(thishour - 26 * 3600, thishour, 3)
+    assert not plan["clamped"]
+    assert plan["missing"] == 4
+    assert plan["calls"] == 3
+    assert plan["targets"] == [thishour - 26 * 3600, thishour - 25 * 3600, gaps[0]]
+    # older data would be aged out on the next update
+    plan = await weather.async_plan_backfill(0, thishour, 1000)
+    assert plan["clamped"]
+    assert plan["targets"][0] == thishour - (5 * 24 - 1) * 3600
+    assert plan["targets"][-2:] == gaps
+
+    # the job is saved with the cell data
+    weather.async_store_data = AsyncMock()
+    await weather.async_start_backfill({**plan, "targets": gaps})
+    assert weather._cell.data["backfill"] == {"Home": {"targets": gaps, "total": 2}}
+    weather.async_store_data.assert_awaited_once_with(
+        weather._cell.data, weather._cell.store_key
+    )
+    assert weather.backfill_progress() == 0
+
+    weather.gethourdata = AsyncMock(return_value=make_hour(1.0, 12))
+    await weather.async_run_backfill(history)
+    assert all(history[str(hour)]["rain"] == 1.0 for hour in gaps)
+    assert weather.backfill_remaining() == 0
+    assert weather.backfill_progress() == 100
+
+
+async def test_backfill_eta_allows_for_the_refresh_calls(make_history) -> None:
+    weather = _weather(make_history(1), **{CONF_MAX_DAYS: 10, CONF_MAX_CALLS: 100})
+    weather._cell.data = {"history": make_history(1)}
+
+    # the quota left today also covers the new hours and the forecast
+    plan = await weather.async_plan_backfill(0, _thishour(), 100)
+    assert plan["calls"] == 100
+    now = datetime.now(UTC)
+    tomorrow = datetime(now.year, now.month, now.day, tzinfo=UTC) + timedelta(days=1)
+    assert datetime.fromisoformat(plan["eta"]) > tomorrow
+
+
+def test_backfill_times_are_in_the_home_assistant_timezone() -> None:
+    sydney = ZoneInfo("Australia/Sydney")
+    with patch.object(dt_util, "DEFAULT_TIME_ZONE", sydney):
+        start, end = backfill_range(
+            {"start": datetime(2026, 6, 1, 6), "end": datetime(2026, 6, 2, 6)}
+        )
+        assert start == datetime(2026, 6, 1, 6, tzinfo=sydney).timestamp()
+        assert end - start == 86400
+        with pytest.raises(ServiceValidationError):
+            backfill_range({"start": datetime(2026, 6, 2), "end": datetime(2026, 6, 1)})
+
+
+def test_a_restored_backfill_keeps_its_progress(make_history) -> None:
+    weather = _weather(make_history(1))
+    weather.start_backfill({"targets": [3600], "total": 4})
+
+    assert weather.backfill_remaining() == 1
+    assert weather.backfill_progress() == 75
+    # jobs of other entries in the cell are kept
+    records = weather._backfill_records({"backfill": {"Work": {"total": 1}}})
+    assert records == {
+        "Work": {"total": 1},
+        "Home": {"targets": [3600], "total": 4},
+    }
+
+
+class _FakeRest:
+    """Return a canned response for any resource."""
+
+    data = '{"lat": -33.87, "data": [{"temp": 21.5}]}'
+
+    async def set_resource(self, hass, url) -> None:
+        self.url = url
+
+    async def async_update(self, log_errors=True) -> None:
+        pass
+
+
+async def test_call_data_shows_the_cached_response(make_history) -> None:
+    weather = _weather(make_history(1))
+
+    with (
+        patch(f"{MODULE}.async_dismiss"),
+        patch(f"{MODULE}.async_create") as create,
+    ):
+        response = await weather.show_call_data("timemachine")
+        assert response["response"] is None
+        assert response["age_seconds"] is None
+        assert not response["live"]
+
+        with patch(f"{MODULE}.RestData", _FakeRest):
+            await weather.get_rest("https://owm/?appid=key", "key", "timemachine")
+        response = await weather.show_call_data("timemachine")
+
+    # the key is never shown
+    assert response["url"] == "https://owm/?appid=**REDACTED**"
+    assert response["response"] == {"lat": -33.87, "data": [{"temp": 21.5}]}
+    assert response["age_seconds"] == 0
+    assert "21.5" in create.call_args.kwargs["message"]
+
+
+async def test_live_call_data_calls_the_api(make_history) -> None:
+    weather = _weather(make_history(1))
+    weather.async_call_api = AsyncMock(return_value=True)
+
+    with patch(f"{MODULE}.async_dismiss"), patch(f"{MODULE}.async_create"):
+        response = await weather.show_call_data("forecast", live=True)
+    weather.async_call_api.assert_awaited_once_with("forecast")
+    assert response["live"]
+
+
+async def test_live_call_data_without_a_call(make_history) -> None:
+    weather = _weather(make_history(1))
+    weather._keys.used("key", 429)
+
+    with patch(f"{MODULE}.async_dismiss"), patch(f"{MODULE}.async_create"):
+        # the cached response is not reported as live
+        response = await weather.show_call_data("forecast", live=True)
+        assert not response["live"]
+        with pytest.raises(ServiceValidationError):
+            await weather.show_call_data("unknown", live=True)
+
+
+async def test_forecast_days_are_local_days(make_history) -> None:
+    zone = ZoneInfo("Australia/Sydney")
+    weather = _weather(make_history(1), "Australia/Sydney")
+    weather._cell.rollup.place = (-33.87, 151.21, 40)
+    today = datetime.now(zone).replace(hour=0, minute=30, second=0, microsecond=0)
+    days = {
+        int((today + timedelta(days=offset)).timestamp()): {"rain": offset + 2}
+        for offset in (1, -1, 0)
+    }
+
+    processed = await weather.processdailyforecast(days)
+
+    # the day before today is dropped, the rest keyed by the local day ahead
+    assert sorted(processed) == ["f0", "f1"]
+    assert processed["f0"]["rain"] == 2
+    assert processed["f1"]["rain"] == 3
+    assert processed["f1"]["datetime"] == (today + timedelta(days=1)).isoformat()
@@ -29,6 +29,19 @@ async def validate_api_key(api_key, mode):
     return errors, description_placeholders
 
 
+async def validate_api_keys(api_key, api_keys, mode):
+    """Validate the primary key and any additional comma separated keys."""
+    errors, description_placeholders = await validate_api_key(api_key, mode)
+    for key in (api_keys or "").split(","):
+        if errors:
+            break
+        if key.strip():
+            errors, description_placeholders = await validate_api_key(
+                key.strip(), mode
+            )
+    return errors, description_placeholders
+
+
 def register_static_path(app: web.Application, url_path: str, path):
     """Register static path with CORS."""
 
@@ -0,0 +1,422 @@
+"""Template variables shared by all the sensors of an entry."""
+
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+import re
+
+from .rollup import DailyRollup
+
+# text variables, given a text placeholder when validating formulas
+PLACEHOLDER_TEXT = (
+    "date",
+    "description",
+    "season_start",
+    "last_event_start",
+    "last_event_end",
+)
+FORECAST_DAYS = 6
+
+# structured variables: period prefix, field to processed value name
+VIEWS = {
+    "day": (
+        "",
+        {
+            "rain": "rain",
+            "snow": "snow",
+            "max": "max_temp",
+            "min": "min_temp",
+            "et0": "et0",
+        },
+    ),
+    "localday": (
+        "l",
+        {
+            "rain": "rain",
+            "snow": "snow",
+            "max": "max_temp",
+            "min": "min_temp",
+            "et0": "et0",
+        },
+    ),
+    "aggregate": (
+        "a",
+        {
+            "date": "date",
+            "precipitation": "precipitation",
+            "max": "max_temp",
+            "min": "min_temp",
+        },
+    ),
+    "forecast": (
+        "f",
+        {
+            "pop": "pop",
+            "rain": "rain",
+            "snow": "snow",
+            "humidity": "humidity",
+            "max": "max_temp",
+            "min": "min_temp",
+            "wind_deg": "wind_deg",
+            "wind_speed": "wind_speed",
+            "uvi": "uvi",
+            "clouds": "clouds",
+            "description": "description",
+            "et0": "et0",
+        },
+    ),
+    "current": (
+        "current",
+        {
+            field: field
+            for field in (
+                "rain",
+                "snow",
+                "humidity",
+                "temp",
+                "pressure",
+                "wind_deg",
+                "wind_speed",
+                "uvi",
+                "clouds",
+                "description",
+                "dew_point",
+            )
+        },
+    ),
+    "hourly": (
+        "plotly",
+        {
+            field: f"plotly_{field}"
+            for field in (
+                "time",
+                "rain",
+                "snow",
+                "temp",
+                "pressure",
+                "clouds",
+                "humidity",
+                "wind_speed",
+                "uvi",
+            )
+        },
+    ),
+}
+# views with an entry per day
+_SERIES = ("day", "localday", "aggregate", "forecast")
+_SERIES_PERIOD = re.compile(r"(?P<prefix>[alf]?)\d+")
+
+
+class PeriodView(Mapping):
+    """Read only fields of one period, looked up when a template reads them.
+
+    Templates read the fields as attributes, e.g. current.temp.
+    """
+
+    __slots__ = ("_fields", "_period", "_weather")
+
+    def __init__(self, weather, period, fields) -> None:  # noqa: D107
+        self._weather = weather
+        self._period = period
+        self._fields = fields
+
+    def __getitem__(self, field):  # noqa: D105
+        return self._weather.processed_value(self._period, self._fields[field])
+
+    def __iter__(self):  # noqa: D105
+        return iter(self._fields)
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._fields)
+
+    def __repr__(self) -> str:  # noqa: D105
+        return repr(dict(self))
+
+
+class SeriesView(Sequence):
+    """Read only days of a structured variable, e.g. day[0].rain.
+
+    Loops, slices and filters such as sum(attribute='rain') read the
+    processed data directly, a day is only looked up when it is read.
+    """
+
+    __slots__ = ("_fields", "_length", "_prefix", "_weather")
+
+    def __init__(self, weather, prefix, fields, length) -> None:  # noqa: D107
+        self._weather = weather
+        self._prefix = prefix
+        self._fields = fields
+        self._length = length
+
+    def __getitem__(self, index):  # noqa: D105
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        period = f"{self._prefix}{index}" if self._prefix else index
+        return PeriodView(self._weather, period, self._fields)
+
+    def __len__(self) -> int:  # noqa: D105
+        return self._length
+
+
+def structured_view(weather, name, days):
+    """Return the structured variable of the weather."""
+    prefix, fields = VIEWS[name]
+    if name not in _SERIES:
+        return PeriodView(weather, prefix, fields)
+    length = FORECAST_DAYS if name == "forecast" else int(days)
+    return SeriesView(weather, prefix, fields, length)
+
+
+def plain(value):
+    """Return the value with structured views copied, e.g. for attributes."""
+    if isinstance(value, PeriodView):
+        return dict(value)
+    if isinstance(value, SeriesView):
+        return [dict(period) for period in value]
+    return value
+
+
+def view_name(period) -> str | None:
+    """Return the structured variable a processed period belongs to."""
+    if isinstance(period, int):
+        return "day"
+    match = _SERIES_PERIOD.fullmatch(period)
+    if match is not None:
+        return {"a": "aggregate", "l": "localday", "f": "forecast"}.get(
+            match["prefix"]
+        )
+    for name, (prefix, _fields) in VIEWS.items():
+        if prefix == period:
+            return name
+    return None
+
+
+def _declare(weather, days) -> dict:
+    """Return the template variables of the weather."""
+    wvars = {}
+    # default to initial days variable
+    for i in range(int(days)):
+        wvars[f"day{i}rain"] = weather.processed_value(i, "rain")
+        wvars[f"day{i}snow"] = weather.processed_value(i, "snow")
+        wvars[f"day{i}max"] = weather.processed_value(i, "max_temp")
+        wvars[f"day{i}min"] = weather.processed_value(i, "min_temp")
+        wvars[f"day{i}et0"] = weather.processed_value(i, "et0")
+
+    # local calendar days, localday0 is the current date
+    for i in range(int(days)):
+        wvars[f"localday{i}rain"] = weather.processed_value(f"l{i}", "rain")
+        wvars[f"localday{i}snow"] = weather.processed_value(f"l{i}", "snow")
+        wvars[f"localday{i}max"] = weather.processed_value(f"l{i}", "max_temp")
+        wvars[f"localday{i}min"] = weather.processed_value(f"l{i}", "min_temp")
+        wvars[f"localday{i}et0"] = weather.processed_value(f"l{i}", "et0")
+
+    for i in range(int(days)):
+        wvars[f"aggregate{i}date"] = weather.processed_value(f"a{i}", "date")
+        wvars[f"aggregate{i}precipitation"] = weather.processed_value(
+            f"a{i}", "precipitation"
+        )
+        wvars[f"aggregate{i}max"] = weather.processed_value(f"a{i}", "max_temp")
+        wvars[f"aggregate{i}min"] = weather.processed_value(f"a{i}", "min_temp")
+
+    # forecast provides 7 days of data
+    for i in range(FORECAST_DAYS):
+        wvars[f"forecast{i}pop"] = weather.processed_value(f"f{i}", "pop")
+        wvars[f"forecast{i}rain"] = weather.processed_value(f"f{i}", "rain")
+        wvars[f"forecast{i}snow"] = weather.processed_value(f"f{i}", "snow")
+        wvars[f"forecast{i}humidity"] = weather.processed_value(f"f{i}", "humidity")
+        wvars[f"forecast{i}max"] = weather.processed_value(f"f{i}", "max_temp")
+        wvars[f"forecast{i}min"] = weather.processed_value(f"f{i}", "min_temp")
+        wvars[f"forecast{i}wind_deg"] = weather.processed_value(f"f{i}", "wind_deg")
+        wvars[f"forecast{i}wind_speed"] = weather.processed_value(
+            f"f{i}", "wind_speed"
+        )
+        wvars[f"forecast{i}uvi"] = weather.processed_value(f"f{i}", "uvi")
+        wvars[f"forecast{i}clouds"] = weather.processed_value(f"f{i}", "clouds")
+        wvars[f"forecast{i}description"] = weather.processed_value(
+            f"f{i}", "description"
+        )
+        wvars[f"forecast{i}et0"] = weather.processed_value(f"f{i}", "et0")
+
+    # current observations
+    wvars["current_rain"] = weather.processed_value("current", "rain")
+    wvars["current_snow"] = weather.processed_value("current", "snow")
+    wvars["current_humidity"] = weather.processed_value("current", "humidity")
+    wvars["current_temp"] = weather.processed_value("current", "temp")
+    wvars["current_pressure"] = weather.processed_value("current", "pressure")
+    wvars["current_wind_deg"] = weather.processed_value("current", "wind_deg")
+    wvars["current_wind_speed"] = weather.processed_value("current", "wind_speed")
+    wvars["current_uvi"] = weather.processed_value("current", "uvi")
+    wvars["current_clouds"] = weather.processed_value("current", "clouds")
+    wvars["current_description"] = weather.processed_value("current", "description")
+    wvars["current_dew_point"] = weather.processed_value("current", "dew_point")
+    # reference evapotranspiration not replaced by rain
+    wvars["et0_deficit"] = weather.processed_value("balance", "et0_deficit")
+    wvars["soil_moisture"] = weather.processed_value("soil", "soil_moisture")
+    wvars["soil_deficit"] = weather.processed_value("soil", "soil_deficit")
+    wvars["snowpack"] = weather.processed_value("soil", "snowpack")
+    # season accumulators
+    wvars["season_start"] = weather.processed_value("season", "season_start")
+    wvars["gdd"] = weather.processed_value("season", "gdd")
+    wvars["chill_hours"] = weather.processed_value("season", "chill_hours")
+    wvars["frost_hours"] = weather.processed_value("season", "frost_hours")
+    # rain events
+    wvars["last_event_start"] = weather.processed_value(
+        "events", "last_event_start"
+    )
+    wvars["last_event_end"] = weather.processed_value("events", "last_event_end")
+    wvars["last_event_total"] = weather.processed_value(
+        "events", "last_event_total"
+    )
+    wvars["last_event_peak"] = weather.processed_value("events", "last_event_peak")
+    wvars["last_event_hours"] = weather.processed_value(
+        "events", "last_event_hours"
+    )
+    wvars["current_event_total"] = weather.processed_value(
+        "events", "current_event_total"
+    )
+    wvars["current_event_hours"] = weather.processed_value(
+        "events", "current_event_hours"
+    )
+    wvars["hours_since_rain"] = weather.processed_value(
+        "events", "hours_since_rain"
+    )
+    wvars["current_dry_spell_days"] = weather.processed_value(
+        "events", "current_dry_spell_days"
+    )
+    # special values
+    wvars["remaining_backlog"] = weather.remaining_backlog()
+    wvars["daily_count"] = weather.daily_count()
+    wvars["backfill_remaining"] = weather.backfill_remaining()
+    wvars["backfill_progress"] = weather.backfill_progress()
+    wvars["loop_blocking_ms"] = weather.loop_blocking()
+    wvars["hourly_time"] = weather.processed_value("plotly", "plotly_time")
+    wvars["hourly_rain"] = weather.processed_value("plotly", "plotly_rain")
+    wvars["hourly_snow"] = weather.processed_value("plotly", "plotly_snow")
+    wvars["hourly_temp"] = weather.processed_value("plotly", "plotly_temp")
+    wvars["hourly_pressure"] = weather.processed_value("plotly", "plotly_pressure")
+    wvars["hourly_clouds"] = weather.processed_value("plotly", "plotly_clouds")
+    wvars["hourly_humidity"] = weather.processed_value("plotly", "plotly_humidity")
+    wvars["hourly_wind_speed"] = weather.processed_value(
+        "plotly", "plotly_wind_speed"
+    )
+    wvars["hourly_uvi"] = weather.processed_value("plotly", "plotly_uvi")
+    # rolling window functions e.g. rain_last(36)
+    wvars.update(weather.window_functions())
+    # structured views e.g. day[0].rain or forecast[:3]|sum(attribute='pop')
+    for name in VIEWS:
+        wvars[name] = weather.view(name, int(days))
+
+    return wvars
+
+
+class _Recorder:
+    """Records the call that resolves each variable instead of making it."""
+
+    def __getattr__(self, method):
+        return lambda *args: (method, args)
+
+    def window_functions(self):
+        return {
+            name: ("window_function", (name,))
+            for name in DailyRollup("UTC", 0).functions()
+        }
+
+
+@lru_cache(maxsize=8)
+def variable_table(days) -> dict:
+    """Return the name to (method, arguments) table of the variables."""
+    return _declare(_Recorder(), days)
+
+
+class Variables(Mapping):
+    """Read only template variables resolved on first access.
+
+    The names are known up front, a value is only looked up from the weather
+    when a template reads it and is then kept for the rest of the update.
+    """
+
+    def __init__(self, weather, days) -> None:  # noqa: D107
+        self._weather = weather
+        self._table = variable_table(int(days))
+        self._values = {}
+
+    def __getitem__(self, name):  # noqa: D105
+        try:
+            return self._values[name]
+        except KeyError:
+            method, args = self._table[name]
+        value = getattr(self._weather, method)(*args)
+        self._values[name] = value
+        return value
+
+    def versions(self, names) -> tuple | None:
+        """Return the change versions of the names, None if one is untracked.
+
+        Only the processed values and the structured views are versioned,
+        the window functions and the special values can change without new
+        data and are untracked.
+        """
+        versions = []
+        for name in names:
+            method, args = self._table.get(name, (None, None))
+            if method == "processed_value":
+                versions.append(self._weather.value_version(*args))
+            elif method == "view":
+                versions.append(self._weather.value_version("view", args[0]))
+            elif method is not None:
+                return None
+        return tuple(versions)
+
+    def __contains__(self, name) -> bool:  # noqa: D105
+        return name in self._table
+
+    def __iter__(self):  # noqa: D105
+        return iter(self._table)
+
+    def __len__(self) -> int:  # noqa: D105
+        return len(self._table)
+
+
+class Placeholder:
+    """Stands in for the weather when validating formulas in the config flow.
+
+    Every variable the sensors see is defined, with a placeholder value.
+    """
+
+    def __init__(self, timezone="UTC") -> None:  # noqa: D107
+        self._rollup = DailyRollup(timezone, 0)
+
+    def processed_value(self, period, value):
+        """Return a placeholder of the type the variable holds."""
+        if period == "plotly":
+            return []
+        if value in PLACEHOLDER_TEXT:
+            return "text"
+        return 0
+
+    def remaining_backlog(self):  # noqa: D102
+        return 0
+
+    def daily_count(self):  # noqa: D102
+        return 0
+
+    def backfill_remaining(self):  # noqa: D102
+        return 0
+
+    def backfill_progress(self):  # noqa: D102
+        return 0
+
+    def loop_blocking(self):  # noqa: D102
+        return 0
+
+    def value_version(self, period, value):  # noqa: D102
+        return 0
+
+    def window_function(self, name):  # noqa: D102
+        return self._rollup.functions()[name]
+
+    def view(self, name, days):  # noqa: D102
+        return structured_view(self, name, days)
@@ -1,10 +1,15 @@
 """Define the weather class."""
 
-from datetime import date, datetime, timedelta
+from __future__ import annotations
+
+from collections import deque
+import contextlib
+from datetime import UTC, date, datetime, timedelta
 import json
 import logging
+import math
 import re
-from zoneinfo import ZoneInfo
+import time
 
 from homeassistant.components.persistent_notification import async_create, async_dismiss
 from homeassistant.const import (
@@ -15,27 +20,54 @@ from homeassistant.const import (
     CONF_NAME,
 )
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
 from homeassistant.helpers import storage as store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 
 # from homeassistant.helpers import config_validation as cv, storage as store
+from .aggregates import DailyAggregates
 from .const import (
+    CONF_API_KEYS,
+    CONF_CORRECTION_HOURS,
+    CONF_FROST_THRESHOLD,
+    CONF_GDD_BASE,
+    CONF_GDD_CAP,
+    CONF_GRID_SIZE,
     CONF_INTIAL_DAYS,
     CONF_MAX_CALLS,
     CONF_MAX_DAYS,
+    CONF_SEASON_START,
+    CONF_SOIL_CAPACITY,
+    CONF_SOIL_DRAINAGE,
     CONST_API_AGGREGATE,
     CONST_API_CALL,
     CONST_API_FORECAST,
     CONST_API_OVERVIEW,
     CONST_CALLS,
+    CONST_CORRECTION_CALLS,
+    CONST_CORRECTION_DELAY,
+    CONST_EXECUTOR_BYTES,
+    CONST_EXECUTOR_HOURS,
+    CONST_EXECUTOR_SENSORS,
     CONST_INITIAL,
+    CONST_UPDATE_MINUTES,
     DOMAIN,
+    OPTIONS_API,
 )
 from .data import RestData
+from .evapotranspiration import daily_et0, location
+from .gridcell import get_cell, release_cell
+from .keypool import KeyPool
+from .models import RainEvents, SeasonAccumulators, SoilBucket
+from .rollup import DailyRollup
+from .variables import Variables, structured_view, view_name
 
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_NAME = "OpenWeatherMap History"
+# tells a removed processed value from one holding None
+_MISSING = object()
 
 
 class WeatherCoordinator(DataUpdateCoordinator):
@@ -47,13 +79,17 @@ class WeatherCoordinator(DataUpdateCoordinator):
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(minutes=5),
+            update_interval=timedelta(minutes=CONST_UPDATE_MINUTES),
         )
         self._weather = weather
+        # evaluates the sensor formulas, set up by the sensor platform
+        self.render_pass = None
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
         await self._weather.async_update()
+        if self.render_pass is not None:
+            await self._weather.async_render(self.render_pass)
         return self._weather
 
 
@@ -74,14 +110,52 @@ class Weather:
         self._name = config.get(CONF_NAME, DEFAULT_NAME)
         self._lat = config[CONF_LOCATION].get(CONF_LATITUDE, hass.config.latitude)
         self._lon = config[CONF_LOCATION].get(CONF_LONGITUDE, hass.config.longitude)
-        self._key = config[CONF_API_KEY]
         self._initdays = config.get(CONF_INTIAL_DAYS, 5)
         self._maxdays = config.get(CONF_MAX_DAYS, 5)
         self._maxcalls = config.get(CONF_MAX_CALLS, 1000)
+        self._correction_hours = int(config.get(CONF_CORRECTION_HOURS, 0))
+        # additional keys are rotated with the primary key
+        self._keys = KeyPool(
+            [config[CONF_API_KEY], *config.get(CONF_API_KEYS, "").split(",")],
+            self._maxcalls,
+        )
+        self._last_code = None
+        # entries in the same grid cell share one set of fetched data
+        self._cell = get_cell(
+            hass, self._name, self._lat, self._lon, config.get(CONF_GRID_SIZE, 0)
+        )
+        self._cell.join(self._name, self._maxdays)
+        self._lat = self._cell.lat
+        self._lon = self._cell.lon
         self._backlog = 0
         self._processing_type = None
         self._daily_count = 1
         self._warning_issued = False
+        self._backfill = None
+        # per entry models advanced from the cells history
+        capacity = float(config.get(CONF_SOIL_CAPACITY, 0))
+        drainage = float(config.get(CONF_SOIL_DRAINAGE, 2))
+        self._models = [SoilBucket([capacity, drainage])] if capacity > 0 else []
+        self._models.append(
+            SeasonAccumulators(
+                [
+                    config.get(CONF_SEASON_START, "01-01"),
+                    float(config.get(CONF_GDD_BASE, 10)),
+                    float(config.get(CONF_GDD_CAP, 30)),
+                    float(config.get(CONF_FROST_THRESHOLD, 0)),
+                ]
+            )
+        )
+        self._models.append(RainEvents([]))
+        self._models_loaded = False
+        # seconds of the current update spent waiting, and the time it blocked
+        self._waited = 0
+        self._blocking_ms = 0
+        # template variables, rebuilt once per update
+        self._variables = None
+        self.variables_version = 0
+        # update at which each processed value last changed
+        self._versions = {}
 
     async def async_get_stored_data(self, key):
         """Get data from .storage."""
@@ -94,16 +168,79 @@ class Weather:
 
     async def async_store_data(self, content, key):
         """Put data into .storage."""
-        x = store.Store[dict[any]](self._hass, 1, key)
-        await x.async_save(content)
+        # large histories are serialised in the executor
+        x = store.Store[dict[any]](
+            self._hass,
+            1,
+            key,
+            serialize_in_event_loop=len(content.get("history", {}))
+            < CONST_EXECUTOR_HOURS,
+        )
+        started = time.perf_counter()
+        try:
+            await x.async_save(content)
+        finally:
+            self._waited += time.perf_counter() - started
+
+    async def async_offload(self, func, *args):
+        """Run a job in the executor, the event loop only waits for the result."""
+        started = time.perf_counter()
+        try:
+            return await self._hass.async_add_executor_job(func, *args)
+        finally:
+            self._waited += time.perf_counter() - started
+
+    def variables(self):
+        """Return the read only template variables of the last update."""
+        if self._variables is None:
+            self._variables = Variables(self, max(self._maxdays, self._initdays))
+        return self._variables
+
+    async def async_render(self, render_pass):
+        """Evaluate the sensors of the entry, in the executor for many sensors."""
+        if len(render_pass) > CONST_EXECUTOR_SENSORS:
+            # the window functions read the shared roll up
+            async with self._cell.lock:
+                await self.async_offload(render_pass.run, self.variables())
+        else:
+            render_pass.run(self.variables())
+
+    def loop_blocking(self) -> float:
+        """Return the milliseconds the last update held the event loop."""
+        return self._blocking_ms
+
+    def close(self):
+        """Release the shared grid cell."""
+        if self._cell.rollup is not None:
+            for model in self._models:
+                with contextlib.suppress(ValueError):
+                    self._cell.rollup.listeners.remove(model.rewind)
+        release_cell(self._hass, self._cell, self._name)
 
     def remaining_backlog(self):
         "Return remaining days to collect."
         return self._backlog
 
+    def backfill_remaining(self):
+        """Return the calls remaining in the requested backfill."""
+        if not self._backfill:
+            return 0
+        return len(self._backfill["targets"])
+
+    def backfill_progress(self):
+        """Return the percentage of the requested backfill completed."""
+        if not self._backfill or not self._backfill["total"]:
+            return 100
+        done = self._backfill["total"] - len(self._backfill["targets"])
+        return round(done / self._backfill["total"] * 100)
+
     def remaining_calls(self):
-        """Return remaining call count."""
-        return self._maxcalls - self._daily_count
+        """Return remaining call count across all keys."""
+        return self._keys.remaining()
+
+    def calls_per_refresh(self):
+        """Return the call limit for a single refresh, scaled by the active keys."""
+        return CONST_CALLS * max(1, self._keys.active())
 
     def call_limit_warning(self):
         """Issue a warning when the call limit is exceeded."""
@@ -113,13 +250,13 @@ class Weather:
 
     def validate_data(self, data) -> bool:
         """Check if the call was successful."""
-
+        self._last_code = None
         if data is None or data == {}:
             _LOGGER.warning("OpenWeatherMap call failed, no data returned")
             return {}
 
         try:
-            jdata = json.loads(data)
+            jdata = data if isinstance(data, dict) else json.loads(data)
         except TypeError:
             _LOGGER.warning("OpenWeatherMap call failed, invalid json format, %s", data)
             return {}
@@ -127,25 +264,50 @@ class Weather:
             code = jdata["cod"]
             message = jdata["message"]
             _LOGGER.warning("OpenWeatherMap call failed code: %s: %s", code, message)
+            with contextlib.suppress(TypeError, ValueError):
+                self._last_code = int(code)
         except KeyError:
             return jdata
             # return {}
         else:
             return {}
 
-    async def get_rest(self, url):
+    async def get_rest(self, url, key, api):
         """Get the data from the WWW."""
         rest = RestData()
         await rest.set_resource(self._hass, url)
+        started = time.perf_counter()
         await rest.async_update(log_errors=False)
-        result = self.validate_data(rest.data)
+        self._waited += time.perf_counter() - started
+        data = rest.data
+        if data and len(data) > CONST_EXECUTOR_BYTES:
+            # large responses are parsed off the event loop
+            with contextlib.suppress(ValueError):
+                data = await self.async_offload(json.loads, data)
+        result = self.validate_data(data)
         if result:
             _LOGGER.debug(url)
             _LOGGER.debug(result)
+            # keep the raw response for the api_call action
+            self._cell.responses[api] = {
+                "url": url.replace(key, "**REDACTED**"),
+                "time": datetime.now(UTC),
+                "data": result,
+            }
 
         self._daily_count += 1
+        # auth and quota failures take the key out of the rotation
+        self._keys.used(key, self._last_code)
         return result
 
+    def next_key(self):
+        """Return the next API key with calls remaining."""
+        key = self._keys.next_key()
+        if key is None:
+            # only issue a single warning each day
+            self.call_limit_warning()
+        return key
+
     async def get_data(self, historydata):
         """Get data from the newest timestamp forward."""
         hour = datetime(
@@ -157,9 +319,9 @@ class Weather:
         if self._processing_type == CONST_INITIAL:
             hours = 1
         else:
-            hours = CONST_CALLS
+            hours = self.calls_per_refresh()
 
-        last_data_point = self.maxdict(data)
+        last_data_point = self._cell.rollup.last()
         if last_data_point is None:
             # no data yet just get this hours dataset
             last_data_point = thishour - 3600
@@ -172,7 +334,7 @@ class Weather:
             hourdata = await self.gethourdata(last_data_point)
             if hourdata == {}:
                 break
-            data.update({last_data_point: hourdata})
+            self.add_hour(data, last_data_point, hourdata)
         # end rest loop
         return data
 
@@ -183,13 +345,16 @@ class Weather:
         if self.remaining_calls() < 1:
             # only issue a single warning each day
             self.call_limit_warning()
-            return {}
-        today = datetime.today().strftime("%Y-%m-%d")
+            return aggregate
+        today = self._cell.rollup.localdays.date(0).isoformat()
         if indate:
             today = indate
 
-        url = CONST_API_AGGREGATE % (self._lat, self._lon, today, self._key)
-        result = await self.get_rest(url)
+        key = self.next_key()
+        if key is None:
+            return aggregate
+        url = CONST_API_AGGREGATE % (self._lat, self._lon, today, key)
+        result = await self.get_rest(url, key, "day_summary")
 
         if result:
             day = {}
@@ -200,7 +365,7 @@ class Weather:
             day.update({"max_temp": result.get("temperature").get("max", 0)})
             day.update({"humidity": result.get("humidity").get("afternoon", 0)})
             day.update({"pressure": result.get("pressure").get("afternoon", 0)})
-            aggregate[result.get("date")] = day
+            self._cell.aggregates.add(day)
 
         return aggregate
 
@@ -212,8 +377,11 @@ class Weather:
             self.call_limit_warning()
             return {}
 
-        url = CONST_API_FORECAST % (self._lat, self._lon, self._key)
-        result = await self.get_rest(url)
+        key = self.next_key()
+        if key is None:
+            return {}
+        url = CONST_API_FORECAST % (self._lat, self._lon, key)
+        result = await self.get_rest(url, key, "forecast")
         days = []
         current = {}
         if result:
@@ -288,9 +456,12 @@ class Weather:
     async def processdailyforecast(self, dailydata):
         "Process daily forecast data."
         processed_data = {}
-        for i, (timestamp, data) in enumerate(
-            sorted(dailydata.items(), key=lambda item: int(item[0]))
-        ):
+        localdays = self._cell.rollup.localdays
+        for timestamp, data in dailydata.items():
+            # the local day ahead of today, forecasts for past days are dropped
+            ahead = -localdays.offset(timestamp)
+            if ahead < 0:
+                continue
             # get the days data
             day = {}
             # update the days data
@@ -308,108 +479,60 @@ class Weather:
             day.update({"description": data.get("description", "")})
             day.update(
                 {
-                    "datetime": datetime.fromtimestamp(
-                        int(timestamp), tz=ZoneInfo(self._timezone)
-                    ).isoformat()
+                    "et0": daily_et0(
+                        int(timestamp),
+                        day["min_temp"],
+                        day["max_temp"],
+                        day["humidity"],
+                        day["wind_speed"],
+                        day["pressure"],
+                        day["clouds"],
+                        self._cell.rollup.place,
+                    )
                 }
             )
-            processed_data.update({f"f{i}": day})
+            day.update({"datetime": localdays.local(timestamp).isoformat()})
+            processed_data.update({f"f{ahead}": day})
         return processed_data
 
     async def processdailyaggregate(self, aggregatedata):
         "Process daily aggregate data."
-        # remove excess aggregate data (more than specified days)
-        sorteddata = sorted(
-            aggregatedata.items(),
-            reverse=True,
-            key=lambda x: datetime.strptime(x[0], "%Y-%m-%d"),
-        )
-        for i, values in enumerate(sorteddata):
-            val = list(values)[0]
-            if i > self._maxdays - 1:
-                aggregatedata.pop(val)
-        processed_data = {}
-        for i, values in enumerate(sorteddata):
-            # if day is earlier than n days ago
-            day = {}
-            data = values[1]
-            day.update({"date": data.get("date")})
-            day.update({"precipitation": data.get("precipitation")})
-            day.update({"min_temp": data.get("min_temp")})
-            day.update({"max_temp": data.get("max_temp")})
-            day.update({"humidity": data.get("humidity")})
-            day.update({"pressure": data.get("pressure")})
-
-            processed_data.update({f"a{i}": day})
-        return aggregatedata, processed_data
+        # age out days older than the longest retention in the cell
+        aggregates = self._cell.aggregates
+        today = self._cell.rollup.localdays.today
+        aggregates.evict(today - int(self._cell.max_days()) + 1)
+        return aggregates.data, aggregates.views(self._maxdays)
+
+    def add_hour(self, historydata, hour, hourdata):
+        """Store an hour of history and roll it into its day."""
+        historydata[str(hour)] = hourdata
+        self._cell.rollup.ingest(hour, hourdata)
+
+    def add_hours(self, historydata, hours):
+        """Store older hours of history and merge them into the roll up at once."""
+        for hour, hourdata in hours.items():
+            historydata[str(hour)] = hourdata
+        self._cell.rollup.ingest_many(hours.items())
 
     async def processhistory(self, historydata):
         """Process history data."""
-        removehours = []
-        processed_data = {}
-        day = {}
-        # x = []
-        # y = []
-        time = []
-        plotly_rain = []
-        plotly_snow = []
-        plotly_temp = []
-        plotly_pressure = []
-        plotly_clouds = []
-        plotly_humidity = []
-        plotly_wind_speed = []
-        plotly_uvi = []
-
-        for hour, data in sorted(
-            historydata.items(), key=lambda x: int(x[0])
-        ):  # sorted by hour
-            localday = datetime.fromtimestamp(int(hour), tz=ZoneInfo(self._timezone))
-            localnow = datetime.now(ZoneInfo(self._timezone))
-            localdaynum = (localnow - localday).days
-
-            self._num_days = max(self._num_days, localdaynum)
-            if localdaynum > self._maxdays - 1:
-                # identify data to age out
-                removehours.append(hour)
-                continue
-            # get the days data
-            day = processed_data.get(localdaynum, {})
-
-            # process the new data
-            rain = day.get("rain", 0) + data["rain"]
-            snow = day.get("snow", 0) + data["snow"]
-            mintemp = min(data["temp"], day.get("min_temp", 999), 999)
-            maxtemp = max(data["temp"], day.get("max_temp", -999), -999)
-            # update the days data
-            day.update({"rain": round(rain, 2)})
-            day.update({"snow": snow})
-            day.update({"min_temp": mintemp})
-            day.update({"max_temp": maxtemp})
-            processed_data.update({localdaynum: day})
-
-            time.append(localday.strftime("%Y-%m-%dT%H:%M"))
-            plotly_rain.append(round(data["rain"], 2))
-            plotly_snow.append(round(data["snow"], 2))
-            plotly_temp.append(round(data["temp"], 2))
-            plotly_pressure.append(round(data["pressure"], 2))
-            plotly_clouds.append(round(data.get("clouds",0), 0))
-            plotly_humidity.append(round(data.get("humidity",0), 2))
-            plotly_wind_speed.append(round(data.get("wind_speed",0), 2))
-            plotly_uvi.append(round(data.get("uvi",0), 0))
-
-        # age out old data
-        for hour in removehours:
-            historydata.pop(hour)
-        plotly = {
-            "plotly_time": time,
-            "plotly_rain": plotly_rain,
-            "plotly_snow": plotly_snow,
-            "plotly_temp": plotly_temp,
-            "plotly_pressure": plotly_pressure,
-            "plotly_clouds": plotly_clouds,
-            "plotly_humidity": plotly_humidity,
-            "plotly_wind_speed": plotly_wind_speed,
-            "plotly_uvi": plotly_uvi,
+        rollup = self._cell.rollup
+        today = rollup.today()
+        now = time.time()
+        # age out old data, whole local days are kept for the longest
+        # retention in the cell, back to the day its oldest 24 hours start on
+        oldest = rollup.localdays.ordinal(int(now) - int(self._cell.max_days()) * 86400)
+        for hour in rollup.evict(oldest):
+            historydata.pop(str(hour), None)
+        if rollup.first() is not None:
+            self._num_days = max(self._num_days, int(now - rollup.first()) // 86400)
+        # day{i} are the 24 hour periods before now, localday{i} the dates
+        processed_data = rollup.windows(now, self._maxdays)
+        for offset, day in rollup.days(today, self._maxdays).items():
+            processed_data[f"l{offset}"] = day
+        plotly = rollup.plotly(today, self._maxdays)
+        processed_data["balance"] = {
+            "et0_deficit": rollup.deficit(today, self._maxdays)
         }
         return historydata, processed_data, plotly
 
@@ -438,53 +561,150 @@ class Weather:
         data = self._processed.get(period, {})
         return data.get(value, 0)
 
-    async def show_call_data(self, api):
-        """Call the api and show the result."""
+    def value_version(self, period, value) -> int:
+        """Return the update at which a processed value last changed."""
+        return self._versions.get((period, value), 0)
+
+    def _track_changes(self, previous) -> None:
+        """Record the processed values that differ from the last update."""
+        for period in previous.keys() | self._processed.keys():
+            old = previous.get(period, {})
+            new = self._processed.get(period, {})
+            if old == new:
+                continue
+            view = view_name(period)
+            if view is not None:
+                self._versions[("view", view)] = self.variables_version
+            for value in old.keys() | new.keys():
+                if old.get(value, _MISSING) != new.get(value, _MISSING):
+                    self._versions[(period, value)] = self.variables_version
+
+    def window_function(self, name):
+        """Return a rolling window template function over the history."""
+        rollup = self._cell.rollup
+        if rollup is None:
+            rollup = DailyRollup(self._hass.config.time_zone, 0)
+        return rollup.functions()[name]
+
+    def view(self, name, days):
+        """Return a structured template variable over the processed data."""
+        return structured_view(self, name, days)
+
+    async def show_call_data(self, api, live=False):
+        """Show the most recent response for the api, calling it only if live.
+
+        live is reported False when the call could not be made, the cached
+        response is then shown.
+        """
+        if live:
+            live = await self.async_call_api(api)
+        cached = self._cell.responses.get(api)
+        if cached is None:
+            response = {"api": api, "url": None, "fetched": None, "age_seconds": None}
+            response["response"] = None
+        else:
+            response = {
+                "api": api,
+                "url": cached["url"],
+                "fetched": cached["time"].isoformat(),
+                "age_seconds": round(
+                    (datetime.now(UTC) - cached["time"]).total_seconds()
+                ),
+                "response": cached["data"],
+            }
+        response["live"] = live
+
+        card = [
+            "",
+            "**API Call**",
+            "```",
+            str(response["url"]),
+            "```",
+            f"**API Response** (age {response['age_seconds']} seconds)",
+            "```",
+            # format the json for output
+            json.dumps(response["response"], indent=4),
+            "```",
+            "",
+        ]
+        async_dismiss(self._hass, "owmhshowcall")
+        async_create(
+            self._hass,
+            message=chr(10).join(card),
+            title="OWMH API Response",
+            notification_id="owmhshowcall",
+        )
+        return response
+
+    def list_vars(self):
+        """List all available variables."""
+        card = "```" + chr(10)
+        card += f"Configured max days: {self._maxdays}" + chr(10)
+        card += f"Configured initial days: {self._initdays}" + chr(10)
+        for name, value in self.variables().items():
+            if callable(value):
+                card += f"{name}()" + chr(10)
+                continue
+            card += f"{name}: {value}" + chr(10)
+        card += "```" + chr(10)
+
+        async_dismiss(self._hass, "owmhlistsensors")
+        async_create(
+            self._hass,
+            message=card,
+            title="OWMH Attributes",
+            notification_id="owmhlistsensors",
+        )
+
+    async def async_call_api(self, api) -> bool:
+        """Call the api live, the response is cached for show_call_data.
+
+        Return False when no key has calls remaining or the call failed.
+        """
+        if api not in OPTIONS_API:
+            raise ServiceValidationError(f"Unknown OpenWeatherMap API: {api}")
+        key = self.next_key()
+        if key is None:
+            return False
+        now = dt_util.now()
         if api == "timemachine":
-            hour = datetime(
-                date.today().year,
-                date.today().month,
-                date.today().day,
-                datetime.now().hour,
-            )
-            thishour = int(datetime.timestamp(hour))
+            thishour = int(now.replace(minute=0, second=0, microsecond=0).timestamp())
             url = CONST_API_CALL % (
                 self._lat,
                 self._lon,
                 thishour,
-                self._key,
-            )  # self._key
+                key,
+            )
         elif api == "day_summary":
-            today = datetime.today().strftime("%Y-%m-%d")
-            url = CONST_API_AGGREGATE % (self._lat, self._lon, today, self._key)
+            today = now.strftime("%Y-%m-%d")
+            url = CONST_API_AGGREGATE % (self._lat, self._lon, today, key)
         elif api == "forecast":
-            url = CONST_API_FORECAST % (self._lat, self._lon, self._key)
-        elif api == "overview":
-            url = CONST_API_OVERVIEW % (self._lat, self._lon, self._key)
-
-        result = await self.get_rest(url)
-
-        card = "" + chr(10)
-        card += "**API Call**" + chr(10)
-        card += "```" + chr(10)
-        card += url + chr(10)
-        card += "```" + chr(10)
-        card += "**API Response**" + chr(10)
-        card += "```" + chr(10)
-        # format the json for output
-        card += json.dumps(result, indent=4) + chr(10)
-        card += "```" + chr(10)
+            url = CONST_API_FORECAST % (self._lat, self._lon, key)
+        else:
+            url = CONST_API_OVERVIEW % (self._lat, self._lon, key)
 
-        async_dismiss(self._hass, "owmhshowcall")
-        async_create(
-            self._hass,
-            message=card,
-            title="OWMH API Response",
-            notification_id="owmhshowcall",
-        )
+        return bool(await self.get_rest(url, key, api))
 
     async def async_update(self):
         """Update the weather stats."""
+        # only one entry in a cell fetches at a time, the others reuse its data
+        async with self._cell.lock:
+            started = time.perf_counter()
+            self._waited = 0
+            try:
+                await self._async_update()
+            finally:
+                self._blocking_ms = round(
+                    (time.perf_counter() - started - self._waited) * 1000, 1
+                )
+                _LOGGER.debug(
+                    "%s update blocked the event loop for %sms",
+                    self._name,
+                    self._blocking_ms,
+                )
+
+    async def _async_update(self):
+        """Fetch and process the data for the cell."""
         hour = datetime(
             date.today().year, date.today().month, date.today().day, datetime.now().hour
         )
@@ -492,21 +712,53 @@ class Weather:
         day = datetime(date.today().year, date.today().month, date.today().day)
         # GMT midnight
         midnight = int(datetime.timestamp(day))
-        # restore saved data
-        storeddata = await self.async_get_stored_data("OWMH_" + self._name)
-        historydata = storeddata.get("history", {})
+        # restore saved data once, it is then held in memory
+        if self._cell.data is None:
+            started = time.perf_counter()
+            self._cell.data = await self.async_get_stored_data(self._cell.store_key)
+            if not self._cell.data and self._cell.shared:
+                # a new cell starts from the data the location collected alone
+                self._cell.data = await self.async_get_stored_data(
+                    "OWMH_" + self._name
+                )
+            self._waited += time.perf_counter() - started
+        storeddata = self._cell.data
+        historydata = storeddata.setdefault("history", {})
         currentdata = storeddata.get("current", {})
         dailydata = storeddata.get("dailyforecast", {})
-        aggregate = storeddata.get("aggregate", {})
+        aggregate = storeddata.setdefault("aggregate", {})
+        if self._cell.aggregates is None:
+            self._cell.aggregates = DailyAggregates(aggregate)
+        # rebuild the daily roll up only when the timezone or retention changes
+        self._timezone = self._hass.config.time_zone
+        place = location(self._lat, self._lon, self._hass.config.elevation)
+        await self.async_rollup(historydata, place)
+        localdays = self._cell.rollup.localdays
+        for model in self._models:
+            if model.rewind not in self._cell.rollup.listeners:
+                self._cell.rollup.listeners.append(model.rewind)
+        if not self._models_loaded:
+            records = storeddata.get("models", {}).get(self._name, {})
+            for model in self._models:
+                model.load(records.get(model.name))
+            self._models_loaded = True
+            # a backfill started before a restart carries on
+            job = storeddata.get("backfill", {}).get(self._name)
+            # daily jobs of earlier versions are covered by the refresh
+            if job and job.get("resolution") != "daily" and self._backfill is None:
+                self.start_backfill(job)
         dailycalls = storeddata.get("dailycalls", {})
+        corrected = storeddata.get("corrected", 0)
         self._daily_count = dailycalls.get("count", 0)
+        self._keys.load(dailycalls)
         # reset the daily count on new UTC day
         if dailycalls.get("time", 0) < midnight:
             self._daily_count = 1
+            self._keys.reset()
             self._warning_issued = False
         aggregate_data = aggregate
         dailycalls = {"time": midnight, "count": self._daily_count}
-        last_data_point = self.maxdict(historydata)
+        last_data_point = self._cell.rollup.last()
         if self._processing_type == CONST_INITIAL:
             # on start up just get the latest hour
 
@@ -516,10 +768,12 @@ class Weather:
             aggregate_data = await self.get_aggregatedata(aggregate)
         elif int(datetime.today().minute) > 5:
             historydata = await self.async_backload(historydata)
-            for i in range(int(self._maxdays)):
-                today = (datetime.today() - timedelta(days=i)).strftime("%Y-%m-%d")
-                if not aggregate_data.get(today):
-                    aggregate_data = await self.get_aggregatedata(aggregate, today)
+            corrected = await self.async_correct(historydata, corrected)
+            historydata = await self.async_run_backfill(historydata)
+            for today in self._cell.aggregates.missing(
+                localdays.today, self._maxdays
+            ):
+                aggregate_data = await self.get_aggregatedata(aggregate, today)
 
         # empty file
         if last_data_point is None:
@@ -537,18 +791,13 @@ class Weather:
             aggregate_data = await self.get_aggregatedata(aggregate)
 
         # recaculate the backlog
-        data = historydata
         hour = datetime(
             date.today().year, date.today().month, date.today().day, datetime.now().hour
         )
         thishour = int(datetime.timestamp(hour))
-        if data == {}:
+        earliestdata = self._cell.rollup.first()
+        if earliestdata is None:
             earliestdata = thishour
-        else:
-            try:
-                earliestdata = self.mindict(data)
-            except ValueError:
-                earliestdata = thishour
 
         self._backlog = max(
             0, ((self._initdays * 24 * 3600) - (thishour - earliestdata)) / 3600
@@ -563,20 +812,38 @@ class Weather:
         data = await self.processdailyaggregate(aggregate_data)
         aggregate_data = data[0]
         processed_aggregate = data[1]
+        processed_models = {}
+        for model in self._models:
+            if model.pending(self._cell.rollup) > CONST_EXECUTOR_HOURS:
+                await self.async_offload(model.advance, self._cell.rollup)
+            else:
+                model.advance(self._cell.rollup)
+            processed_models[model.name] = model.values()
         # build data to support template variables
+        previous = self._processed
         self._processed = {
             **processeddaily,
             **processedcurrent,
             **processedweather,
             **processed_aggregate,
+            **processed_models,
             **plotly,
         }
+        self._variables = Variables(self, max(self._maxdays, self._initdays))
+        self.variables_version += 1
+        self._track_changes(previous)
 
+        # the record is shared by the entries of the cell, the counts of keys
+        # of the other entries are kept until the UTC day ends
+        stored = storeddata.get("dailycalls", {})
         dailycalls = {
             "time": midnight,
             "count": self._daily_count,
-            "lat": self._lat,
-            "lon": self._lon,
+            "lat": self._cell.lat,
+            "lon": self._cell.lon,
+            "keys": self._keys.record(
+                stored.get("keys") if stored.get("time", 0) >= midnight else None
+            ),
         }
 
         zone_data = {
@@ -585,26 +852,36 @@ class Weather:
             "dailyforecast": dailydata,
             "aggregate": aggregate_data,
             "dailycalls": dailycalls,
+            "corrected": corrected,
+            "backfill": self._backfill_records(storeddata),
+            "models": {
+                **storeddata.get("models", {}),
+                self._name: {model.name: model.record() for model in self._models},
+            },
         }
-        await self.async_store_data(zone_data, "OWMH_" + self._name)
-
-    def mindict(self, data):
-        """Find minimum dictionary key."""
-        if data == {}:
-            return None
-        mini = int(next(iter(data)))
-        for x in data:
-            mini = min(int(x), mini)
-        return mini
-
-    def maxdict(self, data):
-        """Find minimum dictionary key."""
-        if data == {}:
-            return None
-        maxi = int(next(iter(data)))
-        for x in data:
-            maxi = max(int(x), maxi)
-        return maxi
+        self._cell.data = zone_data
+        await self.async_store_data(zone_data, self._cell.store_key)
+
+    async def async_rollup(self, historydata, place):
+        """Create the roll up, replace it when the timezone, retention or place change.
+
+        A large history is rolled up in the executor into a new roll up, the
+        event loop only swaps it in once it is complete.
+        """
+        current = self._cell.rollup
+        max_days = self._cell.max_days()
+        if current is not None and current.matches(self._timezone, max_days, place):
+            current.localdays.refresh()
+            return
+        rollup = DailyRollup(self._timezone, max_days, place)
+        if len(historydata) > CONST_EXECUTOR_HOURS:
+            await self.async_offload(rollup.rebuild, historydata)
+        else:
+            rollup.rebuild(historydata)
+        if current is not None:
+            rollup.listeners = current.listeners
+            rollup.rewound()
+        self._cell.rollup = rollup
 
     async def async_backload(self, historydata):
         """Backload data."""
@@ -619,16 +896,12 @@ class Weather:
         if self._processing_type == CONST_INITIAL:
             hours = 1
         else:
-            hours = CONST_CALLS
+            hours = self.calls_per_refresh()
 
-        if data == {}:  # new location
-            # the oldest data collected so far
+        # the oldest data collected so far
+        earliestdata = self._cell.rollup.first()
+        if earliestdata is None:  # new location
             earliestdata = thishour
-        else:
-            try:
-                earliestdata = self.mindict(data)
-            except ValueError:
-                earliestdata = thishour
 
         expected_earliest_data = thishour - (self._initdays * 24 * 3600)
         backlog = earliestdata - expected_earliest_data - 3600
@@ -637,6 +910,7 @@ class Weather:
             return data
 
         x = 1
+        fetched = {}
         while x <= hours:
             # get the data for the hour
             data_point_time = earliestdata - (3600 * x)
@@ -644,16 +918,151 @@ class Weather:
             if hourdata == {}:
                 # no data found so abort the loop
                 break
-            # Add the data collected oected to the weather history
-            data.update({str(data_point_time): hourdata})
+            fetched[data_point_time] = hourdata
             # decrement the backlog
             self._backlog -= 1
             if self._backlog < 1:
                 break
             x += 1
+        # Add the data collected to the weather history in one batch
+        self.add_hours(data, fetched)
 
         return data
 
+    async def async_plan_backfill(self, start, end, max_calls):
+        """Work out the calls required to fill a range of history."""
+        async with self._cell.lock:
+            storeddata = self._cell.data or await self.async_get_stored_data(
+                self._cell.store_key
+            )
+        hour = datetime(
+            date.today().year, date.today().month, date.today().day, datetime.now().hour
+        )
+        thishour = int(datetime.timestamp(hour))
+        # older data would be aged out on the next update
+        retention = thishour - (self._cell.max_days() * 24 - 1) * 3600
+        first = max(int(start), retention)
+        first += -first % 3600
+        last = min(int(end), thishour)
+
+        history = storeddata.get("history", {})
+        targets = [
+            hour for hour in range(first, last + 1, 3600) if str(hour) not in history
+        ]
+        missing = len(targets)
+        targets = targets[: int(max_calls)]
+
+        # refreshes needed, waiting for the next UTC day when the quota runs out
+        refreshes = math.ceil(len(targets) / self.calls_per_refresh())
+        minutes = refreshes * CONST_UPDATE_MINUTES
+        # the refreshes still spend calls on the new hour, the forecast, the
+        # corrections and the backlog alongside the backfill
+        hourly = 2 + (1 if self._correction_hours else 0)
+        now = datetime.now(UTC)
+        midnight = datetime(now.year, now.month, now.day, tzinfo=UTC)
+        wait = (midnight + timedelta(days=1) - now).total_seconds()
+        available = (
+            self.remaining_calls()
+            - math.ceil(self._backlog)
+            - hourly * math.ceil(wait / 3600)
+        )
+        shortfall = len(targets) - max(0, available)
+        if shortfall > 0:
+            daily = max(1, self._maxcalls * max(1, self._keys.active()) - hourly * 24)
+            minutes += wait / 60 + (math.ceil(shortfall / daily) - 1) * 1440
+        return {
+            "start": datetime.fromtimestamp(first, UTC).isoformat(),
+            "end": datetime.fromtimestamp(last, UTC).isoformat(),
+            "clamped": first > int(start),
+            "missing": missing,
+            "calls": len(targets),
+            "eta": (datetime.now(UTC) + timedelta(minutes=minutes)).isoformat(),
+            "targets": targets,
+        }
+
+    async def async_start_backfill(self, plan):
+        """Queue a planned backfill, it is collected over the following refreshes.
+
+        The job is saved with the cell data so it survives a restart.
+        """
+        self.start_backfill(plan)
+        async with self._cell.lock:
+            if self._cell.data is None:
+                self._cell.data = await self.async_get_stored_data(
+                    self._cell.store_key
+                )
+            self._cell.data["backfill"] = self._backfill_records(self._cell.data)
+            await self.async_store_data(self._cell.data, self._cell.store_key)
+
+    def start_backfill(self, plan):
+        """Queue a planned or restored backfill."""
+        self._backfill = {
+            "targets": deque(plan["targets"]),
+            "total": plan.get("total", len(plan["targets"])),
+        }
+
+    def _backfill_records(self, storeddata) -> dict:
+        """Return the stored backfill jobs with the job of this entry."""
+        records = dict(storeddata.get("backfill", {}))
+        records.pop(self._name, None)
+        if self._backfill:
+            records[self._name] = {
+                "targets": list(self._backfill["targets"]),
+                "total": self._backfill["total"],
+            }
+        return records
+
+    async def async_run_backfill(self, historydata):
+        """Collect the next batch of a requested backfill."""
+        job = self._backfill
+        calls = self.calls_per_refresh()
+        fetched = {}
+        while job and job["targets"] and calls > 0:
+            if self.remaining_calls() < 1:
+                break
+            target = job["targets"].popleft()
+            calls -= 1
+            # each target is attempted once so the call budget is never exceeded
+            hourdata = await self.gethourdata(target)
+            if hourdata != {}:
+                fetched[target] = hourdata
+        self.add_hours(historydata, fetched)
+        if job and not job["targets"]:
+            _LOGGER.info("Backfill for %s complete", self._name)
+            self._backfill = None
+        return historydata
+
+    async def async_correct(self, historydata, corrected):
+        """Re-fetch recent hours once to pick up upstream corrections."""
+        if not self._correction_hours:
+            return corrected
+        hour = datetime(
+            date.today().year, date.today().month, date.today().day, datetime.now().hour
+        )
+        thishour = int(datetime.timestamp(hour))
+        # each hour is re-fetched once, CONST_CORRECTION_DELAY hours after it
+        # was collected, at most correction_hours are caught up after an outage
+        # spread over refreshes of CONST_CORRECTION_CALLS calls
+        newest = thishour - CONST_CORRECTION_DELAY * 3600
+        hour = max(corrected + 3600, thishour - self._correction_hours * 3600)
+        changed = 0
+        calls = 0
+        while hour <= newest and calls < CONST_CORRECTION_CALLS:
+            if str(hour) in historydata:
+                calls += 1
+                hourdata = await self.gethourdata(hour)
+                if hourdata == {}:
+                    # try again next refresh
+                    break
+                if hourdata != historydata[str(hour)]:
+                    self.add_hour(historydata, hour, hourdata)
+                    changed += 1
+            corrected = hour
+            hour += 3600
+        if changed:
+            _LOGGER.debug("%s corrected hours updated for %s", changed, self._name)
+        return corrected
+
     async def gethourdata(self, timestamp):
         """Get one hours data."""
         # do not process when no calls remaining
@@ -662,9 +1071,12 @@ class Weather:
             self.call_limit_warning()
             return {}
 
-        url = CONST_API_CALL % (self._lat, self._lon, timestamp, self._key)
+        key = self.next_key()
+        if key is None:
+            return {}
+        url = CONST_API_CALL % (self._lat, self._lon, timestamp, key)
 
-        result = await self.get_rest(url)
+        result = await self.get_rest(url, key, "timemachine")
         if result:
             current = result.get("data")[0]
             if current is None:
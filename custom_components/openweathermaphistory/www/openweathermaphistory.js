@@ -4,40 +4,43 @@ class OpenWeathMapHistoryCard extends HTMLElement {
     this.attachShadow({ mode: 'open' });
   }
 
-  _getAttributes(hass, p_entity) {
+  _getAttributes(hass, config) {
 
 	  function _getAttribute(p_attribute) {
-		if(hass.states[p_entity].attributes[p_attribute]) {
-		  return hass.states[p_entity].attributes[p_attribute];
+		if(hass.states[config.entity_id].attributes[p_attribute]) {
+		  return hass.states[config.entity_id].attributes[p_attribute];
 		} else {
 		  return '-';
 		}
 	  }
 
+	  // the days of a compact series sensor, or the dayN attributes of the entity
+	  function _getValues(p_series, p_field) {
+		const series = config[p_series] && hass.states[config[p_series]];
+		const values = [];
+		for (let i = 0; i < 5; i++) {
+		  if (series) {
+			const value = (series.attributes.values || [])[i];
+			values.push(value === undefined ? '-' : value);
+		  } else {
+			values.push(_getAttribute(`day${i}${p_field}`));
+		  }
+		}
+		return values;
+	  }
+
     const attributes = new Map();
 	attributes.set (`rain`,{
 		name: `Rain`,
-		value0: _getAttribute('day0rain'),
-		value1: _getAttribute('day1rain'),
-		value2: _getAttribute('day2rain'),
-		value3: _getAttribute('day3rain'),
-		value4: _getAttribute('day4rain'),
+		values: _getValues('rain_entity', 'rain'),
 	})
 	attributes.set (`min`,{
 		name: `Min Temp`,
-		value0: _getAttribute('day0min'),
-		value1: _getAttribute('day1min'),
-		value2: _getAttribute('day2min'),
-		value3: _getAttribute('day3min'),
-		value4: _getAttribute('day4min'),
+		values: _getValues('min_entity', 'min'),
 	})
 	attributes.set (`max`,{
 		name: `Max Temp`,
-		value0: _getAttribute('day0max'),
-		value1: _getAttribute('day1max'),
-		value2: _getAttribute('day2max'),
-		value3: _getAttribute('day3max'),
-		value4: _getAttribute('day4max'),
+		values: _getValues('max_entity', 'max'),
 	})
     return Array.from(attributes.values());
   }
@@ -101,11 +104,7 @@ class OpenWeathMapHistoryCard extends HTMLElement {
         ${attributes.map((attribute) => `
           <tr>
             <td>${attribute.name}</td>
-            <td>${attribute.value0}</td>
-            <td>${attribute.value1}</td>
-            <td>${attribute.value2}</td>
-            <td>${attribute.value3}</td>
-            <td>${attribute.value4}</td>
+            ${attribute.values.map((value) => `<td>${value}</td>`).join('')}
           </tr>
         `).join('')}
       `;
@@ -115,7 +114,7 @@ class OpenWeathMapHistoryCard extends HTMLElement {
     const config = this._config;
     const root = this.shadowRoot;
 
-    let attributes = this._getAttributes(hass, config.entity_id);
+    let attributes = this._getAttributes(hass, config);
     this._updateContent(root.getElementById('attributes'), attributes);
 	const state = hass.states[config.entity_id].state
 	this.card.header = "Adjustment Factor: " + state;